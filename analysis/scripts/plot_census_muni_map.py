@@ -1,30 +1,61 @@
 #!/usr/bin/env python3
-"""Plot municipality-level census features on municipal polygons."""
+"""Plot municipality-level census features on municipal polygons.
+
+Several --column / --party values render a batch: geometry is read and
+dissolved once, census columns and party shares come from one read each, and
+the figures are drawn in a process pool whose workers share the geometry
+(inherited through fork where available). Batch outputs are named after
+--output with the column / party appended.
+
+Polygons are drawn as one matplotlib PathCollection built from the dissolved
+geometry, whose vertex / code arrays are cached next to the outputs
+(muni_paths.npz, rebuilt when the shapefile changes). A figure is laid out
+once per process; each map only recolors the collection before savefig.
+"""
 
 from __future__ import annotations
 
 import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import geopandas as gpd
+import matplotlib
 import matplotlib.pyplot as plt
-from matplotlib.cm import ScalarMappable
-from matplotlib.colors import Colormap, Normalize
+from matplotlib.collections import PathCollection
+from matplotlib.colors import Colormap
 from matplotlib.font_manager import FontProperties
 from matplotlib import font_manager
+from matplotlib.path import Path as MplPath
 from matplotlib.ticker import PercentFormatter
 import numpy as np
 import pandas as pd
 
 
 BASE = Path(__file__).resolve().parent.parent.parent
-CENSUS_MUNI = BASE / "data" / "processed" / "census_muni.csv"
-HIREI_MUNI = BASE / "data" / "processed" / "hirei_shikuchouson.csv"
+sys.path.insert(0, str(BASE / "scripts" / "process"))
+
+from dataio import load  # noqa: E402
+from hirei_to_json import PARTY_CODE_MAP, read_hirei, vote_matrix  # noqa: E402
+from muni_code_canonical import MuniIndex  # noqa: E402
+
+# geopandas / shapely are only needed to rebuild the path cache
+if TYPE_CHECKING:
+    import geopandas as gpd
+
 MUNI_SHP = BASE / "data" / "raw" / "gis" / "N03_2025" / "N03-20250101.shp"
 PREF_TURNOUT = (
     BASE / "data" / "raw" / "election" / "yukensha" / "r8_todofuken_yukensha.csv"
 )
 DEFAULT_OUT = BASE / "analysis" / "output" / "census_muni_map.png"
+PATH_CACHE = BASE / "analysis" / "output" / "muni_paths.npz"
+PARTY_TITLES = {"自由民主党": "自民党"}
+
+# Per-process renderer, built once by _init_worker
+_RENDERER: ChoroplethRenderer | None = None
 
 
 def parse_args() -> argparse.Namespace:
@@ -33,24 +64,27 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--column",
-        default="party_vote_share",
+        nargs="+",
+        default=["party_vote_share"],
         help=(
-            "Metric to color-fill polygons. "
-            "'voting_rate' uses prefecture turnout, "
+            "Metric(s) to color-fill polygons. "
+            "'voting_rate' uses municipal turnout (turnout_muni.csv, "
+            "falling back to prefecture turnout), "
             "'party_vote_share' uses hirei_shikuchouson.csv, "
             "other values read from census_muni.csv."
         ),
     )
     parser.add_argument(
         "--party",
-        default="自由民主党",
-        help="Party name for --column party_vote_share (default: 自由民主党).",
+        nargs="+",
+        default=["自由民主党"],
+        help="Party name(s) for --column party_vote_share, or 'all' (default: 自由民主党).",
     )
     parser.add_argument(
         "--output",
         type=Path,
         default=DEFAULT_OUT,
-        help=f"Output image path (default: {DEFAULT_OUT}).",
+        help=f"Output image path; batch maps get a _<column> suffix (default: {DEFAULT_OUT}).",
     )
     parser.add_argument(
         "--figsize",
@@ -65,10 +99,18 @@ def parse_args() -> argparse.Namespace:
         default="cmocean:ice_r",
         help="Colormap name (default: cmocean:ice_r).",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes for rendering a batch (default: CPU count).",
+    )
     return parser.parse_args()
 
 
 def load_geometries() -> gpd.GeoDataFrame:
+    import geopandas as gpd
+
     gdf = gpd.read_file(MUNI_SHP)
     gdf["muni_code"] = gdf["N03_007"].astype(str).str.zfill(5)
     gdf["pref_code"] = gdf["muni_code"].str[:2]
@@ -77,15 +119,95 @@ def load_geometries() -> gpd.GeoDataFrame:
     return gdf.dissolve(by="muni_code", as_index=False, aggfunc="first")
 
 
-def load_census(column: str) -> pd.DataFrame:
-    df = pd.read_csv(CENSUS_MUNI, dtype={"muni_code": str})
-    if column not in df.columns:
-        available = ", ".join(df.columns)
-        raise ValueError(
-            f"Column '{column}' not found in {CENSUS_MUNI}. Available: {available}"
+class MuniPaths:
+    """Dissolved municipality outlines as flat matplotlib path arrays.
+
+    vertices / path_codes hold every ring of every polygon back to back;
+    offsets[i]:offsets[i + 1] is the slice for municipality i.
+    """
+
+    def __init__(
+        self,
+        muni_codes: np.ndarray,
+        vertices: np.ndarray,
+        path_codes: np.ndarray,
+        offsets: np.ndarray,
+        bounds: tuple[float, float, float, float],
+        geographic: bool = True,
+    ) -> None:
+        self.muni_codes = np.asarray(muni_codes).astype("U5")
+        self.vertices = vertices
+        self.path_codes = path_codes
+        self.offsets = offsets
+        self.bounds = tuple(float(b) for b in bounds)
+        self.geographic = bool(geographic)
+
+    def __len__(self) -> int:
+        return len(self.muni_codes)
+
+    @classmethod
+    def from_gdf(cls, gdf: gpd.GeoDataFrame) -> MuniPaths:
+        """Flatten (Multi)Polygons ring by ring: MOVETO, LINETO..., CLOSEPOLY."""
+        import shapely
+
+        parts, part_geom = shapely.get_parts(gdf.geometry.values, return_index=True)
+        rings, ring_part = shapely.get_rings(parts, return_index=True)
+        vertices, coord_ring = shapely.get_coordinates(rings, return_index=True)
+        coord_geom = part_geom[ring_part][coord_ring]
+
+        path_codes = np.full(len(vertices), MplPath.LINETO, dtype=np.uint8)
+        ring_start = np.searchsorted(coord_ring, np.arange(len(rings)))
+        path_codes[ring_start] = MplPath.MOVETO
+        path_codes[np.append(ring_start[1:], len(vertices)) - 1] = MplPath.CLOSEPOLY
+        offsets = np.searchsorted(coord_geom, np.arange(len(gdf) + 1))
+        geographic = gdf.crs is None or gdf.crs.is_geographic
+        return cls(gdf["muni_code"].to_numpy(), vertices, path_codes, offsets, gdf.total_bounds, geographic)
+
+    @classmethod
+    def load(cls, shp: Path = MUNI_SHP, cache: Path = PATH_CACHE) -> MuniPaths:
+        """Read the cache if it was built from the current shapefile, else rebuild it."""
+        stamp = np.array([shp.stat().st_mtime_ns, shp.stat().st_size], dtype=np.int64)
+        if cache.exists():
+            with np.load(cache) as z:
+                if np.array_equal(z["stamp"], stamp):
+                    return cls(
+                        z["muni_codes"], z["vertices"], z["path_codes"], z["offsets"],
+                        tuple(z["bounds"]), bool(z["geographic"]),
+                    )
+        paths = cls.from_gdf(load_geometries())
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            cache,
+            stamp=stamp,
+            muni_codes=paths.muni_codes,
+            vertices=paths.vertices,
+            path_codes=paths.path_codes,
+            offsets=paths.offsets,
+            bounds=np.array(paths.bounds),
+            geographic=paths.geographic,
         )
-    df["muni_code"] = df["muni_code"].astype(str).str.zfill(5)
-    return df[["muni_code", column]]
+        print(f"Saved: {cache}")
+        return paths
+
+    def paths(self) -> list[MplPath]:
+        o = self.offsets
+        return [
+            MplPath(self.vertices[a:b], self.path_codes[a:b], readonly=True)
+            for a, b in zip(o[:-1], o[1:])
+        ]
+
+
+def load_census(columns: list[str], index: MuniIndex) -> dict[str, np.ndarray]:
+    """Return census_muni columns as arrays aligned to the canonical index."""
+    df = load("census_muni", ["muni_code", *columns])
+    pos = index.encode(df["muni_code"])
+    keep = pos >= 0
+    out = {}
+    for column in columns:
+        values = np.full(len(index), np.nan)
+        values[pos[keep]] = df[column].to_numpy(dtype=float)[keep]
+        out[column] = values
+    return out
 
 
 def load_pref_voting_rate() -> pd.DataFrame:
@@ -94,61 +216,48 @@ def load_pref_voting_rate() -> pd.DataFrame:
         raise ValueError(f"'touhyou_rate' not found in {PREF_TURNOUT}")
     df["pref_code"] = df["pref_code"].astype(str).str.zfill(2)
     out = df[["pref_code", "touhyou_rate"]].drop_duplicates()
-    out = out.rename(columns={"touhyou_rate": "voting_rate"})
+    out["voting_rate"] = out.pop("touhyou_rate") / 100
     return out
 
 
-def load_party_vote_share(party_name: str) -> tuple[pd.DataFrame, float]:
-    df = pd.read_csv(HIREI_MUNI, dtype={"muni_code": str})
-    if "party_name" not in df.columns or "votes" not in df.columns:
-        raise ValueError(f"Missing required columns in {HIREI_MUNI}")
-    df["muni_code"] = df["muni_code"].astype(str).str.zfill(5)
-    df["votes"] = pd.to_numeric(df["votes"], errors="coerce").fillna(0)
-    df["valid_votes"] = pd.to_numeric(df.get("valid_votes"), errors="coerce")
-    if "valid_votes_muni" in df.columns:
-        df["valid_votes_muni"] = pd.to_numeric(df["valid_votes_muni"], errors="coerce")
+def load_voting_rate(index: MuniIndex) -> np.ndarray:
+    """Turnout (0-1) aligned to the canonical index.
+
+    Uses municipal turnout when process_election_data.py has produced it, else
+    paints every municipality with its prefecture's rate.
+    """
+    try:
+        df = load("turnout_muni", ["muni_code", "touhyousha_total", "yukensha_total"])
+    except FileNotFoundError as e:
+        print(f"Warning: {e}. Using prefecture turnout.")
     else:
-        df["valid_votes_muni"] = np.nan
-
-    # Municipality denominator:
-    # prefer valid_votes_muni; then valid_votes; if missing, fallback to sum of party votes.
-    muni_valid_muni = (
-        df.groupby("muni_code", as_index=False)["valid_votes_muni"]
-        .max()
-        .rename(columns={"valid_votes_muni": "denom_valid_votes_muni"})
-    )
-    muni_valid = (
-        df.groupby("muni_code", as_index=False)["valid_votes"]
-        .max()
-        .rename(columns={"valid_votes": "denom_valid_votes"})
-    )
-    muni_vote_sum = (
-        df.groupby("muni_code", as_index=False)["votes"]
-        .sum()
-        .rename(columns={"votes": "denom_vote_sum"})
-    )
-    denom = muni_valid_muni.merge(muni_valid, on="muni_code", how="outer").merge(
-        muni_vote_sum, on="muni_code", how="outer"
-    )
-    denom["denominator"] = denom["denom_valid_votes_muni"]
-    denom["denominator"] = denom["denominator"].fillna(denom["denom_valid_votes"])
-    denom["denominator"] = denom["denominator"].fillna(denom["denom_vote_sum"])
-    denom["denominator"] = denom["denominator"].replace(0, np.nan)
-
-    by_party = (
-        df.groupby(["muni_code", "party_name"], as_index=False)["votes"]
-        .sum()
-        .rename(columns={"votes": "party_votes"})
-    )
-    shares = by_party.merge(
-        denom[["muni_code", "denominator"]], on="muni_code", how="left"
-    )
-    shares["party_vote_share"] = shares["party_votes"] / shares["denominator"]
-    out = shares[shares["party_name"] == party_name][
-        ["muni_code", "party_vote_share"]
-    ].copy()
-    vmax_party = float(out["party_vote_share"].max(skipna=True))
-    return out, vmax_party
+        values = np.full(len(index), np.nan)
+        pos = index.encode(df["muni_code"])
+        keep = pos >= 0
+        rate = (df["touhyousha_total"] / df["yukensha_total"]).to_numpy()
+        values[pos[keep]] = rate[keep]
+        return values
+    pref = load_pref_voting_rate().set_index("pref_code")["voting_rate"]
+    return pref.reindex(index.pref_codes).to_numpy()
+
+
+def load_party_vote_shares(
+    party_names: list[str] | None, index: MuniIndex
+) -> dict[str, np.ndarray]:
+    """Return vote shares aligned to the canonical index (NaN where not on the ballot).
+
+    All parties come out of one (muni × party) pivot; None selects every party.
+    """
+    df = read_hirei(columns=["muni_code", "party_name", "votes", "valid_votes_muni"])
+    votes, valid_votes, all_names, muni_pos = vote_matrix(df, index)
+    missing = [name for name in party_names or [] if name not in all_names]
+    if missing:
+        raise ValueError(f"Party '{missing[0]}' not found in hirei_shikuchouson")
+
+    reported = np.zeros(votes.shape, dtype=bool)
+    reported[muni_pos, pd.Index(all_names).get_indexer(df["party_name"])] = True
+    shares = np.where(reported, votes / valid_votes[:, None], np.nan)
+    return {name: shares[:, all_names.index(name)] for name in party_names or all_names}
 
 
 def resolve_cmap(cmap_arg: str) -> str | Colormap:
@@ -174,9 +283,7 @@ def get_noto_thin_bold() -> FontProperties:
     return FontProperties(family="Hiragino Sans", weight="bold")
 
 
-def main() -> None:
-    args = parse_args()
-    args.output.parent.mkdir(parents=True, exist_ok=True)
+def setup_fonts() -> None:
     plt.rcParams["font.family"] = "sans-serif"
     plt.rcParams["font.sans-serif"] = [
         "Hiragino Sans",
@@ -186,94 +293,164 @@ def main() -> None:
         "Noto Sans CJK JP",
         "DejaVu Sans",
     ]
-    cmap = resolve_cmap(args.cmap)
 
-    vmin: float | None = None
-    vmax: float | None = None
-    title = f"Japan Municipality Census Map: {args.column}"
-    gdf = load_geometries()
-    if args.column == "voting_rate":
-        df = load_pref_voting_rate()
-        merged = gdf.merge(df, on="pref_code", how="left")
-    elif args.column == "party_vote_share":
-        if not args.party:
-            raise ValueError("Please set --party when using --column party_vote_share.")
-        df, vmax_party = load_party_vote_share(args.party)
-        merged = gdf.merge(df, on="muni_code", how="left")
-        vmin = 0.0
-        vmax = vmax_party
-        if args.party in {"自由民主党", "自民党"}:
-            title = "政党得票率(%): 自民党"
+
+def map_specs(args: argparse.Namespace, index: MuniIndex, gdf_pos: np.ndarray) -> list[dict]:
+    """One dict per map: polygon-aligned values, title, color range and output path."""
+    maps = []
+    census_columns = [c for c in args.column if c not in {"voting_rate", "party_vote_share"}]
+    census = load_census(census_columns, index) if census_columns else {}
+    for column in args.column:
+        if column == "voting_rate":
+            maps.append({"column": column, "values": load_voting_rate(index), "title": "投票率(%)"})
+        elif column == "party_vote_share":
+            if not args.party:
+                raise ValueError("Please set --party when using --column party_vote_share.")
+            parties = None if args.party == ["all"] else args.party
+            for name, values in load_party_vote_shares(parties, index).items():
+                maps.append({
+                    "column": column,
+                    "party": name,
+                    "values": values,
+                    "title": f"政党得票率(%): {PARTY_TITLES.get(name, name)}",
+                    "vmin": 0.0,
+                    "vmax": float(np.nanmax(values)),
+                })
         else:
-            title = f"政党得票率(%): {args.party}"
-    else:
-        df = load_census(args.column)
-        merged = gdf.merge(df, on="muni_code", how="left")
-    merged[args.column] = pd.to_numeric(merged[args.column], errors="coerce")
-
-    matched = merged[args.column].notna().sum()
-    print(f"Merged municipalities: {len(merged)}")
-    print(f"Matched values for '{args.column}': {matched} / {len(merged)}")
-    if matched == 0:
-        raise ValueError(f"Column '{args.column}' has no plottable numeric values.")
-
-    if vmin is None or vmax is None:
-        # Clip extreme values so the map keeps contrast for most municipalities.
-        valid = merged[args.column].dropna()
-        vmin = float(np.nanpercentile(valid, 2))
-        vmax = float(np.nanpercentile(valid, 98))
-        if np.isclose(vmin, vmax):
-            vmin = float(valid.min())
-            vmax = float(valid.max())
-
-    fig, ax = plt.subplots(figsize=args.figsize, facecolor="#fbfbf8")
-    ax.set_facecolor("#fbfbf8")
-    norm = Normalize(vmin=vmin, vmax=vmax)
-    merged.plot(
-        column=args.column,
-        cmap=cmap,
-        linewidth=0.08,
-        edgecolor="#f4f4f4",
-        missing_kwds={"color": "#bfbfbf", "label": "No data"},
-        legend=False,
-        vmin=vmin,
-        vmax=vmax,
-        ax=ax,
-    )
+            maps.append({
+                "column": column,
+                "values": census[column],
+                "title": f"Japan Municipality Census Map: {column}",
+            })
+
+    for spec in maps:
+        spec["values"] = index.take(spec["values"], gdf_pos)
+        label = spec["column"] if "party" not in spec else PARTY_CODE_MAP.get(spec["party"], spec["party"])
+        spec["output"] = (
+            args.output
+            if len(maps) == 1
+            else args.output.with_name(f"{args.output.stem}_{label}{args.output.suffix}")
+        )
 
-    # Crop to Japan main extent to reduce empty canvas from remote outlying islands.
-    if merged.crs is None or merged.crs.is_geographic:
-        ax.set_xlim(122.0, 147.3)
-        ax.set_ylim(24.0, 46.6)
-
-    # Manual colorbar placement (red-box area in user mock).
-    cax = fig.add_axes([0.82, 0.20, 0.020, 0.23])  # [left, bottom, width, height]
-    sm = ScalarMappable(norm=norm, cmap=cmap)
-    sm.set_array([])
-    cb = fig.colorbar(sm, cax=cax)
-    cb.ax.yaxis.set_major_formatter(PercentFormatter(xmax=1.0, decimals=0))
-    cb.set_label(
-        "得票率(%)", fontsize=12, fontfamily="Hiragino Sans", fontweight="normal"
-    )
-    for tick in cb.ax.get_yticklabels():
-        tick.set_fontfamily("Helvetica")
-        tick.set_fontweight("normal")
-        tick.set_fontsize(10)
-
-    ax.set_title(
-        title,
-        fontsize=90,
-        pad=10,
-        fontproperties=get_noto_thin_bold(),
-    )
-    ax.set_position([0.03, 0.05, 0.86, 0.88])
-    ax.set_axis_off()
-    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-    save_kwargs = {"bbox_inches": "tight"}
-    if args.output.suffix.lower() != ".pdf":
-        save_kwargs["dpi"] = 300
-    fig.savefig(args.output, **save_kwargs)
-    print(f"Saved: {args.output}")
+        matched = int(np.isfinite(spec["values"]).sum())
+        print(f"Matched values for '{label}': {matched} / {len(gdf_pos)}")
+        if matched == 0:
+            raise ValueError(f"Column '{label}' has no plottable numeric values.")
+        if "vmin" not in spec:
+            # Clip extreme values so the map keeps contrast for most municipalities.
+            valid = spec["values"][np.isfinite(spec["values"])]
+            vmin = float(np.nanpercentile(valid, 2))
+            vmax = float(np.nanpercentile(valid, 98))
+            if np.isclose(vmin, vmax):
+                vmin = float(valid.min())
+                vmax = float(valid.max())
+            spec["vmin"], spec["vmax"] = vmin, vmax
+    return maps
+
+
+class ChoroplethRenderer:
+    """One laid-out figure whose PathCollection is recolored for every map."""
+
+    def __init__(self, geometry: MuniPaths, figsize: tuple[float, float], cmap) -> None:
+        cmap = matplotlib.colormaps[cmap] if isinstance(cmap, str) else cmap
+        self.cmap = cmap.with_extremes(bad="#bfbfbf")
+        self.fig, self.ax = plt.subplots(figsize=figsize, facecolor="#fbfbf8")
+        ax = self.ax
+        ax.set_facecolor("#fbfbf8")
+        self.collection = PathCollection(
+            geometry.paths(),
+            cmap=self.cmap,
+            linewidths=0.08,
+            edgecolors="#f4f4f4",
+        )
+        self.collection.set_array(np.full(len(geometry), np.nan))
+        ax.add_collection(self.collection, autolim=False)
+
+        minx, miny, maxx, maxy = geometry.bounds
+        ax.set_xlim(minx, maxx)
+        ax.set_ylim(miny, maxy)
+        if geometry.geographic:
+            # Same aspect as GeoDataFrame.plot for lon/lat data
+            ax.set_aspect(1 / np.cos(np.deg2rad((miny + maxy) / 2)))
+            # Crop to Japan main extent to reduce empty canvas from remote outlying islands.
+            ax.set_xlim(122.0, 147.3)
+            ax.set_ylim(24.0, 46.6)
+        else:
+            ax.set_aspect("equal")
+
+        # Manual colorbar placement (red-box area in user mock).
+        cax = self.fig.add_axes([0.82, 0.20, 0.020, 0.23])  # [left, bottom, width, height]
+        cb = self.fig.colorbar(self.collection, cax=cax)
+        cb.set_label(
+            "得票率(%)", fontsize=12, fontfamily="Hiragino Sans", fontweight="normal"
+        )
+        cb.ax.tick_params(labelsize=10, labelfontfamily="Helvetica")
+        self.colorbar = cb
+
+        self.title = ax.set_title(
+            "",
+            fontsize=90,
+            pad=10,
+            fontproperties=get_noto_thin_bold(),
+        )
+        ax.set_position([0.03, 0.05, 0.86, 0.88])
+        ax.set_axis_off()
+        self.fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
+
+    def render(self, spec: dict) -> Path:
+        self.collection.set_array(np.ma.masked_invalid(spec["values"]))
+        self.collection.set_clim(spec["vmin"], spec["vmax"])
+        # Rescaling the mappable resets the colorbar ticks
+        self.colorbar.ax.yaxis.set_major_formatter(PercentFormatter(xmax=1.0, decimals=0))
+        self.title.set_text(spec["title"])
+
+        save_kwargs = {"bbox_inches": "tight"}
+        if spec["output"].suffix.lower() != ".pdf":
+            save_kwargs["dpi"] = 300
+        self.fig.savefig(spec["output"], **save_kwargs)
+        return spec["output"]
+
+
+def _init_worker(geometry: MuniPaths, figsize: tuple[float, float], cmap) -> None:
+    global _RENDERER
+    plt.switch_backend("Agg")
+    setup_fonts()
+    _RENDERER = ChoroplethRenderer(geometry, figsize, cmap)
+
+
+def _render(spec: dict) -> Path:
+    return _RENDERER.render(spec)
+
+
+def main() -> None:
+    args = parse_args()
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    setup_fonts()
+    cmap = resolve_cmap(args.cmap)
+
+    geometry = MuniPaths.load()
+    index = MuniIndex.load()
+    # Polygon -> canonical position (所属未定地・北方領土 map to -1 and stay unfilled)
+    gdf_pos = index.encode(geometry.muni_codes)
+    print(f"Merged municipalities: {len(geometry)}")
+    specs = map_specs(args, index, gdf_pos)
+    figsize = tuple(args.figsize)
+
+    workers = min(args.workers, len(specs))
+    if workers <= 1:
+        renderer = ChoroplethRenderer(geometry, figsize, cmap)
+        for spec in specs:
+            print(f"Saved: {renderer.render(spec)}")
+        return
+
+    # Fork shares the path arrays with every worker without pickling them
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(geometry, figsize, cmap)
+    ) as pool:
+        for path in pool.map(_render, specs):
+            print(f"Saved: {path}")
 
 
 if __name__ == "__main__":
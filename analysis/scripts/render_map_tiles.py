@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""Pre-render municipal choropleths as XYZ raster tiles and share-card thumbnails.
+
+Every party × per-party mode (share, rank, opposition_rank) and every
+single-valued mode (winner_margin, ruling_vs_opposition, concentration,
+js_divergence) of the web map becomes one "map", with values from
+build_mode_metrics.mode_metrics at muni granularity. Each map is written as
+
+  <out>/<map_id>/<z>/<x>/<y>.png   256 px Web Mercator tiles (empty sea tiles skipped)
+  <out>/thumbs/<map_id>.png        fixed-size thumbnail (default 1200x630, OGP size)
+  <out>/index.json                 maps, modes, parties, zooms, value ranges, URL templates
+                                   (through ArtifactWriter: hashed copy, .gz/.br, manifest.json)
+
+Geometry comes from the path cache of plot_census_muni_map.py (MuniPaths),
+projected to Web Mercator once. Workers in a process pool keep one figure each
+and draw a whole block of tiles per pass, then slice the raster, so each map
+costs a few draws per zoom level.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.collections import PathCollection
+from matplotlib.colors import Normalize
+from matplotlib.image import imsave
+from matplotlib.path import Path as MplPath
+import numpy as np
+
+from plot_census_muni_map import BASE, MuniPaths, resolve_cmap
+
+sys.path.insert(0, str(BASE / "scripts" / "process"))
+
+from artifact_writer import ArtifactWriter  # noqa: E402
+from build_mode_metrics import mode_metrics  # noqa: E402
+from muni_code_canonical import MuniIndex  # noqa: E402
+
+DEFAULT_OUT = BASE / "web" / "public" / "tiles"
+TILE_SIZE = 256
+# Half the Web Mercator world width (m)
+EXTENT = 20037508.342789244
+# Main Japan extent for thumbnails (lon / lat), as in plot_census_muni_map
+THUMB_BOUNDS = (122.0, 24.0, 147.3, 46.6)
+# Largest raster drawn in one pass, in tiles per side
+BLOCK_TILES = 8
+
+# mode -> (metric, field, per party, colormap, value range)
+MODES = {
+    "share": ("share", None, True, "cmocean:ice_r", "party_max"),
+    "rank": ("rank", None, True, "viridis_r", "rank"),
+    "opposition_rank": ("opposition_rank", None, True, "viridis_r", "rank"),
+    "winner_margin": ("winner_margin", "margin", False, "magma_r", "percentile"),
+    "ruling_vs_opposition": ("ruling_vs_opposition", "gap", False, "RdBu_r", "symmetric"),
+    "concentration": ("concentration", "effective_parties", False, "viridis", "percentile"),
+    "js_divergence": ("js_divergence", "all", False, "magma", "percentile"),
+}
+
+# Per-process renderer, built once by _init_worker
+_RENDERER: TileRenderer | None = None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Pre-render XYZ tiles and thumbnails for every party x mode choropleth."
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=DEFAULT_OUT,
+        help=f"Tile directory (default: {DEFAULT_OUT}).",
+    )
+    parser.add_argument(
+        "--zoom",
+        type=int,
+        nargs="+",
+        default=[4, 5, 6, 7],
+        help="Zoom levels to render (default: 4 5 6 7).",
+    )
+    parser.add_argument(
+        "--mode",
+        nargs="+",
+        choices=sorted(MODES),
+        default=list(MODES),
+        help="Modes to render (default: all).",
+    )
+    parser.add_argument(
+        "--party",
+        nargs="+",
+        help="Party codes for per-party modes (default: all parties).",
+    )
+    parser.add_argument(
+        "--thumb-size",
+        type=int,
+        nargs=2,
+        metavar=("WIDTH", "HEIGHT"),
+        default=(1200, 630),
+        help="Thumbnail size in pixels (default: 1200 630).",
+    )
+    parser.add_argument(
+        "--no-tiles",
+        action="store_true",
+        help="Only render thumbnails.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Rendering processes (default: CPU count).",
+    )
+    return parser.parse_args()
+
+
+def to_mercator(lonlat: np.ndarray) -> np.ndarray:
+    """EPSG:4326 lon / lat (n × 2) to EPSG:3857 metres."""
+    lon, lat = np.radians(lonlat[:, 0]), np.radians(np.clip(lonlat[:, 1], -85.06, 85.06))
+    return np.column_stack([lon, np.log(np.tan(np.pi / 4 + lat / 2))]) * (EXTENT / np.pi)
+
+
+def tile_range(bounds: tuple[float, float, float, float], z: int) -> tuple[int, int, int, int]:
+    """Inclusive x0, y0, x1, y1 of the XYZ tiles covering lon / lat bounds."""
+    (minx, miny), (maxx, maxy) = to_mercator(np.array([bounds[:2], bounds[2:]]))
+    size = 2 * EXTENT / 2**z
+    last = 2**z - 1
+    x0, x1 = (int(np.clip((v + EXTENT) // size, 0, last)) for v in (minx, maxx))
+    y0, y1 = (int(np.clip((EXTENT - v) // size, 0, last)) for v in (maxy, miny))
+    return x0, y0, x1, y1
+
+
+def thumb_extent(width: int, height: int) -> tuple[float, float, float, float]:
+    """Mercator extent around THUMB_BOUNDS padded to the thumbnail aspect."""
+    (minx, miny), (maxx, maxy) = to_mercator(np.array([THUMB_BOUNDS[:2], THUMB_BOUNDS[2:]]))
+    cx, cy = (minx + maxx) / 2, (miny + maxy) / 2
+    half_w = max(maxx - minx, (maxy - miny) * width / height) / 2
+    half_h = half_w * height / width
+    return cx - half_w, cy - half_h, cx + half_w, cy + half_h
+
+
+def map_specs(args: argparse.Namespace, geometry: MuniPaths) -> tuple[list[dict], list[str]]:
+    """One dict per map with geometry-aligned values, colormap and value range."""
+    index = MuniIndex.load()
+    party_codes, levels = mode_metrics(index)
+    metrics = levels["muni"]["metrics"]
+    pos = index.encode(geometry.muni_codes)
+    parties = args.party or party_codes
+    unknown = sorted(set(parties) - set(party_codes))
+    if unknown:
+        raise ValueError(f"Unknown party codes: {', '.join(unknown)}")
+
+    specs = []
+    for mode in args.mode:
+        metric, field, per_party, cmap_name, value_range = MODES[mode]
+        cmap = resolve_cmap(cmap_name)
+        cmap = matplotlib.colormaps[cmap] if isinstance(cmap, str) else cmap
+        data = metrics[metric] if field is None else metrics[metric][field]
+        columns = [(p, data[:, party_codes.index(p)]) for p in parties] if per_party else [(None, data)]
+        for party, values in columns:
+            values = values.astype(float)
+            if value_range == "rank":
+                values = np.where(values > 0, values, np.nan)
+                vmin, vmax = 1.0, float(len(party_codes))
+            elif value_range == "party_max":
+                vmin, vmax = 0.0, float(np.nanmax(values))
+            elif value_range == "symmetric":
+                vmax = float(np.nanpercentile(np.abs(values), 98))
+                vmin = -vmax
+            else:
+                vmin, vmax = (float(v) for v in np.nanpercentile(values, [2, 98]))
+            specs.append({
+                "id": mode if party is None else f"{mode}-{party}",
+                "mode": mode,
+                "party": party,
+                "values": index.take(values, pos),
+                "cmap": cmap,
+                "vmin": vmin,
+                "vmax": vmax,
+            })
+    return specs, party_codes
+
+
+class TileRenderer:
+    """A borderless figure with the municipality PathCollection, recolored per map."""
+
+    def __init__(self, geometry: MuniPaths, dpi: int = 100) -> None:
+        vertices = to_mercator(geometry.vertices)
+        o = geometry.offsets
+        paths = [MplPath(vertices[a:b], geometry.path_codes[a:b], readonly=True) for a, b in zip(o[:-1], o[1:])]
+        self.dpi = dpi
+        self.fig = plt.figure(dpi=dpi, frameon=False)
+        self.ax = self.fig.add_axes([0, 0, 1, 1])
+        self.ax.set_axis_off()
+        self.ax.set_aspect("auto")
+        self.collection = PathCollection(paths, linewidths=0.2, edgecolors="#ffffff99")
+        self.ax.add_collection(self.collection, autolim=False)
+
+    def color(self, spec: dict) -> None:
+        self.collection.set_cmap(spec["cmap"].with_extremes(bad=(0, 0, 0, 0)))
+        self.collection.set_array(np.ma.masked_invalid(spec["values"]))
+        self.collection.set_norm(Normalize(vmin=spec["vmin"], vmax=spec["vmax"]))
+
+    def draw(self, extent: tuple[float, float, float, float], width: int, height: int, facecolor=None) -> np.ndarray:
+        """RGBA raster (height × width × 4) of the mercator extent."""
+        self.fig.set_size_inches(width / self.dpi, height / self.dpi)
+        self.fig.patch.set_facecolor(facecolor or (0, 0, 0, 0))
+        self.ax.set_xlim(extent[0], extent[2])
+        self.ax.set_ylim(extent[1], extent[3])
+        self.fig.canvas.draw()
+        return np.asarray(self.fig.canvas.buffer_rgba())[:height, :width].copy()
+
+    def tiles(self, spec: dict, out: Path, zooms: list[int], bounds) -> dict[str, int]:
+        """Write non-empty tiles per zoom; returns {zoom: tile count}."""
+        counts = {}
+        for z in zooms:
+            x0, y0, x1, y1 = tile_range(bounds, z)
+            size = 2 * EXTENT / 2**z
+            counts[str(z)] = 0
+            for bx in range(x0, x1 + 1, BLOCK_TILES):
+                for by in range(y0, y1 + 1, BLOCK_TILES):
+                    nx, ny = min(BLOCK_TILES, x1 + 1 - bx), min(BLOCK_TILES, y1 + 1 - by)
+                    extent = (
+                        -EXTENT + bx * size,
+                        EXTENT - (by + ny) * size,
+                        -EXTENT + (bx + nx) * size,
+                        EXTENT - by * size,
+                    )
+                    raster = self.draw(extent, nx * TILE_SIZE, ny * TILE_SIZE)
+                    for i in range(nx):
+                        for j in range(ny):
+                            tile = raster[j * TILE_SIZE:(j + 1) * TILE_SIZE, i * TILE_SIZE:(i + 1) * TILE_SIZE]
+                            if not tile[:, :, 3].any():
+                                continue
+                            path = out / spec["id"] / str(z) / str(bx + i) / f"{by + j}.png"
+                            path.parent.mkdir(parents=True, exist_ok=True)
+                            imsave(path, tile)
+                            counts[str(z)] += 1
+        return counts
+
+    def thumbnail(self, spec: dict, out: Path, size: tuple[int, int]) -> Path:
+        width, height = size
+        raster = self.draw(thumb_extent(width, height), width, height, facecolor="#fbfbf8")
+        path = out / "thumbs" / f"{spec['id']}.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        imsave(path, raster)
+        return path
+
+
+def _init_worker(geometry: MuniPaths) -> None:
+    global _RENDERER
+    plt.switch_backend("Agg")
+    _RENDERER = TileRenderer(geometry)
+
+
+def _render(task: tuple[dict, Path, list[int], tuple, tuple[int, int], bool]) -> tuple[str, dict[str, int]]:
+    spec, out, zooms, bounds, thumb_size, tiles = task
+    _RENDERER.color(spec)
+    counts = _RENDERER.tiles(spec, out, zooms, bounds) if tiles else {}
+    _RENDERER.thumbnail(spec, out, thumb_size)
+    return spec["id"], counts
+
+
+def main() -> None:
+    args = parse_args()
+    geometry = MuniPaths.load()
+    if not geometry.geographic:
+        raise ValueError("Tiles need lon / lat geometry; the municipality cache is projected.")
+    specs, party_codes = map_specs(args, geometry)
+    print(f"Rendering {len(specs)} maps at zoom {args.zoom} to {args.out}")
+
+    bounds = geometry.bounds
+    tasks = [(spec, args.out, args.zoom, bounds, tuple(args.thumb_size), not args.no_tiles) for spec in specs]
+    workers = max(1, min(args.workers, len(tasks)))
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+    counts = {}
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(geometry,)
+    ) as pool:
+        for map_id, tile_counts in pool.map(_render, tasks):
+            counts[map_id] = tile_counts
+            print(f"  {map_id:32s} {sum(tile_counts.values()):5d} tiles")
+
+    index = {
+        "tile_size": TILE_SIZE,
+        "crs": "EPSG:3857",
+        "bounds": list(bounds),
+        "zooms": {
+            str(z): dict(zip(("x0", "y0", "x1", "y1"), tile_range(bounds, z)))
+            for z in ([] if args.no_tiles else args.zoom)
+        },
+        "tiles": "{map}/{z}/{x}/{y}.png",
+        "thumbnail": "thumbs/{map}.png",
+        "thumb_size": list(args.thumb_size),
+        "parties": party_codes,
+        "modes": {mode: {"per_party": MODES[mode][2], "colormap": MODES[mode][3]} for mode in args.mode},
+        "maps": {
+            spec["id"]: {
+                "mode": spec["mode"],
+                "party": spec["party"],
+                "vmin": round(spec["vmin"], 6),
+                "vmax": round(spec["vmax"], 6),
+                "tile_counts": counts[spec["id"]],
+            }
+            for spec in specs
+        },
+    }
+    with ArtifactWriter(args.out) as writer:
+        out = writer.write_text("index.json", json.dumps(index, ensure_ascii=False, indent=1))
+    total = sum(sum(c.values()) for c in counts.values())
+    print(f"Saved {out} ({len(specs)} maps, {total} tiles)")
+
+
+if __name__ == "__main__":
+    main()
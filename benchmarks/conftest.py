@@ -0,0 +1,65 @@
+"""Benchmark suite for the processing stages (pytest-benchmark).
+
+Runs offline on synthetic inputs (synthetic.py) scaled with --scale, a multiple
+of the real municipality count (default 10; use 100 for stress runs):
+
+    pytest benchmarks --benchmark-autosave                 # record a baseline
+    pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:100%
+
+Runs are saved under benchmarks/results/<machine>/ (see pyproject.toml), one
+directory per interpreter and platform, and the second command fails any
+benchmark whose mean got 2x slower than the latest saved run in that directory.
+No baseline ships with the repository: timings only compare on the machine that
+recorded them, so record one with the first command before comparing (on a
+shared benchmark machine, commit its results/<machine>/ directory so later runs
+compare against it). Compare runs at the same --scale.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE / "scripts" / "process"))
+
+import synthetic  # noqa: E402
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--scale",
+        type=int,
+        default=10,
+        help="Synthetic data size as a multiple of the real municipality count (default: 10)",
+    )
+
+
+def pytest_benchmark_update_json(config: pytest.Config, benchmarks: list, output_json: dict) -> None:
+    output_json["scale"] = config.getoption("--scale")
+
+
+@pytest.fixture(scope="session")
+def scale(request: pytest.FixtureRequest) -> int:
+    return request.config.getoption("--scale")
+
+
+@pytest.fixture(autouse=True)
+def _no_run_reports(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Stage entry points would otherwise append to data/processed/run_reports
+    monkeypatch.setenv("PIPELINE_REPORT_DIR", "")
+    monkeypatch.delenv("PIPELINE_PROFILE", raising=False)
+
+
+@pytest.fixture(scope="session")
+def hirei_raw(tmp_path_factory: pytest.TempPathFactory, scale: int) -> Path:
+    """Raw hirei tree (csv/, logs/, party_mapping.json) at --scale."""
+    return synthetic.scale_hirei(tmp_path_factory.mktemp("hirei"), scale)
+
+
+@pytest.fixture(scope="session")
+def muni_tessellation(scale: int):
+    """Municipality polygons, N_MUNI × --scale cells."""
+    return synthetic.tessellation(synthetic.N_MUNI * scale)
@@ -0,0 +1,162 @@
+"""Synthetic, scalable inputs for the benchmark suite (offline, no N03 download).
+
+scale_hirei        the 47 prefecture CSVs with every municipality replicated
+                   `scale` times (jittered votes, synthetic codes), plus the
+                   party mapping and scraping logs hirei_merge expects
+tessellation       municipality-like polygon coverage (Voronoi cells with wiggly,
+                   densified shared edges) in JGD2011, with pref / block codes
+muni_codes         plain synthetic code list
+census_tables      市区町村のすがた-style raw count tables over a code list,
+                   including the old Hamamatsu wards
+
+Synthetic codes keep the 5-character muni_code layout: the two-digit prefecture
+code followed by three digits, or a letter and two base-36 digits once a
+prefecture runs out of numeric codes.
+"""
+
+from __future__ import annotations
+
+import shutil
+import string
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from build_master_table import _PREF_BLOCK_ROWS
+from muni_code_canonical import HAMAMATSU_NEW_WARDS, HAMAMATSU_OLD_CODES
+
+
+BASE = Path(__file__).resolve().parent.parent
+HIREI_DIR = BASE / "data" / "raw" / "election" / "hirei"
+
+# Real municipality count (canonical index) that scale multiplies
+N_MUNI = 1892
+# Rough extent of Japan's main islands (lon / lat)
+BBOX = (129.0, 31.0, 146.0, 45.5)
+CRS = "EPSG:6668"
+
+_B36 = string.digits + string.ascii_uppercase
+
+
+def muni_code(pref_code: str, k: int) -> str:
+    """k-th synthetic code in a prefecture: 001..999, then A00..ZZZ."""
+    if k < 1000:
+        return f"{pref_code}{k:03d}"
+    k -= 1000
+    if k >= 26 * 36 * 36:
+        raise ValueError(f"Too many synthetic codes for prefecture {pref_code}")
+    return f"{pref_code}{string.ascii_uppercase[k // 1296]}{_B36[k // 36 % 36]}{_B36[k % 36]}"
+
+
+def muni_codes(n: int) -> np.ndarray:
+    """n synthetic codes spread round-robin over the 47 prefectures (Hamamatsu codes skipped)."""
+    reserved = HAMAMATSU_OLD_CODES | set(HAMAMATSU_NEW_WARDS) | {"22130"}
+    codes = (muni_code(f"{i % 47 + 1:02d}", i // 47 + 1) for i in range(n + len(reserved)))
+    return np.array([c for c in codes if c not in reserved][:n])
+
+
+def scale_hirei(out_dir: Path, scale: int, seed: int = 0, src_dir: Path = HIREI_DIR) -> Path:
+    """Write a hirei raw tree (csv/, logs/, party_mapping.json) scaled `scale` times."""
+    rng = np.random.default_rng(seed)
+    (out_dir / "csv").mkdir(parents=True, exist_ok=True)
+    shutil.copy(src_dir / "party_mapping.json", out_dir / "party_mapping.json")
+    shutil.copytree(src_dir / "logs", out_dir / "logs", dirs_exist_ok=True)
+
+    for path in sorted((src_dir / "csv").glob("*.csv")):
+        df = pd.read_csv(path, dtype=str)
+        pref_code = path.stem.split("_")[0]
+        munis = df["muni_code"].unique()
+        copies = [df]
+        for r in range(1, scale):
+            copy = df.copy()
+            codes = {c: muni_code(pref_code, 1000 + (r - 1) * len(munis) + i) for i, c in enumerate(munis)}
+            copy["muni_code"] = copy["muni_code"].map(codes)
+            copy["muni_name"] = copy["muni_name"] + f"_{r}"
+            # One turnout factor per municipality keeps votes <= valid_votes
+            factor = pd.Series(rng.lognormal(0.0, 0.15, len(munis)), index=munis)
+            f = copy["muni_code"].map(dict(zip(codes.values(), factor.to_numpy())))
+            for col in ("votes", "valid_votes"):
+                if col in copy:
+                    values = pd.to_numeric(copy[col].str.replace(",", ""), errors="coerce")
+                    copy[col] = (values * f).round().astype("Int64").astype(str).replace("<NA>", "")
+            copies.append(copy)
+        pd.concat(copies, ignore_index=True).to_csv(out_dir / "csv" / path.name, index=False)
+    return out_dir
+
+
+def tessellation(n: int, seed: int = 0, n_prefs: int = 47, vertices: int = 48) -> gpd.GeoDataFrame:
+    """n municipality polygons covering BBOX, grouped into n_prefs prefectures.
+
+    Voronoi edges are densified to about `vertices` points per cell and bent by a
+    smooth displacement field, so shared boundaries stay identical between
+    neighbours (Queen contiguity and coverage simplification still apply).
+    """
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = BBOX
+    frame = shapely.box(*BBOX)
+    pts = rng.uniform((minx, miny), (maxx, maxy), size=(n, 2))
+    cells = shapely.get_parts(shapely.voronoi_polygons(shapely.multipoints(pts), extend_to=frame))
+    cells = shapely.intersection(cells, frame)
+
+    cell_size = np.sqrt((maxx - minx) * (maxy - miny) / n)
+    cells = shapely.segmentize(cells, cell_size * 6 / vertices)
+    amp = cell_size * 0.08
+
+    def bend(xy: np.ndarray) -> np.ndarray:
+        x, y = xy[:, 0], xy[:, 1]
+        k = 2 * np.pi / cell_size
+        return np.column_stack([x + amp * np.sin(k * y * 0.7), y + amp * np.sin(k * x * 0.9)])
+
+    cells = shapely.set_precision(shapely.transform(cells, bend), 1e-7)
+    cells = cells[~shapely.is_empty(cells)]
+
+    # Prefecture = nearest of n_prefs seeds, numbered west to east
+    seeds = rng.uniform((minx, miny), (maxx, maxy), size=(n_prefs, 2))
+    seeds = seeds[np.argsort(seeds[:, 0])]
+    rep = shapely.get_coordinates(shapely.point_on_surface(cells))
+    pref_id = np.argmin(((rep[:, None, :] - seeds[None, :, :]) ** 2).sum(axis=2), axis=1)
+
+    pref_block = pd.DataFrame(_PREF_BLOCK_ROWS, columns=["pref_code", "pref_name", "block_id", "block_name"])
+    pref_block = pref_block.iloc[np.arange(n_prefs) % len(pref_block)].reset_index(drop=True)
+
+    order = np.lexsort((rep[:, 0], pref_id))
+    pref_id, cells = pref_id[order], cells[order]
+    rank = np.arange(len(cells)) - np.searchsorted(pref_id, pref_id)
+    pref = pref_block.iloc[pref_id].reset_index(drop=True)
+    codes = [muni_code(p, k + 1) for p, k in zip(pref["pref_code"], rank)]
+    return gpd.GeoDataFrame(
+        {
+            "muni_code": codes,
+            "muni_name": [f"市{c}" for c in codes],
+            "pref_code": pref["pref_code"].to_numpy(),
+            "pref_name": pref["pref_name"].to_numpy(),
+            "block_id": pref["block_id"].astype(str).to_numpy(),
+            "block_name": pref["block_name"].to_numpy(),
+        },
+        geometry=cells,
+        crs=CRS,
+    )
+
+
+def census_tables(
+    codes: np.ndarray, n_tables: int = 5, n_cols: int = 40, seed: int = 0
+) -> list[pd.DataFrame]:
+    """Raw count tables keyed by muni_code, one metric prefix (A, C, F, ...) per table.
+
+    Rows cover `codes` plus the old Hamamatsu wards and their parent code, in
+    shuffled order like the source files.
+    """
+    rng = np.random.default_rng(seed)
+    all_codes = np.concatenate([codes, sorted(HAMAMATSU_OLD_CODES | {"22130"})])
+    tables = []
+    for prefix in "ACFHJ"[:n_tables]:
+        order = rng.permutation(len(all_codes))
+        values = rng.integers(0, 500_000, size=(len(all_codes), n_cols)).astype(np.float64)
+        df = pd.DataFrame(values[order], columns=[f"{prefix}{1101 + i}" for i in range(n_cols)])
+        df.insert(0, "muni_code", all_codes[order])
+        df.insert(1, "muni_name", [f"市{c}" for c in all_codes[order]])
+        tables.append(df)
+    return tables
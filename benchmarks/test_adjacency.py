@@ -0,0 +1,41 @@
+"""build_adjacency: Queen contiguity on a synthetic municipality tessellation."""
+
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("libpysal.weights")
+
+from build_adjacency import _block_from_pref, dissolve_prefs, queen  # noqa: E402
+
+
+def muni_contiguity(gdf):
+    return queen(gdf).sparse.tocsr()
+
+
+def pref_contiguity(gdf):
+    return queen(dissolve_prefs(gdf)).sparse.tocsr()
+
+
+@pytest.mark.benchmark(group="adjacency")
+def test_muni_contiguity(benchmark, muni_tessellation):
+    W = benchmark.pedantic(muni_contiguity, args=(muni_tessellation,), rounds=3, iterations=1)
+    assert W.shape[0] == len(muni_tessellation)
+    assert W.nnz > 0
+
+
+@pytest.mark.benchmark(group="adjacency")
+def test_pref_dissolve_contiguity(benchmark, muni_tessellation):
+    W = benchmark.pedantic(pref_contiguity, args=(muni_tessellation,), rounds=3, iterations=1)
+    assert W.shape[0] == muni_tessellation["pref_code"].nunique()
+
+
+@pytest.mark.benchmark(group="adjacency")
+def test_block_from_pref(benchmark, muni_tessellation):
+    W_pref = pref_contiguity(muni_tessellation)
+    pref_codes = dissolve_prefs(muni_tessellation)["pref_code"]
+    pref_block = muni_tessellation[["pref_code", "block_id"]].drop_duplicates()
+    W = benchmark(_block_from_pref, W_pref, pref_codes, pref_block)
+    # Same as Queen contiguity of the dissolved block polygons
+    blocks = dissolve_prefs(muni_tessellation).dissolve(by="block_id", as_index=False).sort_values("block_id")
+    assert (W != queen(blocks).sparse).nnz == 0
@@ -0,0 +1,32 @@
+"""process_census_muni aggregation: Hamamatsu re-aggregation and positional join."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic
+from muni_code_canonical import HAMAMATSU_NEW_WARDS, MuniIndex
+from process_census_muni import _aggregate_hamamatsu, join_sugata
+
+
+@pytest.fixture(scope="module")
+def census(scale: int) -> tuple[MuniIndex, list[pd.DataFrame]]:
+    codes = synthetic.muni_codes(synthetic.N_MUNI * scale)
+    index = MuniIndex(np.concatenate([codes, sorted(HAMAMATSU_NEW_WARDS)]))
+    return index, synthetic.census_tables(codes)
+
+
+def aggregate(index: MuniIndex, tables: list[pd.DataFrame]) -> pd.DataFrame:
+    """process_census_muni.main from the read sugata tables to the joined frame."""
+    # Each synthetic table holds one metric prefix (A, C, F, ...), as in main
+    return join_sugata(index, [_aggregate_hamamatsu(t, (t.columns[2][0],)) for t in tables])
+
+
+@pytest.mark.benchmark(group="census")
+def test_census_muni_aggregation(benchmark, census):
+    index, tables = census
+    out = benchmark(aggregate, index, tables)
+    assert len(out) == len(index)
+    assert out["muni_code"].isin(list(HAMAMATSU_NEW_WARDS)).sum() == len(HAMAMATSU_NEW_WARDS)
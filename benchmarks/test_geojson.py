@@ -0,0 +1,58 @@
+"""build_geojson_layers: simplification, geometry metadata and GeoJSON encoding."""
+
+from __future__ import annotations
+
+import io
+
+import pytest
+import shapely
+
+from build_geojson_layers import GRID_SIZE, drop_small_parts, muni_candidates, with_geometry_metadata
+from geojson_writer import encoded_chunks, grid_decimals
+
+
+@pytest.fixture(scope="module")
+def pref(muni_tessellation):
+    out = muni_tessellation.dissolve(by="pref_code", as_index=False, aggfunc="first")
+    out["geometry"] = shapely.set_precision(out.geometry.values, GRID_SIZE)
+    return out
+
+
+@pytest.mark.benchmark(group="geojson")
+def test_geometry_metadata(benchmark, muni_tessellation):
+    out = benchmark.pedantic(with_geometry_metadata, args=(muni_tessellation,), rounds=3, iterations=1)
+    assert out["area_km2"].gt(0).all()
+
+
+@pytest.mark.benchmark(group="geojson")
+def test_muni_simplify(benchmark, muni_tessellation):
+    def simplify():
+        _, simplified, _ = next(muni_candidates(muni_tessellation))
+        return simplified
+
+    out = benchmark.pedantic(simplify, rounds=3, iterations=1)
+    assert len(out) == len(muni_tessellation)
+
+
+@pytest.mark.benchmark(group="geojson")
+def test_lod_coverage_simplify(benchmark, pref):
+    def simplify():
+        simplified = shapely.coverage_simplify(pref.geometry.values, 0.02)
+        return drop_small_parts(simplified, 0.02**2)
+
+    out = benchmark(simplify)
+    assert not shapely.is_empty(out).any()
+
+
+@pytest.mark.benchmark(group="geojson")
+def test_muni_encode(benchmark, muni_tessellation):
+    gdf = muni_tessellation.sort_values("muni_code", kind="stable")
+
+    def encode():
+        f = io.StringIO()
+        with encoded_chunks(gdf, grid_decimals(GRID_SIZE), gdf["pref_code"]) as chunks:
+            chunks.write(f)
+        return f.tell()
+
+    size = benchmark.pedantic(encode, rounds=3, iterations=1)
+    assert size > 0
@@ -0,0 +1,51 @@
+"""hirei_merge.merge and hirei_to_json.main on scaled prefecture CSVs."""
+
+from __future__ import annotations
+
+import functools
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import dataio
+import hirei_merge
+import hirei_to_json
+from muni_code_canonical import MuniIndex
+
+
+def _patch_merge(mp: pytest.MonkeyPatch, raw: Path, out_dir: Path) -> None:
+    mp.setattr(hirei_merge, "HIREI_DIR", raw)
+    mp.setattr(hirei_merge, "RAW_DIR", raw / "csv")
+    mp.setattr(hirei_merge, "LOGS_DIR", raw / "logs")
+    mp.setattr(hirei_merge, "OUT_DIR", out_dir)
+
+
+@pytest.fixture(scope="module")
+def hirei_csv(tmp_path_factory: pytest.TempPathFactory, hirei_raw: Path) -> Path:
+    out_dir = tmp_path_factory.mktemp("processed")
+    with pytest.MonkeyPatch.context() as mp:
+        _patch_merge(mp, hirei_raw, out_dir)
+        hirei_merge.merge()
+    return out_dir / "hirei_shikuchouson.csv"
+
+
+@pytest.mark.benchmark(group="hirei")
+def test_hirei_merge(benchmark, hirei_raw, tmp_path, monkeypatch):
+    _patch_merge(monkeypatch, hirei_raw, tmp_path)
+    benchmark.pedantic(hirei_merge.merge, rounds=3, iterations=1)
+    assert (tmp_path / "hirei_shikuchouson.csv").exists()
+
+
+@pytest.mark.benchmark(group="hirei")
+def test_hirei_to_json(benchmark, hirei_csv, tmp_path, monkeypatch):
+    codes = pd.read_csv(hirei_csv, usecols=["muni_code"], dtype=str)["muni_code"].unique()
+    index = MuniIndex(sorted(codes))
+    monkeypatch.setattr(hirei_to_json, "read_hirei", functools.partial(hirei_to_json.read_hirei, hirei_csv))
+    monkeypatch.setattr(hirei_to_json.MuniIndex, "load", classmethod(lambda cls: index))
+    monkeypatch.setattr(hirei_to_json, "OUT_DIR", tmp_path)
+    monkeypatch.setattr(hirei_to_json, "OUT_ELECTION", tmp_path / "election_data.json")
+    monkeypatch.setattr(hirei_to_json, "OUT_PARTIES", tmp_path / "parties.json")
+    # Parse the CSV in every round rather than timing the memoized frame
+    benchmark.pedantic(hirei_to_json.main, setup=dataio.clear_cache, rounds=3, iterations=1)
+    assert (tmp_path / "election_data.json").exists()
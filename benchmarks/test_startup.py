@@ -0,0 +1,59 @@
+"""Startup cost of scripts/pipeline.py commands, measured with -X importtime.
+
+Quick commands must start without geometry / graph / plotting libraries and
+within IMPORT_BUDGET_US of cumulative import time (pandas alone is ~0.3 s).
+"""
+
+from __future__ import annotations
+
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE = Path(__file__).resolve().parent.parent
+PIPELINE = BASE / "scripts" / "pipeline.py"
+
+IMPORT_BUDGET_US = 800_000
+HEAVY = {"geopandas", "shapely", "libpysal", "scipy", "sklearn", "matplotlib", "pyogrio", "fiona"}
+
+# "import time: self [us] | cumulative | <indent>package"
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_profile(*args: str) -> tuple[int, set[str]]:
+    """(cumulative µs of top-level imports, top-level package names) for one run."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", str(PIPELINE), *args],
+        capture_output=True, text=True, check=True,
+    )
+    total, packages = 0, set()
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        if not m.group(3):
+            total += int(m.group(2))
+        packages.add(m.group(4).split(".")[0])
+    return total, packages
+
+
+@pytest.mark.benchmark(group="startup")
+@pytest.mark.parametrize(
+    "args",
+    [
+        ("--help",),
+        ("validate", "--help"),
+        ("names", "--help"),
+        ("parquet", "--help"),
+        ("adjacency", "--help"),
+    ],
+    ids=lambda args: " ".join(args),
+)
+def test_startup(benchmark, args):
+    total, packages = benchmark.pedantic(import_profile, args=args, rounds=3, iterations=1)
+    benchmark.extra_info["import_us"] = total
+    assert not packages & HEAVY, f"heavy imports: {sorted(packages & HEAVY)}"
+    assert total < IMPORT_BUDGET_US, f"import time {total / 1e6:.2f}s over budget"
@@ -1,19 +1,39 @@
 #!/usr/bin/env python3
-"""Build Japanese/English municipality, prefecture, and block name lookups."""
+"""Build Japanese/English municipality, prefecture, and block name lookups.
+
+English names come from a vendored snapshot of the OtterSou municipality table
+(data/master/ottersou_municipalities.tsv), checked against the SHA-256 recorded
+in ottersou_municipalities.json. Refresh it with --refresh-ottersou, the only
+step that needs network access.
+"""
 
 from __future__ import annotations
 
+import argparse
+import datetime
+import hashlib
+import io
 import json
+import sys
+import urllib.request
 from pathlib import Path
 
 import pandas as pd
 
 
 BASE = Path(__file__).resolve().parent.parent
-IN_CSV = BASE / "data" / "processed" / "hirei_shikuchouson.csv"
+sys.path.insert(0, str(BASE / "scripts" / "process"))
+
+from artifact_writer import ArtifactWriter  # noqa: E402
+from dataio import load  # noqa: E402
+from muni_code_canonical import MuniIndex, normalize_muni_codes  # noqa: E402
+
 OTTERSOU_TSV_URL = (
     "https://raw.githubusercontent.com/OtterSou/japan-municipalities/main/0-all.tsv"
 )
+OTTERSOU_TSV = BASE / "data" / "master" / "ottersou_municipalities.tsv"
+OTTERSOU_META = BASE / "data" / "master" / "ottersou_municipalities.json"
+OTTERSOU_COLUMNS = ["code", "full-en", "base-en", "level", "pref", "psub", "muni"]
 OUT_DIR = BASE / "web" / "public" / "data"
 OUT_JA = OUT_DIR / "names_ja.json"
 OUT_EN = OUT_DIR / "names_en.json"
@@ -47,6 +67,26 @@ BLOCK_NAMES_EN = {
 }
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build ja/en name lookup JSON files.")
+    parser.add_argument(
+        "--refresh-ottersou",
+        action="store_true",
+        help="Re-download the OtterSou table into the vendored snapshot before building",
+    )
+    parser.add_argument(
+        "--ottersou-url",
+        default=OTTERSOU_TSV_URL,
+        help="Source URL for --refresh-ottersou (pin to a commit for reproducible snapshots)",
+    )
+    parser.add_argument(
+        "--sha256",
+        default=None,
+        help="Expected SHA-256 of the downloaded table; refresh fails on mismatch",
+    )
+    return parser.parse_args()
+
+
 def clean(value: object) -> str:
     if pd.isna(value):
         return ""
@@ -54,155 +94,173 @@ def clean(value: object) -> str:
 
 
 def read_csv_names() -> tuple[pd.DataFrame, dict[str, dict[str, str]], dict[str, str]]:
-    if not IN_CSV.exists():
-        raise FileNotFoundError(f"Input not found: {IN_CSV}")
-
-    df = pd.read_csv(
-        IN_CSV,
-        dtype={
-            "pref_code": str,
-            "pref_name": str,
-            "muni_code": str,
-            "muni_name": str,
-        },
-        usecols=["pref_code", "pref_name", "muni_code", "muni_name"],
-    )
-    df["pref_code"] = df["pref_code"].astype(str).str.zfill(2)
-    df["muni_code"] = df["muni_code"].astype(str).str.zfill(5)
-
-    muni_df = (
-        df[["muni_code", "muni_name", "pref_code", "pref_name"]]
-        .drop_duplicates(subset=["muni_code"], keep="first")
-        .copy()
-    )
-    pref_df = (
-        df[["pref_code", "pref_name"]]
-        .drop_duplicates(subset=["pref_code"], keep="first")
-        .copy()
-    )
-
-    muni_ja: dict[str, dict[str, str]] = {}
-    for _, row in muni_df.iterrows():
-        muni_code = clean(row["muni_code"]).zfill(5)
-        muni_name = clean(row["muni_name"])
-        pref_name = clean(row["pref_name"])
-        if not muni_code:
-            continue
-        muni_ja[muni_code] = {
-            "short": muni_name,
-            "full": f"{pref_name}{muni_name}" if pref_name else muni_name,
-        }
-
-    pref_ja = {
-        clean(row["pref_code"]).zfill(2): clean(row["pref_name"])
-        for _, row in pref_df.iterrows()
+    # Name columns only; codes arrive zero-padded from the dataio schema
+    df = load("hirei_shikuchouson", ["pref_code", "pref_name", "muni_code", "muni_name"])
+
+    # One row per municipality, in canonical index order
+    index = MuniIndex.load()
+    muni_df = index.align(df[["muni_code", "muni_name", "pref_code", "pref_name"]])
+    muni_df = muni_df[muni_df["muni_name"].notna()].copy()
+    pref_df = df[["pref_code", "pref_name"]].drop_duplicates(subset=["pref_code"], keep="first")
+
+    muni_name = muni_df["muni_name"].map(clean)
+    pref_name = muni_df["pref_name"].map(clean)
+    full = (pref_name + muni_name).where(pref_name != "", muni_name)
+    muni_ja: dict[str, dict[str, str]] = {
+        code: {"short": short, "full": full_name}
+        for code, short, full_name in zip(muni_df["muni_code"], muni_name, full)
+        if code
     }
+
+    pref_ja = dict(zip(pref_df["pref_code"].map(clean), pref_df["pref_name"].map(clean)))
     pref_ja = {k: v for k, v in pref_ja.items() if k and v}
 
     return muni_df, muni_ja, pref_ja
 
 
-def read_ottersou() -> tuple[dict[str, list[dict[str, str]]], dict[str, str]]:
+def fetch_ottersou(url: str = OTTERSOU_TSV_URL) -> bytes:
+    """Download the OtterSou table and check that it has the columns we read."""
+    with urllib.request.urlopen(url, timeout=60) as resp:
+        payload = resp.read()
+    header = payload.split(b"\n", 1)[0].decode("utf-8").rstrip("\r").split("\t")
+    missing = [c for c in OTTERSOU_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"OtterSou table is missing columns: {', '.join(missing)}")
+    return payload
+
+
+def refresh_ottersou(url: str = OTTERSOU_TSV_URL, expected_sha256: str | None = None) -> None:
+    """Download the OtterSou table into the vendored snapshot and record its hash."""
+    payload = fetch_ottersou(url)
+    digest = hashlib.sha256(payload).hexdigest()
+    if expected_sha256 and digest != expected_sha256.lower():
+        raise ValueError(f"SHA-256 mismatch for {url}: got {digest}, expected {expected_sha256}")
+
+    OTTERSOU_TSV.parent.mkdir(parents=True, exist_ok=True)
+    tmp = OTTERSOU_TSV.with_suffix(".tmp")
+    tmp.write_bytes(payload)
+    tmp.replace(OTTERSOU_TSV)
+    meta = {
+        "url": url,
+        "sha256": digest,
+        "bytes": len(payload),
+        "rows": payload.count(b"\n") - 1,
+        "fetched": datetime.date.today().isoformat(),
+    }
+    OTTERSOU_META.write_text(json.dumps(meta, indent=2) + "\n", encoding="utf-8")
+    print(f"Saved {OTTERSOU_TSV} (sha256 {digest[:12]}…)")
+
+
+def read_ottersou() -> tuple[pd.DataFrame, dict[str, str]]:
+    """Read the vendored OtterSou snapshot after checking it against its recorded hash."""
+    if not OTTERSOU_TSV.exists() or not OTTERSOU_META.exists():
+        raise FileNotFoundError(
+            f"OtterSou snapshot not found: {OTTERSOU_TSV}\n"
+            "Run `python scripts/build_names.py --refresh-ottersou` once with network access "
+            "and commit the .tsv and .json it writes."
+        )
+    payload = OTTERSOU_TSV.read_bytes()
+    expected = json.loads(OTTERSOU_META.read_text(encoding="utf-8"))["sha256"]
+    digest = hashlib.sha256(payload).hexdigest()
+    if digest != expected:
+        raise ValueError(
+            f"{OTTERSOU_TSV.name} does not match {OTTERSOU_META.name} "
+            f"(sha256 {digest}, expected {expected}); re-run --refresh-ottersou"
+        )
+
     otter = pd.read_csv(
-        OTTERSOU_TSV_URL,
+        io.BytesIO(payload),
         sep="\t",
         dtype=str,
-        usecols=["code", "full-en", "base-en", "level", "pref", "psub", "muni"],
+        usecols=OTTERSOU_COLUMNS,
+        keep_default_na=False,
     )
-
-    rows_by_code: dict[str, list[dict[str, str]]] = {}
-    for _, row in otter.iterrows():
-        code = clean(row["code"]).zfill(5)
-        if not code:
-            continue
-        item = {
-            "code": code,
-            "full-en": clean(row["full-en"]),
-            "base-en": clean(row["base-en"]),
-            "level": clean(row["level"]),
-            "pref": clean(row["pref"]).zfill(2),
-            "psub": clean(row["psub"]).zfill(5) if clean(row["psub"]) else "",
-            "muni": clean(row["muni"]).zfill(5) if clean(row["muni"]) else "",
-        }
-        rows_by_code.setdefault(code, []).append(item)
-
-    pref_en: dict[str, str] = {}
-    pref_rows = otter[otter["level"] == "1"][["pref", "base-en"]].drop_duplicates(
-        subset=["pref"],
-        keep="first",
+    otter = otter.apply(lambda col: col.str.strip())
+    otter["code"] = otter["code"].str.zfill(5)
+    # Zero-fill only non-empty codes, so rows without a prefecture stay ""
+    otter["pref"] = otter["pref"].where(otter["pref"] == "", otter["pref"].str.zfill(2))
+    for col in ("psub", "muni"):
+        otter[col] = otter[col].where(otter[col] == "", otter[col].str.zfill(5))
+
+    pref_rows = otter[(otter["level"] == "1") & (otter["pref"] != "")]
+    pref_rows = pref_rows.drop_duplicates(subset=["pref"], keep="first")
+    pref_rows = pref_rows[pref_rows["base-en"] != ""]
+    pref_en = dict(zip(pref_rows["pref"], pref_rows["base-en"]))
+
+    return otter, pref_en
+
+
+def index_ottersou(otter: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, str]]:
+    """Code-keyed lookups: the primary (most specific) row, and the preferred base-en name.
+
+    The primary row is the highest admin level for a code (ward > municipality >
+    subprefecture > prefecture); base-en prefers municipality > subprefecture >
+    prefecture > ward rows that have a non-empty name.
+    """
+    primary_rank = otter["level"].map({"4": 4, "3": 3, "2": 2, "1": 1}).fillna(0)
+    primary = (
+        otter.assign(_rank=-primary_rank)
+        .sort_values("_rank", kind="stable")
+        .drop_duplicates(subset=["code"], keep="first")
+        .drop(columns="_rank")
+        .set_index("code")
     )
-    for _, row in pref_rows.iterrows():
-        pref_code = clean(row["pref"]).zfill(2)
-        base_en = clean(row["base-en"])
-        if pref_code and base_en:
-            pref_en[pref_code] = base_en
-
-    return rows_by_code, pref_en
-
 
-def pick_primary_row(rows_by_code: dict[str, list[dict[str, str]]], code: str) -> dict[str, str] | None:
-    rows = rows_by_code.get(code, [])
-    if not rows:
-        return None
-
-    rank = {"4": 4, "3": 3, "2": 2, "1": 1}
-    return max(rows, key=lambda r: rank.get(r["level"], 0))
+    named = otter[otter["base-en"] != ""]
+    base_order = named["level"].map({"3": 0, "2": 1, "1": 2, "4": 3}).fillna(9)
+    base = (
+        named.assign(_order=base_order)
+        .sort_values("_order", kind="stable")
+        .drop_duplicates(subset=["code"], keep="first")
+    )
+    base_en_by_code = dict(zip(base["code"], base["base-en"]))
+    return primary, base_en_by_code
 
 
-def pick_base_en(rows_by_code: dict[str, list[dict[str, str]]], code: str) -> str:
-    if not code:
-        return ""
-    rows = rows_by_code.get(code, [])
-    if not rows:
-        return ""
-
-    order = {"3": 0, "2": 1, "1": 2, "4": 3}
-    for row in sorted(rows, key=lambda r: order.get(r["level"], 9)):
-        if row["base-en"]:
-            return row["base-en"]
-    return ""
+def _join(sep: str, *columns: pd.Series) -> list[str]:
+    return [sep.join(part for part in parts if part) for parts in zip(*columns)]
 
 
 def build_en_names(
     muni_df: pd.DataFrame,
-    rows_by_code: dict[str, list[dict[str, str]]],
+    otter: pd.DataFrame,
     pref_en: dict[str, str],
 ) -> dict[str, dict[str, str]]:
-    muni_en: dict[str, dict[str, str]] = {}
-
-    for _, row in muni_df.iterrows():
-        muni_code = clean(row["muni_code"]).zfill(5)
-        pref_code = clean(row["pref_code"]).zfill(2)
-        muni_name_ja = clean(row["muni_name"])
-        pref_name = pref_en.get(pref_code, "")
-        otter_row = pick_primary_row(rows_by_code, muni_code)
-
-        short = ""
-        full = ""
-
-        if otter_row:
-            base_en = otter_row["base-en"]
-            full_en = otter_row["full-en"]
-            level = otter_row["level"]
-
-            if level == "4":
-                parent_code = otter_row["muni"] or otter_row["psub"]
-                parent_base = pick_base_en(rows_by_code, parent_code)
-                short = " ".join(part for part in (parent_base, base_en) if part)
-                specific = full_en or base_en
-                full = ", ".join(part for part in (specific, parent_base, pref_name) if part)
-            else:
-                short = base_en
-                is_tokyo_special_ward = pref_code == "13" and muni_name_ja.endswith("区")
-                if is_tokyo_special_ward:
-                    specific = full_en if "Ward" in full_en else f"{base_en} Ward"
-                else:
-                    specific = base_en
-                full = ", ".join(part for part in (specific, pref_name) if part)
-
-        muni_en[muni_code] = {"short": short, "full": full}
-
-    return muni_en
+    primary, base_en_by_code = index_ottersou(otter)
+
+    codes = pd.Series(normalize_muni_codes(muni_df["muni_code"]), index=muni_df.index)
+    pref_codes = muni_df["pref_code"].fillna("").astype(str).str.strip().str.zfill(2)
+    rows = primary.reindex(codes.to_numpy()).set_index(muni_df.index)
+    matched = rows["level"].notna()
+    rows = rows.fillna("")
+
+    pref_name = pref_codes.map(pref_en).fillna("")
+    base_en = rows["base-en"]
+    full_en = rows["full-en"]
+
+    # Ward of a designated city: prefix the parent city's name
+    is_ward = rows["level"] == "4"
+    parent_code = rows["muni"].where(rows["muni"] != "", rows["psub"])
+    parent_base = parent_code.map(base_en_by_code).fillna("")
+    specific_ward = full_en.where(full_en != "", base_en)
+
+    muni_name_ja = muni_df["muni_name"].fillna("").astype(str).str.strip()
+    is_tokyo_ward = (pref_codes == "13") & muni_name_ja.str.endswith("区")
+    specific_tokyo = full_en.where(full_en.str.contains("Ward"), base_en + " Ward")
+    specific_muni = specific_tokyo.where(is_tokyo_ward, base_en)
+
+    short = pd.Series(_join(" ", parent_base, base_en), index=muni_df.index).where(is_ward, base_en)
+    full = pd.Series(_join(", ", specific_ward, parent_base, pref_name), index=muni_df.index).where(
+        is_ward,
+        pd.Series(_join(", ", specific_muni, pref_name), index=muni_df.index),
+    )
+    short = short.where(matched, "")
+    full = full.where(matched, "")
+
+    return {
+        code: {"short": s, "full": f}
+        for code, s, f in zip(codes, short, full)
+    }
 
 
 def sorted_dict_values(data: dict[str, object]) -> dict[str, object]:
@@ -210,9 +268,13 @@ def sorted_dict_values(data: dict[str, object]) -> dict[str, object]:
 
 
 def main() -> None:
+    args = parse_args()
+    if args.refresh_ottersou:
+        refresh_ottersou(args.ottersou_url, args.sha256)
+
     muni_df, muni_ja, pref_ja = read_csv_names()
-    rows_by_code, pref_en = read_ottersou()
-    muni_en = build_en_names(muni_df, rows_by_code, pref_en)
+    otter, pref_en = read_ottersou()
+    muni_en = build_en_names(muni_df, otter, pref_en)
 
     names_ja = {
         "muni": sorted_dict_values(muni_ja),
@@ -225,15 +287,15 @@ def main() -> None:
         "block": BLOCK_NAMES_EN,
     }
 
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-    OUT_JA.write_text(
-        json.dumps(names_ja, ensure_ascii=False, separators=(",", ":")),
-        encoding="utf-8",
-    )
-    OUT_EN.write_text(
-        json.dumps(names_en, ensure_ascii=False, separators=(",", ":")),
-        encoding="utf-8",
-    )
+    with ArtifactWriter(OUT_DIR) as writer:
+        writer.write_text(
+            OUT_JA.name,
+            json.dumps(names_ja, ensure_ascii=False, separators=(",", ":")),
+        )
+        writer.write_text(
+            OUT_EN.name,
+            json.dumps(names_en, ensure_ascii=False, separators=(",", ":")),
+        )
 
     print(f"Saved {OUT_JA} ({OUT_JA.stat().st_size / 1024:.1f} KB)")
     print(f"Saved {OUT_EN} ({OUT_EN.stat().st_size / 1024:.1f} KB)")
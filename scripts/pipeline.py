@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Single entry point for the processing stages and tools.
+
+    python scripts/pipeline.py <command> [args ...]
+    python scripts/pipeline.py <command> --help
+
+Each command runs an existing script as __main__, importing it only when the
+command is chosen, so listing commands or running a quick one (validate,
+names, parquet) does not pay for geopandas / libpysal / scipy. The scripts can
+still be run directly.
+"""
+
+from __future__ import annotations
+
+import argparse
+import runpy
+import sys
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parent.parent
+PATHS = [BASE / "scripts" / "process", BASE / "scripts", BASE / "analysis" / "scripts"]
+
+# command -> (module, help), in pipeline order
+COMMANDS = {
+    "merge-hirei": ("hirei_merge", "Merge per-prefecture PR vote CSVs"),
+    "hirei-json": ("hirei_to_json", "Export PR votes as web JSON"),
+    "election-data": ("process_election_data", "Turnout tables from the MIC spreadsheets"),
+    "census-muni": ("process_census_muni", "Municipal census features"),
+    "census-district": ("process_census_district", "District census features"),
+    "census-small-area": ("process_census_small_area", "Small-area census aggregation"),
+    "master-table": ("build_master_table", "District master table"),
+    "adjacency": ("build_adjacency", "Queen adjacency matrices"),
+    "geojson": ("build_geojson_layers", "Simplified GeoJSON layers"),
+    "class-breaks": ("build_class_breaks", "Choropleth class breaks"),
+    "mode-metrics": ("build_mode_metrics", "Map-mode metrics"),
+    "spatial-lags": ("build_spatial_lags", "Spatially lagged census features"),
+    "census-pca": ("build_census_pca", "Census PCA"),
+    "hirei-district": ("build_hirei_district", "PR votes allocated to districts"),
+    "tensor-store": ("build_tensor_store", "Model tensor store"),
+    "election-store": ("build_election_store", "Election result store"),
+    "spatial-stats": ("spatial_stats", "Spatial autocorrelation statistics"),
+    "names": ("build_names", "Japanese/English name lookups"),
+    "parquet": ("dataio", "Parquet copies of processed tables"),
+    "validate": ("validate_processed", "Check processed tables against their schemas"),
+    "serve": ("serve_api", "Local query API"),
+    "plot-map": ("plot_census_muni_map", "Municipal choropleth maps"),
+    "tiles": ("render_map_tiles", "Pre-rendered map tiles"),
+}
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="pipeline.py",
+        usage="%(prog)s [-h] command [args ...]",
+        description="Run a processing stage or tool. Arguments after the command go to it.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:18s} {help_}" for name, (_, help_) in COMMANDS.items()),
+    )
+    p.add_argument("command", choices=COMMANDS, metavar="command", help="Command to run (see below)")
+    p.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    return p.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    module = COMMANDS[args.command][0]
+    sys.path[:0] = [str(p) for p in PATHS if str(p) not in sys.path]
+    sys.argv = [f"{Path(sys.argv[0]).name} {args.command}", *args.args]
+    runpy.run_module(module, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Shared writer for web artifacts (JSON / GeoJSON) served as static files.
+
+Every artifact is
+  - written atomically (temp file in the target directory + os.replace),
+  - copied to a content-hashed name (election_data.<sha12>.json) for immutable caching,
+  - precompressed to .gz (and .br when the brotli package is installed) at
+    maximum compression, in a thread pool shared across files,
+  - hashed, copied and compressed from disk in BLOCK_SIZE blocks, so a streamed
+    artifact is never held in memory whole,
+  - recorded in <out_dir>/manifest.json (fixed name -> hashed name, sizes, hash).
+
+Exporters keep writing the fixed names the web app fetches today, so adopting
+the hashed names is opt-in on the client side.
+
+    with ArtifactWriter(OUT_DIR) as writer:
+        writer.write_text("election_data.json", text)
+        with writer.open("municipalities.geojson") as f:   # streamed
+            f.write(...)
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+BLOCK_SIZE = 1 << 20
+# mkstemp creates 0600 files; published artifacts must be world-readable
+FILE_MODE = 0o644
+
+
+@contextmanager
+def atomic_open(path: Path) -> Iterator[IO[bytes]]:
+    """Binary file at path via a temp file in the same directory, replaced only on success."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.chmod(tmp, FILE_MODE)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write data to path via a temp file in the same directory."""
+    with atomic_open(path) as f:
+        f.write(data)
+
+
+def atomic_copy(src: Path, dst: Path) -> None:
+    """Copy src to dst atomically, in BLOCK_SIZE blocks."""
+    with open(src, "rb") as f, atomic_open(dst) as out:
+        shutil.copyfileobj(f, out, BLOCK_SIZE)
+
+
+def file_sha256(path: Path) -> tuple[str, int]:
+    """(hex digest, size) of a file, read in BLOCK_SIZE blocks."""
+    h = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while block := f.read(BLOCK_SIZE):
+            h.update(block)
+            size += len(block)
+    return h.hexdigest(), size
+
+
+def hashed_name(name: str, digest: str) -> str:
+    """election_data.json -> election_data.<digest[:12]>.json"""
+    stem, dot, suffix = name.partition(".")
+    return f"{stem}.{digest[:HASH_LENGTH]}{dot}{suffix}"
+
+
+def _sibling(path: Path, ext: str) -> Path:
+    return path.with_name(f"{path.name}.{ext}")
+
+
+def _compress(source: Path, targets: list[Path]) -> dict[str, int]:
+    """Write .gz / .br siblings of every target path, streaming source; return sizes.
+
+    source holds the targets' content and must not change while this runs (the
+    content-hashed copy, when there is one). Compressed once, then copied.
+    """
+    first = targets[0]
+    exts = ["gz"] if brotli is None else ["gz", "br"]
+    with open(source, "rb") as f, atomic_open(_sibling(first, "gz")) as gz_out:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=gz_out, compresslevel=9, mtime=0) as gz:
+            if brotli is None:
+                shutil.copyfileobj(f, gz, BLOCK_SIZE)
+            else:
+                br = brotli.Compressor(quality=11)
+                with atomic_open(_sibling(first, "br")) as br_out:
+                    while block := f.read(BLOCK_SIZE):
+                        gz.write(block)
+                        br_out.write(br.process(block))
+                    br_out.write(br.finish())
+    for target in targets[1:]:
+        for ext in exts:
+            atomic_copy(_sibling(first, ext), _sibling(target, ext))
+    return {ext: _sibling(first, ext).stat().st_size for ext in exts}
+
+
+class ArtifactWriter:
+    """Atomic, content-hashed, precompressed artifact output for one directory."""
+
+    def __init__(
+        self,
+        out_dir: Path,
+        hashed: bool = True,
+        compress: bool = True,
+        workers: int | None = None,
+    ) -> None:
+        self.out_dir = Path(out_dir)
+        self.hashed = hashed
+        self.compress = compress
+        self._pool = ThreadPoolExecutor(max_workers=workers) if compress else None
+        self._pending: dict[str, Future] = {}
+        self._entries: dict[str, dict] = {}
+        if compress and brotli is None:
+            print("Warning: brotli not installed. Writing .gz siblings only.")
+
+    def __enter__(self) -> ArtifactWriter:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        elif self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    @contextmanager
+    def open(self, name: str) -> Iterator[IO[str]]:
+        """Stream a UTF-8 text artifact; it is published only if the block succeeds."""
+        path = self.out_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="", buffering=BLOCK_SIZE) as f:
+                yield f
+            os.chmod(tmp, FILE_MODE)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self._publish(name)
+
+    def write_bytes(self, name: str, data: bytes) -> Path:
+        path = self.out_dir / name
+        atomic_write_bytes(path, data)
+        self._publish(name)
+        return path
+
+    def write_text(self, name: str, text: str) -> Path:
+        return self.write_bytes(name, text.encode("utf-8"))
+
+    def _publish(self, name: str) -> None:
+        path = self.out_dir / name
+        digest, size = file_sha256(path)
+        entry = {"sha256": digest, "bytes": size}
+        targets = [path]
+        source = path
+        if self.hashed:
+            hashed = self.out_dir / hashed_name(name, digest)
+            if not hashed.exists():
+                atomic_copy(path, hashed)
+            entry["hashed"] = hashed.name
+            # Compress the immutable copy: path may be rewritten before the pool gets to it
+            targets.insert(0, hashed)
+            source = hashed
+        self._entries[name] = entry
+        if self._pool is not None:
+            self._pending[name] = self._pool.submit(_compress, source, targets)
+
+    def close(self) -> None:
+        """Wait for compression, drop superseded hashed copies and update the manifest."""
+        if self._pool is not None:
+            for name, future in self._pending.items():
+                self._entries[name].update({f"{ext}_bytes": n for ext, n in future.result().items()})
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if not self._entries:
+            return
+
+        manifest_path = self.out_dir / MANIFEST_NAME
+        manifest = {"files": {}}
+        if manifest_path.exists():
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        for name, entry in self._entries.items():
+            old = manifest["files"].get(name, {}).get("hashed")
+            if old and old != entry.get("hashed"):
+                for stale in (old, f"{old}.gz", f"{old}.br"):
+                    (self.out_dir / stale).unlink(missing_ok=True)
+            manifest["files"][name] = entry
+        manifest["files"] = dict(sorted(manifest["files"].items()))
+        atomic_write_bytes(
+            manifest_path,
+            (json.dumps(manifest, ensure_ascii=False, indent=2) + "\n").encode("utf-8"),
+        )
+        print(f"Saved {manifest_path} ({len(self._entries)} artifacts)")
+        self._entries = {}
+        self._pending = {}
@@ -5,20 +5,21 @@
       data/raw/gis/N03_2025/N03-20250101.shp（市区町村ポリゴン）
 出力: data/processed/adj_district.npz + adj_district_nodes.csv（選挙区隣接行列）
       data/processed/adj_muni.npz + adj_muni_nodes.csv（市区町村隣接行列）
+      data/processed/muni_index.npy（市区町村コード⇔位置の基準インデックス）
       data/processed/adj_pref.npz + adj_pref_nodes.csv（都道府県隣接行列）
       data/processed/adj_block.npz + adj_block_nodes.csv（比例ブロック隣接行列）
+
+比例ブロックの隣接は adj_pref.npz があれば都道府県の隣接から集約する（ポリゴン不要）。
+geopandas / libpysal / scipy は使う関数の中で import する。
 """
 
 import argparse
-import time
 import numpy as np
 import pandas as pd
-import geopandas as gpd
-from scipy import sparse
-from libpysal.weights import Queen
 from pathlib import Path
 
-from muni_code_canonical import EXCLUDE_CODES
+from instrumentation import record_rows, stage, step
+from muni_code_canonical import EXCLUDE_CODES, MuniIndex
 
 BASE = Path(__file__).resolve().parent.parent.parent
 GIS = BASE / "data" / "raw" / "gis"
@@ -37,16 +38,41 @@ def parse_args() -> argparse.Namespace:
     return p.parse_args()
 
 
+def read_polygons(shp: Path):
+    import geopandas as gpd
+
+    return gpd.read_file(shp)
+
+
+def queen(gdf):
+    """Queen contiguity of gdf rows (libpysal is the slowest import of this stage)."""
+    from libpysal.weights import Queen
+
+    return Queen.from_dataframe(gdf, use_index=False)
+
+
+def dissolve_prefs(gdf_muni):
+    """One polygon per pref_code (sorted), attributes from the first municipality."""
+    gdf_pref = gdf_muni.dissolve(by="pref_code", as_index=False, aggfunc="first")
+    return gdf_pref.sort_values("pref_code").reset_index(drop=True)
+
+
+def save_npz(path: Path, W) -> None:
+    from scipy import sparse
+
+    sparse.save_npz(path, W)
+
+
+@step("district adjacency")
 def build_district_adjacency():
     """Build Queen contiguity for 289 electoral districts."""
     print("=" * 60)
     print("Electoral district adjacency (289 units)")
     print("=" * 60)
 
-    t0 = time.time()
     shp = GIS / "senkyoku2022" / "senkyoku2022.shp"
     print(f"Reading: {shp.name}")
-    gdf = gpd.read_file(shp)
+    gdf = read_polygons(shp)
     print(f"  Raw polygons: {len(gdf):,}")
     print(f"  CRS: {gdf.crs}")
 
@@ -60,7 +86,7 @@ def build_district_adjacency():
 
     # Build Queen contiguity
     print("Computing Queen contiguity...")
-    w = Queen.from_dataframe(gdf_dissolved, use_index=False)
+    w = queen(gdf_dissolved)
     print(f"  Neighbors: min={w.min_neighbors}, max={w.max_neighbors}, "
           f"mean={w.mean_neighbors:.1f}")
 
@@ -82,7 +108,7 @@ def build_district_adjacency():
 
     # Save sparse matrix
     W_sparse = w.sparse.tocsr()
-    sparse.save_npz(OUT / "adj_district.npz", W_sparse)
+    save_npz(OUT / "adj_district.npz", W_sparse)
     print(f"  Saved: adj_district.npz ({W_sparse.nnz} nonzeros)")
 
     # Save node mapping
@@ -100,10 +126,11 @@ def build_district_adjacency():
             neighbors = [gdf_dissolved.loc[j, "kuname"] for j in w.neighbors[idx]]
             print(f"  {name} ({w.cardinalities[idx]} neighbors): {', '.join(neighbors)}")
 
-    print(f"  Elapsed: {time.time() - t0:.1f}s")
+    record_rows(rows_in=len(gdf), rows_out=n)
     return W_sparse, nodes
 
 
+@step("muni adjacency")
 def build_muni_adjacency():
     """Build Queen contiguity for municipalities."""
     print()
@@ -111,10 +138,9 @@ def build_muni_adjacency():
     print("Municipality adjacency")
     print("=" * 60)
 
-    t0 = time.time()
     shp = GIS / "N03_2025" / "N03-20250101.shp"
     print(f"Reading: {shp.name} (this may take a minute...)")
-    gdf = gpd.read_file(shp)
+    gdf = read_polygons(shp)
     print(f"  Raw polygons: {len(gdf):,}")
     print(f"  CRS: {gdf.crs}")
 
@@ -141,7 +167,7 @@ def build_muni_adjacency():
 
     # Build Queen contiguity
     print("Computing Queen contiguity (this may take a moment)...")
-    w = Queen.from_dataframe(gdf_dissolved, use_index=False)
+    w = queen(gdf_dissolved)
     print(f"  Neighbors: min={w.min_neighbors}, max={w.max_neighbors}, "
           f"mean={w.mean_neighbors:.1f}")
 
@@ -164,7 +190,7 @@ def build_muni_adjacency():
 
     # Save sparse matrix
     W_sparse = w.sparse.tocsr()
-    sparse.save_npz(OUT / "adj_muni.npz", W_sparse)
+    save_npz(OUT / "adj_muni.npz", W_sparse)
     print(f"  Saved: adj_muni.npz ({W_sparse.nnz} nonzeros)")
 
     # Save node mapping
@@ -172,6 +198,8 @@ def build_muni_adjacency():
     nodes.index.name = "idx"
     nodes.to_csv(OUT / "adj_muni_nodes.csv", encoding="utf-8")
     print(f"  Saved: adj_muni_nodes.csv")
+    MuniIndex(nodes["muni_code"]).save(OUT / "muni_index.npy")
+    print(f"  Saved: muni_index.npy")
 
     # Spot checks
     print(f"\nSpot checks:")
@@ -188,14 +216,14 @@ def build_muni_adjacency():
             suffix = "..." if n_neighbors > 8 else ""
             print(f"  {name} ({n_neighbors} neighbors): {', '.join(neighbor_names)}{suffix}")
 
-    print(f"  Elapsed: {time.time() - t0:.1f}s")
+    record_rows(rows_in=len(gdf), rows_out=n)
     return W_sparse, nodes
 
 
 def _load_muni_polygons():
     """Load and dissolve municipality polygons with canonical exclusions applied."""
     shp = GIS / "N03_2025" / "N03-20250101.shp"
-    gdf = gpd.read_file(shp)
+    gdf = read_polygons(shp)
     gdf["muni_code"] = gdf["N03_007"]
     gdf["pref_code"] = gdf["muni_code"].astype(str).str[:2]
     gdf["muni_name"] = gdf["N03_004"].fillna("") + gdf["N03_005"].fillna("")
@@ -208,6 +236,7 @@ def _load_muni_polygons():
     return gdf_dissolved
 
 
+@step("pref adjacency")
 def build_pref_adjacency():
     """Build Queen contiguity for 47 prefectures from municipality polygons."""
     print()
@@ -215,13 +244,11 @@ def build_pref_adjacency():
     print("Prefecture adjacency")
     print("=" * 60)
 
-    t0 = time.time()
     print("Loading municipality polygons...")
     gdf_muni = _load_muni_polygons()
 
     print("Dissolving by pref_code...")
-    gdf_pref = gdf_muni.dissolve(by="pref_code", as_index=False, aggfunc="first")
-    gdf_pref = gdf_pref.sort_values("pref_code").reset_index(drop=True)
+    gdf_pref = dissolve_prefs(gdf_muni)
 
     # Keep only prefectures present in district_master (01-47)
     pref_master = pd.read_csv(DISTRICT_MASTER, dtype={"pref_code": str})[["pref_code"]].drop_duplicates()
@@ -234,69 +261,113 @@ def build_pref_adjacency():
     assert n == 47, f"Expected 47 prefectures, got {n}"
 
     print("Computing Queen contiguity...")
-    w = Queen.from_dataframe(gdf_pref, use_index=False)
+    w = queen(gdf_pref)
     print(f"  Neighbors: min={w.min_neighbors}, max={w.max_neighbors}, mean={w.mean_neighbors:.1f}")
 
     W_sparse = w.sparse.tocsr()
-    sparse.save_npz(OUT / "adj_pref.npz", W_sparse)
+    save_npz(OUT / "adj_pref.npz", W_sparse)
     print(f"  Saved: adj_pref.npz ({W_sparse.nnz} nonzeros)")
 
     nodes = gdf_pref[["pref_code", "pref_name"]].copy()
     nodes.index.name = "idx"
     nodes.to_csv(OUT / "adj_pref_nodes.csv", encoding="utf-8")
     print("  Saved: adj_pref_nodes.csv")
-    print(f"  Elapsed: {time.time() - t0:.1f}s")
+    record_rows(rows_in=len(gdf_muni), rows_out=n)
     return W_sparse, nodes
 
 
+def _block_from_pref(W_pref, pref_codes, pref_block: pd.DataFrame):
+    """Block contiguity (sorted block_id order) aggregated from prefecture contiguity.
+
+    Two blocks touch iff some of their prefectures do, which is what Queen
+    contiguity of the dissolved block polygons gives, without any geometry.
+    pref_codes labels the rows of W_pref.
+    """
+    from scipy import sparse
+
+    block_ids = np.sort(pref_block["block_id"].unique())
+    block_of = pref_block.drop_duplicates("pref_code").set_index("pref_code")["block_id"]
+    b = pd.Index(block_ids).get_indexer(pd.Series(pref_codes).map(block_of))
+    if (b < 0).any():
+        raise ValueError("Missing block_id for some prefectures in block adjacency build")
+    M = sparse.csr_matrix((np.ones(len(b)), (b, np.arange(len(b)))), shape=(len(block_ids), len(b)))
+    W = (M @ sparse.csr_matrix(W_pref) @ M.T).tolil()
+    W.setdiag(0)
+    W = W.tocsr()
+    W.eliminate_zeros()
+    W.data[:] = 1.0
+    return W
+
+
+@step("block adjacency")
 def build_block_adjacency():
-    """Build Queen contiguity for 11 PR blocks via prefecture-to-block dissolve."""
+    """Build Queen contiguity for 11 PR blocks (from adj_pref, else via prefecture-to-block dissolve)."""
     print()
     print("=" * 60)
     print("Block adjacency")
     print("=" * 60)
 
-    t0 = time.time()
-    print("Loading municipality polygons...")
-    gdf_muni = _load_muni_polygons()
-
-    print("Dissolving to prefectures...")
-    gdf_pref = gdf_muni.dissolve(by="pref_code", as_index=False, aggfunc="first")
-    gdf_pref = gdf_pref.sort_values("pref_code").reset_index(drop=True)
-
     pref_block = pd.read_csv(DISTRICT_MASTER, dtype={"pref_code": str})[
         ["pref_code", "block_id", "block_name"]
     ].drop_duplicates()
     pref_block["pref_code"] = pref_block["pref_code"].str.zfill(2)
 
-    gdf_pref = gdf_pref.merge(pref_block, on="pref_code", how="inner")
-    if gdf_pref["block_id"].isna().any():
-        raise ValueError("Missing block_id for some prefectures in block adjacency build")
-
-    print("Dissolving by block_id...")
-    gdf_block = gdf_pref.dissolve(by="block_id", as_index=False, aggfunc="first")
-    gdf_block = gdf_block.sort_values("block_id").reset_index(drop=True)
-
-    n = len(gdf_block)
-    print(f"  Blocks: {n}")
-    assert n == 11, f"Expected 11 blocks, got {n}"
-
-    print("Computing Queen contiguity...")
-    w = Queen.from_dataframe(gdf_block, use_index=False)
-    print(f"  Neighbors: min={w.min_neighbors}, max={w.max_neighbors}, mean={w.mean_neighbors:.1f}")
-
-    W_sparse = w.sparse.tocsr()
-    sparse.save_npz(OUT / "adj_block.npz", W_sparse)
+    pref_npz, pref_nodes = OUT / "adj_pref.npz", OUT / "adj_pref_nodes.csv"
+    if pref_npz.exists() and pref_nodes.exists():
+        from scipy import sparse
+
+        print(f"Aggregating {pref_npz.name} to blocks...")
+        prefs = pd.read_csv(pref_nodes, dtype={"pref_code": str})
+        W_sparse = _block_from_pref(sparse.load_npz(pref_npz), prefs["pref_code"].str.zfill(2), pref_block)
+        rows_in = len(prefs)
+        nodes = (
+            pref_block[["block_id", "block_name"]]
+            .drop_duplicates("block_id")
+            .sort_values("block_id")
+            .reset_index(drop=True)
+        )
+        n = len(nodes)
+        print(f"  Blocks: {n}")
+        assert n == 11, f"Expected 11 blocks, got {n}"
+        k = np.diff(W_sparse.indptr)
+        print(f"  Neighbors: min={k.min()}, max={k.max()}, mean={k.mean():.1f}")
+    else:
+        print("Loading municipality polygons...")
+        gdf_muni = _load_muni_polygons()
+        rows_in = len(gdf_muni)
+
+        print("Dissolving to prefectures...")
+        gdf_pref = dissolve_prefs(gdf_muni)
+
+        gdf_pref = gdf_pref.merge(pref_block, on="pref_code", how="inner")
+        if gdf_pref["block_id"].isna().any():
+            raise ValueError("Missing block_id for some prefectures in block adjacency build")
+
+        print("Dissolving by block_id...")
+        gdf_block = gdf_pref.dissolve(by="block_id", as_index=False, aggfunc="first")
+        gdf_block = gdf_block.sort_values("block_id").reset_index(drop=True)
+
+        n = len(gdf_block)
+        print(f"  Blocks: {n}")
+        assert n == 11, f"Expected 11 blocks, got {n}"
+
+        print("Computing Queen contiguity...")
+        w = queen(gdf_block)
+        print(f"  Neighbors: min={w.min_neighbors}, max={w.max_neighbors}, mean={w.mean_neighbors:.1f}")
+        W_sparse = w.sparse.tocsr()
+        nodes = gdf_block[["block_id", "block_name"]].copy()
+
+    save_npz(OUT / "adj_block.npz", W_sparse)
     print(f"  Saved: adj_block.npz ({W_sparse.nnz} nonzeros)")
 
-    nodes = gdf_block[["block_id", "block_name"]].copy()
     nodes.index.name = "idx"
     nodes.to_csv(OUT / "adj_block_nodes.csv", encoding="utf-8")
     print("  Saved: adj_block_nodes.csv")
-    print(f"  Elapsed: {time.time() - t0:.1f}s")
+    record_rows(rows_in=rows_in, rows_out=n)
     return W_sparse, nodes
 
 
+@stage("build_adjacency")
 def main():
     args = parse_args()
     OUT.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""センサス特徴量の主成分分析（人口加重標準化＋欠損補完＋ランダム化/逐次PCA）
+
+census_muni.csv / census_district.csv（または同形式の町丁字データ）を chunk 単位で読み、
+1) 人口（pop_total）加重の平均・標準偏差で各特徴量を標準化
+2) 欠損は加重平均で補完（標準化後の 0）、全欠損のプレースホルダ列
+   （pct_married, pct_ict_industry 等）は自動的に除外
+3) randomized PCA（メモリ内）または IncrementalPCA（chunk ごとの partial_fit）で学習
+した結果を、入力ファイルのハッシュとパラメータをキーにキャッシュする。
+
+入力: data/processed/census_muni.csv（--level muni）
+      data/processed/census_district.csv（--level district）
+      任意の同形式CSV（--input、数十万行の町丁字データ等）
+出力: data/processed/pca_{level}_model.npz（平均・尺度・主成分・寄与率・キャッシュキー）
+      data/processed/pca_{level}_loadings.csv（特徴量×主成分）
+      data/processed/pca_{level}_scores.csv（単位×主成分、chunk ごとに追記）
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import record_rows, stage, step
+
+if TYPE_CHECKING:
+    from sklearn.decomposition import PCA, IncrementalPCA
+
+BASE = Path(__file__).resolve().parent.parent.parent
+PROCESSED = BASE / "data" / "processed"
+INPUTS = {
+    "muni": PROCESSED / "census_muni.csv",
+    "district": PROCESSED / "census_district.csv",
+}
+
+WEIGHT_COL = "pop_total"
+# Identifier / size columns that are never PCA inputs
+NON_FEATURE_COLS = {
+    "muni_code", "muni_name", "pref_code", "pref_name", "kucode", "kuname",
+    "block_id", "block_name", "key_code", "pop_total", "n_hh_total",
+}
+# Right-skewed level variables, log-transformed before standardization
+LOG_FEATURES = {"pop_density", "taxable_income_per_capita"}
+ID_DTYPES = {"muni_code": str, "pref_code": str, "kucode": str, "key_code": str}
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Population-weighted PCA over census features.")
+    p.add_argument("--level", choices=sorted(INPUTS), default="muni", help="Census table (default: muni)")
+    p.add_argument("--input", type=Path, default=None, help="Override input CSV (e.g. small-area census)")
+    p.add_argument(
+        "--method",
+        choices=["randomized", "incremental"],
+        default="randomized",
+        help="randomized: in-memory randomized SVD; incremental: chunked partial_fit (default: randomized)",
+    )
+    p.add_argument("--n-components", type=int, default=8, help="Number of components (default: 8)")
+    p.add_argument("--chunk-size", type=int, default=50_000, help="Rows per CSV chunk (default: 50000)")
+    p.add_argument("--seed", type=int, default=0, help="Random seed for randomized SVD")
+    p.add_argument("--force", action="store_true", help="Refit even if a matching cache exists")
+    return p.parse_args()
+
+
+def iter_chunks(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    yield from pd.read_csv(path, chunksize=chunk_size, dtype=ID_DTYPES)
+
+
+def _batches(chunks: Iterator[pd.DataFrame], min_rows: int) -> Iterator[pd.DataFrame]:
+    """Yield chunks, merging a short trailing chunk into its predecessor."""
+    prev = None
+    for chunk in chunks:
+        if prev is not None:
+            if len(chunk) < min_rows:
+                chunk = pd.concat([prev, chunk], ignore_index=True)
+            else:
+                yield prev
+        prev = chunk
+    if prev is not None:
+        yield prev
+
+
+def _raw_features(chunk: pd.DataFrame, features: list[str]) -> np.ndarray:
+    X = chunk[features].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64, copy=True)
+    for j, col in enumerate(features):
+        if col in LOG_FEATURES:
+            X[:, j] = np.log(np.where(X[:, j] > 0, X[:, j], np.nan))
+    return X
+
+
+def _weights(chunk: pd.DataFrame) -> np.ndarray:
+    if WEIGHT_COL not in chunk.columns:
+        return np.ones(len(chunk))
+    w = pd.to_numeric(chunk[WEIGHT_COL], errors="coerce").to_numpy(dtype=np.float64)
+    return np.where(np.isfinite(w) & (w > 0), w, 0.0)
+
+
+def weighted_moments(path: Path, chunk_size: int) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """One streaming pass: NaN-aware population-weighted mean and std per feature.
+
+    Features with no observed values (all-NaN placeholders) or zero variance are dropped.
+    """
+    features: list[str] | None = None
+    for chunk in iter_chunks(path, chunk_size):
+        if features is None:
+            features = [
+                c for c in chunk.columns
+                if c not in NON_FEATURE_COLS and pd.api.types.is_numeric_dtype(chunk[c])
+            ]
+            sw = np.zeros(len(features))
+            swx = np.zeros(len(features))
+            swx2 = np.zeros(len(features))
+        X = _raw_features(chunk, features)
+        w = _weights(chunk)[:, None] * ~np.isnan(X)
+        X0 = np.nan_to_num(X)
+        sw += w.sum(axis=0)
+        swx += (w * X0).sum(axis=0)
+        swx2 += (w * X0 * X0).sum(axis=0)
+    if features is None:
+        raise ValueError(f"No rows in {path}")
+
+    mean = np.divide(swx, sw, out=np.full(len(features), np.nan), where=sw > 0)
+    var = np.divide(swx2, sw, out=np.full(len(features), np.nan), where=sw > 0) - mean**2
+    scale = np.sqrt(np.clip(var, 0, None))
+    keep = (sw > 0) & (scale > 0)
+    dropped = [f for f, k in zip(features, keep) if not k]
+    if dropped:
+        print(f"Dropping {len(dropped)} empty/constant columns: {', '.join(dropped)}")
+    return [f for f, k in zip(features, keep) if k], mean[keep], scale[keep]
+
+
+def standardize(chunk: pd.DataFrame, features: list[str], mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """Standardize with the weighted moments; missing values become 0 (= weighted mean)."""
+    Z = (_raw_features(chunk, features) - mean) / scale
+    return np.nan_to_num(Z, nan=0.0)
+
+
+def cache_key(path: Path, params: dict) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def fit(
+    path: Path, features: list[str], mean: np.ndarray, scale: np.ndarray, args: argparse.Namespace
+) -> PCA | IncrementalPCA:
+    from sklearn.decomposition import PCA, IncrementalPCA
+
+    k = min(args.n_components, len(features))
+    if args.method == "incremental":
+        model = IncrementalPCA(n_components=k)
+        for chunk in _batches(iter_chunks(path, args.chunk_size), k):
+            model.partial_fit(standardize(chunk, features, mean, scale))
+        return model
+
+    Z = np.vstack([standardize(c, features, mean, scale) for c in iter_chunks(path, args.chunk_size)])
+    model = PCA(n_components=k, svd_solver="randomized", random_state=args.seed)
+    return model.fit(Z)
+
+
+@stage("build_census_pca")
+def main() -> None:
+    args = parse_args()
+    path = args.input or INPUTS[args.level]
+    if not path.exists():
+        raise FileNotFoundError(f"Input not found: {path}")
+
+    out_model = PROCESSED / f"pca_{args.level}_model.npz"
+    out_loadings = PROCESSED / f"pca_{args.level}_loadings.csv"
+    out_scores = PROCESSED / f"pca_{args.level}_scores.csv"
+
+    params = {"method": args.method, "n_components": args.n_components, "seed": args.seed}
+    key = cache_key(path, params)
+    if not args.force and out_model.exists() and out_scores.exists():
+        cached = np.load(out_model, allow_pickle=False)
+        if str(cached["cache_key"]) == key:
+            print(f"Cache hit: {out_model.name} (use --force to refit)")
+            return
+
+    with step("fit"):
+        features, mean, scale = weighted_moments(path, args.chunk_size)
+        print(f"Input: {path.name} ({len(features)} features, method={args.method})")
+        model = fit(path, features, mean, scale, args)
+    pcs = [f"PC{i + 1}" for i in range(model.n_components_)]
+
+    # Scores are transformed and appended chunk by chunk.
+    id_cols = None
+    n_rows = 0
+    with step("scores"), open(out_scores, "w", encoding="utf-8", newline="") as f:
+        for i, chunk in enumerate(iter_chunks(path, args.chunk_size)):
+            if id_cols is None:
+                id_cols = [c for c in chunk.columns if c in NON_FEATURE_COLS - {"pop_total", "n_hh_total"}]
+            scores = pd.DataFrame(model.transform(standardize(chunk, features, mean, scale)), columns=pcs)
+            out = pd.concat([chunk[id_cols].reset_index(drop=True), scores], axis=1)
+            out.to_csv(f, index=False, header=(i == 0))
+            n_rows += len(out)
+    record_rows(rows_in=n_rows, rows_out=n_rows)
+
+    loadings = pd.DataFrame(model.components_.T, index=features, columns=pcs)
+    loadings.index.name = "feature"
+    loadings.to_csv(out_loadings, encoding="utf-8")
+
+    np.savez(
+        out_model,
+        features=np.array(features),
+        mean=mean,
+        scale=scale,
+        log_features=np.array(sorted(LOG_FEATURES & set(features))),
+        components=model.components_,
+        explained_variance=model.explained_variance_,
+        explained_variance_ratio=model.explained_variance_ratio_,
+        cache_key=np.array(key),
+    )
+
+    print(f"Saved: {out_model}")
+    print(f"Saved: {out_loadings}")
+    print(f"Saved: {out_scores}")
+    print("\nExplained variance ratio:")
+    cum = 0.0
+    for pc, ratio in zip(pcs, model.explained_variance_ratio_):
+        cum += ratio
+        top = loadings[pc].abs().sort_values(ascending=False).index[:3]
+        print(f"  {pc}: {ratio:6.3f} (cum {cum:5.3f})  top: {', '.join(top)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Precompute choropleth class breaks per party, mode and granularity.
+
+Replaces the browser-side buildPartyBreaks / computeActiveScale scans: for every
+value series the map can color by (see build_mode_metrics.py), this computes
+
+  quantile        breaks at PARTY_QUANTILES (share mode: anchored at 0, like
+                  buildPartyBreaks)
+  equal_interval  k equal-width classes between min and max
+  jenks           Fisher-Jenks natural breaks (exact optimum, O(k·n log n))
+
+plus the q05 / q95 summary the client uses for its color range. Breaks are the
+lower bound of each class, the same layout as FIXED_BREAKS in constants.js.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+
+import numpy as np
+
+from artifact_writer import ArtifactWriter
+from build_mode_metrics import mode_metrics
+from hirei_to_json import OUT_DIR
+from instrumentation import record_rows, stage, step
+
+
+OUT_BREAKS = OUT_DIR / "class_breaks.json"
+
+# Mirrors PARTY_QUANTILES in web/modules/constants.js
+PARTY_QUANTILES = [0, 0.1, 0.25, 0.4, 0.55, 0.7, 0.85, 0.95]
+DECIMALS = 6
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Precompute class breaks for the web map.")
+    p.add_argument(
+        "--classes",
+        type=int,
+        default=len(PARTY_QUANTILES),
+        help=f"Number of classes for equal-interval and Jenks (default: {len(PARTY_QUANTILES)})",
+    )
+    return p.parse_args()
+
+
+def jenks_breaks(values: np.ndarray, k: int) -> np.ndarray:
+    """Fisher-Jenks optimal k-class partition of values (class lower bounds).
+
+    Dynamic programme over sorted values with O(1) segment costs from prefix
+    sums. The optimal split point is monotone in the segment end (the
+    within-class sum of squares is a Monge cost), so each of the k layers is
+    solved by divide and conquer in O(n log n) instead of O(n²).
+    """
+    x = np.sort(np.asarray(values, dtype=np.float64))
+    n = len(x)
+    k = min(k, len(np.unique(x)))
+    if k <= 1:
+        return x[:1]
+
+    s1 = np.concatenate([[0.0], np.cumsum(x)])
+    s2 = np.concatenate([[0.0], np.cumsum(x * x)])
+
+    def cost(i: np.ndarray, j: int) -> np.ndarray:
+        # Sum of squared deviations of x[i:j]
+        m = j - i
+        return (s2[j] - s2[i]) - (s1[j] - s1[i]) ** 2 / m
+
+    # prev[j]: best cost of splitting x[:j] into (layer) classes
+    j_all = np.arange(1, n + 1)
+    prev = np.full(n + 1, np.inf)
+    prev[1:] = s2[j_all] - s1[j_all] ** 2 / j_all
+    splits = []
+
+    for layer in range(2, k + 1):
+        cur = np.full(n + 1, np.inf)
+        opt = np.zeros(n + 1, dtype=int)
+
+        def solve(jlo: int, jhi: int, ilo: int, ihi: int) -> None:
+            if jlo > jhi:
+                return
+            j = (jlo + jhi) // 2
+            cand = np.arange(max(ilo, layer - 1), min(ihi, j - 1) + 1)
+            total = prev[cand] + cost(cand, j)
+            best = int(cand[np.argmin(total)])
+            cur[j] = total.min()
+            opt[j] = best
+            solve(jlo, j - 1, ilo, best)
+            solve(j + 1, jhi, best, ihi)
+
+        solve(layer, n, layer - 1, n - 1)
+        splits.append(opt)
+        prev = cur
+
+    # Backtrack class start positions
+    starts = []
+    j = n
+    for opt in reversed(splits):
+        j = opt[j]
+        starts.append(j)
+    starts = [0] + starts[::-1]
+    return x[starts]
+
+
+def series_breaks(values: np.ndarray, k: int, anchor_zero: bool = False) -> dict | None:
+    """Quantile / equal-interval / Jenks breaks and q05 / q95 for one value series."""
+    values = np.sort(values[np.isfinite(values)])
+    if not len(values):
+        return None
+    quantile = np.quantile(values, PARTY_QUANTILES)
+    if anchor_zero:
+        quantile[0] = 0.0
+        quantile = np.maximum.accumulate(quantile)
+    lo, hi = values[0], values[-1]
+    equal = lo + (hi - lo) * np.arange(k) / k
+    q05, q95 = np.quantile(values, [0.05, 0.95])
+
+    def rounded(a) -> list[float]:
+        return np.round(np.asarray(a, dtype=np.float64), DECIMALS).tolist()
+
+    return {
+        "n": int(len(values)),
+        "min": rounded(lo),
+        "max": rounded(hi),
+        "q05": rounded(q05),
+        "q95": rounded(q95),
+        "quantile": rounded(quantile),
+        "equal_interval": rounded(equal),
+        "jenks": rounded(jenks_breaks(values, k)),
+    }
+
+
+def value_series(party_codes: list[str], metrics: dict) -> dict[str, np.ndarray]:
+    """Every colorable series at one granularity, keyed 'mode' or 'mode:party'."""
+    shares = metrics["share"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        top = np.nanmax(np.where(np.isnan(shares), -np.inf, shares), axis=1)
+        log_ratio_top = np.log(shares / top[:, None])
+
+    series = {}
+    for j, code in enumerate(party_codes):
+        series[f"share:{code}"] = shares[:, j]
+        series[f"selected_diff:{code}"] = shares[:, j] - top
+        series[f"selected_ratio:{code}"] = log_ratio_top[:, j]
+    series["ruling_vs_opposition"] = metrics["ruling_vs_opposition"]["gap"]
+    series["ruling_ratio"] = metrics["ruling_vs_opposition"]["log_ratio"]
+    series["concentration"] = metrics["concentration"]["hhi"]
+    series["winner_margin"] = metrics["winner_margin"]["margin"]
+    series["js_divergence:all"] = metrics["js_divergence"]["all"]
+    series["js_divergence:fielded"] = metrics["js_divergence"]["fielded"]
+    return series
+
+
+@stage("build_class_breaks")
+def main() -> None:
+    args = parse_args()
+    with step("mode metrics"):
+        party_codes, levels = mode_metrics()
+
+    payload = {
+        "classes": args.classes,
+        "quantiles": PARTY_QUANTILES,
+        "granularities": {},
+    }
+    for level, data in levels.items():
+        table = {}
+        for name, values in value_series(party_codes, data["metrics"]).items():
+            breaks = series_breaks(values, args.classes, anchor_zero=name.startswith("share:"))
+            if breaks is not None:
+                table[name] = breaks
+        payload["granularities"][level] = table
+        print(f"  {level:5s} {len(table)} series")
+    record_rows(
+        rows_in=sum(len(data["keys"]) for data in levels.values()),
+        rows_out=sum(len(table) for table in payload["granularities"].values()),
+    )
+
+    with ArtifactWriter(OUT_DIR) as writer:
+        writer.write_text(
+            OUT_BREAKS.name,
+            json.dumps(payload, ensure_ascii=False, separators=(",", ":")),
+        )
+    print(f"Saved {OUT_BREAKS} ({OUT_BREAKS.stat().st_size / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""選挙回×市区町村×政党の得票ストア（過去の衆院選比例を現行コードに再集計）
+
+過去の総選挙の市区町村別比例得票を MuniCrosswalk で現行の市区町村コードへ按分し、
+(election, muni, party) の密な配列として .npy に保存する。政党軸は全選挙回の和集合、
+市区町村軸は MuniIndex の行順。対応するのは FIRST_ELECTION（2014年）以降の総選挙で、
+その間のコード変更は muni_crosswalk.csv にすべて載っている。選挙間のスイング（得票率差）や
+都道府県・ブロック集計は ElectionStore 上で全選挙回・全政党まとめて一度の配列演算で求まる。
+
+入力: data/processed/hirei_shikuchouson.csv（今回 = CURRENT_ELECTION）
+      data/raw/election/history/<election>.csv（過去回。列は hirei csv と同じ
+        pref_code, muni_code, muni_name, party_name, votes[, valid_votes]）
+      data/raw/election/hirei/party_mapping.json（政党名エイリアス）
+      data/master/muni_crosswalk.csv（旧コード→現行コード）
+      data/processed/muni_index.npy（行順の基準）
+出力: data/processed/elections/*.npy
+      data/processed/elections/schema.json（軸ラベル・未対応コード）
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from build_tensor_store import _save, open_store
+from hirei_merge import load_party_mapping, normalize_party
+from hirei_to_json import PARTY_CODE_MAP, read_hirei
+from instrumentation import record_rows, stage, step
+from muni_code_canonical import MuniCrosswalk, MuniIndex
+
+BASE = Path(__file__).resolve().parent.parent.parent
+HISTORY_DIR = BASE / "data" / "raw" / "election" / "history"
+MASTER = BASE / "data" / "master" / "district_master.csv"
+STORE_DIR = BASE / "data" / "processed" / "elections"
+SCHEMA_VERSION = 1
+
+CURRENT_ELECTION = "2026"
+# Earliest general election muni_crosswalk.csv covers: it lists every code change
+# since (the last merger was 栃木市・岩舟町 in 2014-04). Older elections need the
+# 2009-2013 mergers and ward creations (相模原市, 熊本市), which are not in the table.
+FIRST_ELECTION = "2014"
+
+# Parties of past general elections that are not on the current ballot
+PAST_PARTY_CODE_MAP = {
+    "立憲民主党": "rikken",
+    "公明党": "komei",
+    "希望の党": "kibou",
+    "NHK党": "nhk",
+    "NHKと裁判してる党弁護士法72条違反で": "nhk",
+}
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Build the election x muni x party vote store.")
+    p.add_argument(
+        "--history-dir",
+        type=Path,
+        default=HISTORY_DIR,
+        help="Directory of past-election CSVs named <election>.csv (default: data/raw/election/history)",
+    )
+    return p.parse_args()
+
+
+def party_code(name: str) -> str:
+    return PARTY_CODE_MAP.get(name) or PAST_PARTY_CODE_MAP.get(name, name)
+
+
+def read_history(path: Path, reverse_map: dict[str, str]) -> pd.DataFrame:
+    """Read one past-election CSV with party names normalized like hirei_merge."""
+    df = pd.read_csv(path, dtype={"pref_code": str, "muni_code": str, "muni_name": str, "party_name": str})
+    df["party_name"] = [normalize_party(name, reverse_map) for name in df["party_name"].fillna("")]
+    for col in ("votes", "valid_votes"):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(",", ""), errors="coerce")
+    df["votes"] = df["votes"].fillna(0.0)
+    return df
+
+
+def election_frames(history_dir: Path) -> dict[str, pd.DataFrame]:
+    """{election: rows (muni_code, party_name, votes, valid_votes)} in election order."""
+    frames = {}
+    if history_dir.exists():
+        reverse_map = load_party_mapping()
+        for path in sorted(history_dir.glob("*.csv")):
+            if path.stem == CURRENT_ELECTION:
+                continue
+            if path.stem < FIRST_ELECTION:
+                raise ValueError(
+                    f"{path.name}: elections before {FIRST_ELECTION} are not supported "
+                    f"(muni_crosswalk.csv lacks their code changes)"
+                )
+            frames[path.stem] = read_history(path, reverse_map)
+    current = read_hirei()
+    frames[CURRENT_ELECTION] = current.rename(columns={"valid_votes_muni": "valid_votes"})
+    return dict(sorted(frames.items()))
+
+
+def source_matrix(df: pd.DataFrame, parties: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Votes (codes x parties) and valid votes per source code, as reported in the file."""
+    codes, code_pos = np.unique(df["muni_code"].astype(str).str.zfill(5), return_inverse=True)
+    party_pos = pd.Index(parties).get_indexer(df["party_name"])
+    votes = np.zeros((len(codes), len(parties)))
+    np.add.at(votes, (code_pos, party_pos), df["votes"].to_numpy(dtype=float))
+
+    # Split counting districts repeat valid_votes per row; the largest is the municipal total
+    valid = np.full(len(codes), np.nan)
+    if "valid_votes" in df.columns:
+        np.fmax.at(valid, code_pos, df["valid_votes"].to_numpy(dtype=float))
+    valid = np.where(np.isnan(valid), votes.sum(axis=1), valid)
+    return codes, votes, valid
+
+
+def stack_elections(
+    frames: dict[str, pd.DataFrame], index: MuniIndex, crosswalk: MuniCrosswalk
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, list[str], dict[str, list[str]]]:
+    """Remap every election to index positions and stack.
+
+    Returns votes (E x N x P), valid votes (E x N, NaN where nothing was
+    reported), reported (E x N x P bool), the party axis and the codes of each
+    election that reach no current municipality.
+    """
+    parties = sorted(set().union(*(df["party_name"].dropna().unique() for df in frames.values())))
+    E, N, P = len(frames), len(index), len(parties)
+    votes = np.zeros((E, N, P))
+    valid = np.full((E, N), np.nan)
+    reported = np.zeros((E, N, P), dtype=bool)
+    unmapped = {}
+
+    for e, (election, df) in enumerate(frames.items()):
+        codes, src_votes, src_valid = source_matrix(df, parties)
+        M, missing = crosswalk.matrix(codes, index)
+        votes[e] = M @ src_votes
+        covered = np.asarray(M.sum(axis=1)).ravel() > 0
+        valid[e, covered] = (M @ src_valid)[covered]
+        party_pos = pd.Index(parties).get_indexer(df["party_name"])
+        present = sparse.csr_matrix(
+            (np.ones(len(df)), (pd.Index(codes).get_indexer(df["muni_code"].astype(str).str.zfill(5)), party_pos)),
+            shape=(len(codes), P),
+        )
+        reported[e] = (abs(M) @ present).toarray() > 0
+        unmapped[election] = missing.tolist()
+    valid[valid == 0] = np.nan
+    return votes, valid, reported, parties, unmapped
+
+
+def unit_membership(index: MuniIndex, level: str) -> tuple[np.ndarray, sparse.csr_matrix]:
+    """Unit keys and (units x munis) 0/1 membership for level muni / pref / block."""
+    if level == "muni":
+        return index.codes, sparse.identity(len(index), format="csr")
+    pref = index.pref_codes
+    if level == "pref":
+        labels = pref
+    elif level == "block":
+        master = pd.read_csv(MASTER, dtype={"pref_code": str, "block_id": str})
+        pref_block = dict(zip(master["pref_code"].str.zfill(2), master["block_id"]))
+        labels = np.array([pref_block.get(code, "") for code in pref])
+    else:
+        raise ValueError(f"Unknown level: {level}")
+    keys, unit = np.unique(labels, return_inverse=True)
+    G = sparse.csr_matrix((np.ones(len(index)), (unit, np.arange(len(index)))), shape=(len(keys), len(index)))
+    return keys, G
+
+
+class ElectionStore:
+    """Stacked (election x muni x party) votes with vectorized cross-election queries.
+
+        store = ElectionStore()
+        keys, swing = store.swing("2024", "2026", level="pref")   # (units x parties)
+    """
+
+    def __init__(self, root: Path = STORE_DIR) -> None:
+        arrays, schema = open_store(root)
+        axes = schema["axes"]
+        self.elections: list[str] = axes["election"]
+        self.parties: list[str] = axes["party"]
+        self.party_codes: list[str] = axes["party_code"]
+        self.index = MuniIndex(axes["muni"])
+        self.votes = arrays["votes"]
+        self.valid_votes = arrays["valid_votes"]
+        self.reported = arrays["reported"]
+        self.unmapped: dict[str, list[str]] = schema["unmapped"]
+
+    def _election(self, election: str) -> int:
+        if election not in self.elections:
+            raise KeyError(f"Unknown election {election!r}; available: {', '.join(self.elections)}")
+        return self.elections.index(election)
+
+    def party(self, party: str) -> int:
+        """Axis position of a party by name or code."""
+        for axis in (self.party_codes, self.parties):
+            if party in axis:
+                return axis.index(party)
+        raise KeyError(f"Unknown party: {party}")
+
+    def shares(self, level: str = "muni") -> tuple[np.ndarray, np.ndarray]:
+        """Unit keys and vote shares (elections x units x parties), NaN where not on the ballot.
+
+        Pref / block shares use exact vote summation over municipalities.
+        """
+        keys, G = unit_membership(self.index, level)
+        E, N, P = self.votes.shape
+        votes = (G @ np.transpose(self.votes, (1, 0, 2)).reshape(N, E * P)).reshape(len(keys), E, P)
+        valid = G @ np.nan_to_num(self.valid_votes).T
+        reported = (G @ np.transpose(self.reported, (1, 0, 2)).reshape(N, E * P).astype(np.float64)) > 0
+        reported = reported.reshape(len(keys), E, P)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            shares = votes / valid[:, :, None]
+        shares = np.where(reported & (valid[:, :, None] > 0), shares, np.nan)
+        return keys, np.transpose(shares, (1, 0, 2))
+
+    def swing(self, base: str, target: str, level: str = "muni") -> tuple[np.ndarray, np.ndarray]:
+        """Unit keys and share change target - base (units x parties)."""
+        keys, shares = self.shares(level)
+        return keys, shares[self._election(target)] - shares[self._election(base)]
+
+    def swing_frame(self, base: str, target: str, level: str = "muni") -> pd.DataFrame:
+        """swing() as a DataFrame indexed by unit, one column per party code."""
+        keys, swing = self.swing(base, target, level)
+        return pd.DataFrame(swing, index=pd.Index(keys, name=level), columns=self.party_codes)
+
+
+@stage("build_election_store")
+def main() -> None:
+    args = parse_args()
+    index = MuniIndex.load()
+    crosswalk = MuniCrosswalk.load()
+    print(f"Crosswalk: {crosswalk}")
+
+    with step("read"):
+        frames = election_frames(args.history_dir)
+        record_rows(rows_in=sum(len(df) for df in frames.values()))
+    print(f"Elections: {', '.join(frames)}")
+
+    with step("stack"):
+        votes, valid, reported, parties, unmapped = stack_elections(frames, index, crosswalk)
+    for election, codes in unmapped.items():
+        if codes:
+            print(f"WARNING: {election}: {len(codes)} codes reach no current municipality: "
+                  f"{codes[:10]}{'...' if len(codes) > 10 else ''}")
+
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    schema = {
+        "version": SCHEMA_VERSION,
+        "axes": {
+            "election": list(frames),
+            "muni": index.codes.tolist(),
+            "party": parties,
+            "party_code": [party_code(name) for name in parties],
+        },
+        "arrays": {},
+        "unmapped": unmapped,
+    }
+    print(f"Writing election store to {STORE_DIR}")
+    _save(STORE_DIR, schema, "votes", votes, ["election", "muni", "party"])
+    _save(STORE_DIR, schema, "valid_votes", valid, ["election", "muni"])
+    _save(STORE_DIR, schema, "reported", reported, ["election", "muni", "party"])
+    out = STORE_DIR / "schema.json"
+    out.write_text(json.dumps(schema, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"Saved: {out}")
+    record_rows(rows_out=votes.shape[0] * votes.shape[1])
+
+    # National summary: shares per election, then the latest prefecture swings
+    store = ElectionStore(STORE_DIR)
+    shares = votes.sum(axis=1) / np.nansum(valid, axis=1)[:, None]
+    print(f"\nNational shares (%): {'  '.join(f'{e:>5s}' for e in frames)}")
+    for j in np.argsort(-shares[-1]):
+        row = "  ".join(f"{100 * s:5.1f}" if reported[e, :, j].any() else "    -" for e, s in enumerate(shares[:, j]))
+        print(f"  {party_code(parties[j]):16s} {row}")
+    if len(frames) > 1:
+        base, target = list(frames)[-2:]
+        swing = store.swing_frame(base, target, level="pref")
+        print(f"\nLargest prefecture swings {base} -> {target}:")
+        stacked = swing.stack().dropna()
+        for (pref, code), value in stacked[stacked.abs().sort_values(ascending=False).index[:10]].items():
+            print(f"  {pref} {code:16s} {100 * value:+5.1f} pt")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,24 +4,46 @@
 from __future__ import annotations
 
 import argparse
+import json
+import os
 from pathlib import Path
+from typing import Iterator
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 import shapely
-from shapely.geometry.base import BaseGeometry
+from shapely.ops import polylabel
+
+from artifact_writer import ArtifactWriter
+from geojson_writer import COORD_MODES, encoded_chunks, grid_decimals, write_delta_geojson, write_geojson
+from instrumentation import record_rows, stage, step
 
 
 BASE = Path(__file__).resolve().parent.parent.parent
 MUNI_GEOJSON = BASE / "data" / "raw" / "gis" / "N03_2025" / "N03-20250101.geojson"
 PREF_SHP = BASE / "data" / "raw" / "gis" / "N03_2025" / "N03-20250101_prefecture.shp"
 MASTER = BASE / "data" / "master" / "district_master.csv"
-OUT_MUNI = BASE / "web" / "data" / "municipalities.geojson"
-OUT_PREF = BASE / "web" / "data" / "prefectures.geojson"
-OUT_BLOCK = BASE / "web" / "data" / "blocks.geojson"
+OUT_DIR = BASE / "web" / "data"
+OUT_MUNI = OUT_DIR / "municipalities.geojson"
+OUT_PREF = OUT_DIR / "prefectures.geojson"
+OUT_BLOCK = OUT_DIR / "blocks.geojson"
 GRID_SIZE = 0.002
 MUNI_MAX_BYTES = 5 * 1024 * 1024
+# Quantization step for the delta-encoded municipalities layer when no grid was applied
+MUNI_DELTA_GRID = 0.00001
 EQUAL_AREA_CRS = "EPSG:6933"
+# polylabel precision in degrees (~50 m)
+POLE_TOLERANCE = 0.0005
+OUT_LOD_MANIFEST = OUT_DIR / "lod.json"
+# (level, coverage simplification tolerance in degrees, min zoom, max zoom).
+# The finest level is the regular GRID_SIZE layer itself.
+LOD_LEVELS = (
+    (0, 0.05, 0, 5),
+    (1, 0.02, 6, 7),
+    (2, 0.008, 8, 9),
+    (3, None, 10, 22),
+)
 
 
 def parse_args() -> argparse.Namespace:
@@ -39,72 +61,193 @@ def parse_args() -> argparse.Namespace:
             "(default: municipalities prefectures blocks)."
         ),
     )
+    parser.add_argument(
+        "--coords",
+        choices=COORD_MODES,
+        default="grid",
+        help=(
+            "Coordinate text: 'grid' rounds to the snapping grid's decimals, "
+            "'float' keeps full precision (default: grid)."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes for per-prefecture municipality encoding (default: CPU count).",
+    )
+    parser.add_argument(
+        "--pole-labels",
+        action="store_true",
+        help="Add pole-of-inaccessibility label anchors (pole_lng / pole_lat).",
+    )
+    parser.add_argument(
+        "--lod",
+        action="store_true",
+        help=(
+            "Also write coarser prefecture/block levels (<layer>.lod<N>.geojson) "
+            "and lod.json with byte sizes and zoom ranges."
+        ),
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="Also write <layer>.delta.json with delta-encoded integer coordinates.",
+    )
     return parser.parse_args()
 
 
-def write_compact_geojson(gdf: gpd.GeoDataFrame, out_path: Path) -> None:
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(gdf.to_json(drop_id=True), encoding="utf-8")
-
-
-def largest_component_index(geom: BaseGeometry | None) -> int:
-    if geom is None:
-        return -1
-    if geom.geom_type == "Polygon":
-        return 0
-    if geom.geom_type != "MultiPolygon":
-        return -1
-    parts = list(geom.geoms)
-    if not parts:
-        return -1
-    best_idx = 0
-    best_area = -1.0
-    for i, g in enumerate(parts):
-        if g.area > best_area:
-            best_area = g.area
-            best_idx = i
-    return best_idx
-
-
-def largest_component(geom: BaseGeometry | None) -> BaseGeometry | None:
-    if geom is None:
-        return None
-    if geom.geom_type == "Polygon":
-        return geom
-    if geom.geom_type == "MultiPolygon":
-        parts = list(geom.geoms)
-        if not parts:
-            return None
-        return max(parts, key=lambda g: g.area)
-    return geom
-
-
-def with_geometry_metadata(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+def _decimals(grid: float | None, coords: str) -> int | None:
+    return grid_decimals(grid) if grid and coords == "grid" else None
+
+
+def write_compact_geojson(
+    gdf: gpd.GeoDataFrame,
+    out_path: Path,
+    writer: ArtifactWriter,
+    grid: float | None = None,
+    coords: str = "grid",
+    delta: bool = False,
+) -> None:
+    with writer.open(out_path.name) as f:
+        write_geojson(gdf, f, _decimals(grid, coords))
+    if delta:
+        write_delta(gdf, out_path, writer, grid)
+
+
+def write_delta(gdf: gpd.GeoDataFrame, out_path: Path, writer: ArtifactWriter, grid: float | None) -> None:
+    with writer.open(f"{out_path.stem}.delta.json") as f:
+        write_delta_geojson(gdf, f, grid or MUNI_DELTA_GRID)
+
+
+def with_geometry_metadata(gdf: gpd.GeoDataFrame, pole_labels: bool = False) -> gpd.GeoDataFrame:
+    """Add main-component index, label anchor and areas, vectorized over all parts.
+
+    The main component is the largest polygon part by planar area in the source
+    CRS (first one on ties); -1 for non-polygonal or empty geometries. Areas come
+    from a single equal-area reprojection of all parts. With pole_labels, also
+    adds pole-of-inaccessibility anchors (pole_lng / pole_lat) of the main part.
+    """
     out = gdf.copy()
-    out["main_component_index"] = out.geometry.apply(largest_component_index).astype(int)
-    largest = out.geometry.apply(largest_component)
+    if out.crs is None:
+        out = out.set_crs("EPSG:4326")
+    geoms = np.asarray(out.geometry.values, dtype=object)
+    n = len(geoms)
+
+    # One piece per polygon part; other geometry types stand for themselves.
+    type_id = shapely.get_type_id(geoms)
+    polygonal = np.isin(type_id, (3, 6))
+    parts, owner = shapely.get_parts(geoms[polygonal], return_index=True)
+    owner = np.flatnonzero(polygonal)[owner]
+    other = np.flatnonzero(~polygonal & ~shapely.is_missing(geoms))
+    pieces = np.concatenate([parts, geoms[other]])
+    piece_owner = np.concatenate([owner, other])
+    local = np.concatenate([
+        np.arange(len(owner)) - np.searchsorted(owner, owner),
+        np.full(len(other), -1),
+    ])
+
+    # Grouped argmax of planar area: first piece per owner after sorting by (-area, position).
+    order = np.lexsort((local, -shapely.area(pieces), piece_owner))
+    rows, first = np.unique(piece_owner[order], return_index=True)
+    main = order[first]
+
+    main_index = np.full(n, -1)
+    main_index[rows] = local[main]
+    main_geom = np.full(n, None, dtype=object)
+    main_geom[rows] = pieces[main]
+    out["main_component_index"] = main_index
 
     # Precompute label anchor on the largest component.
-    rep = largest.apply(lambda g: g.representative_point() if g is not None else None)
-    out["label_lng"] = rep.apply(lambda p: float(p.x) if p is not None else None)
-    out["label_lat"] = rep.apply(lambda p: float(p.y) if p is not None else None)
+    rep = shapely.point_on_surface(main_geom)
+    out["label_lng"] = shapely.get_x(rep)
+    out["label_lat"] = shapely.get_y(rep)
+    if pole_labels:
+        pole = np.array([
+            polylabel(g, tolerance=POLE_TOLERANCE) if g is not None else None
+            for g in main_geom
+        ])
+        out["pole_lng"] = shapely.get_x(pole)
+        out["pole_lat"] = shapely.get_y(pole)
 
     # Precompute approximate areas in km^2 using an equal-area projection.
-    if out.crs is None:
-        out = out.set_crs("EPSG:4326")
-        largest_gs = gpd.GeoSeries(largest, crs="EPSG:4326")
-    else:
-        largest_gs = gpd.GeoSeries(largest, crs=out.crs)
-
-    out["area_km2"] = (
-        out.to_crs(EQUAL_AREA_CRS).geometry.area / 1_000_000
-    ).round(3)
-    out["main_area_km2"] = (
-        largest_gs.to_crs(EQUAL_AREA_CRS).area / 1_000_000
-    ).round(3)
+    projected = gpd.GeoSeries(pieces, crs=out.crs).to_crs(EQUAL_AREA_CRS).area.to_numpy()
+    area = np.bincount(piece_owner, weights=projected, minlength=n)
+    area[shapely.is_missing(geoms)] = np.nan
+    main_area = np.full(n, np.nan)
+    main_area[rows] = projected[main]
+    out["area_km2"] = np.round(area / 1_000_000, 3)
+    out["main_area_km2"] = np.round(main_area / 1_000_000, 3)
+    return out
+
+
+def dissolve_blocks(pref: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    block = pref[["block_id", "block_name", "geometry"]].dissolve(
+        by="block_id",
+        as_index=False,
+        aggfunc="first",
+    )
+    return block[["block_id", "block_name", "geometry"]]
+
+
+def drop_small_parts(geoms: np.ndarray, min_area: float) -> np.ndarray:
+    """Drop polygon parts smaller than min_area, always keeping each feature's largest part."""
+    parts, owner = shapely.get_parts(geoms, return_index=True)
+    area = shapely.area(parts)
+    order = np.lexsort((-area, owner))
+    largest = np.zeros(len(parts), dtype=bool)
+    largest[order[np.unique(owner[order], return_index=True)[1]]] = True
+    keep = largest | (area >= min_area)
+    out = np.array(geoms, dtype=object)
+    rebuilt = shapely.multipolygons(parts[keep], indices=owner[keep])
+    out[np.unique(owner[keep])] = rebuilt
     return out
 
 
+@step("lod bundle")
+def write_lod_bundle(
+    pref: gpd.GeoDataFrame, layers: set[str], writer: ArtifactWriter, coords: str
+) -> None:
+    """Write coarser prefecture/block resolutions plus a manifest for progressive loading.
+
+    Prefectures form a polygon coverage, so each level simplifies it once with
+    shapely.coverage_simplify: every shared border is simplified identically for
+    both neighbours (no gaps or overlaps), and blocks are dissolved from the
+    simplified prefectures so their borders reuse the same arcs. Islands smaller
+    than tolerance² are dropped at the coarse levels; most of them would
+    otherwise survive simplification as tiny triangles.
+    """
+    manifest: dict[str, list[dict]] = {layer: [] for layer in sorted(layers)}
+    for level, tolerance, min_zoom, max_zoom in LOD_LEVELS:
+        if tolerance is None:
+            files = {"prefectures": OUT_PREF.name, "blocks": OUT_BLOCK.name}
+        else:
+            lod_pref = pref.copy()
+            simplified = shapely.coverage_simplify(pref.geometry.values, tolerance)
+            lod_pref["geometry"] = drop_small_parts(simplified, tolerance**2)
+            lod = {"prefectures": lod_pref, "blocks": dissolve_blocks(lod_pref)}
+            files = {}
+            for layer in layers:
+                out_path = OUT_DIR / f"{layer}.lod{level}.geojson"
+                write_compact_geojson(with_geometry_metadata(lod[layer]), out_path, writer, GRID_SIZE, coords)
+                files[layer] = out_path.name
+
+        for layer in layers:
+            size = (OUT_DIR / files[layer]).stat().st_size
+            manifest[layer].append({
+                "level": level,
+                "file": files[layer],
+                "bytes": size,
+                "tolerance": tolerance if tolerance is not None else GRID_SIZE,
+                "min_zoom": min_zoom,
+                "max_zoom": max_zoom,
+            })
+            print(f"  {layer:11s} lod{level} z{min_zoom}-{max_zoom}: {size / 1024:8.1f} KB  {files[layer]}")
+
+    writer.write_text(OUT_LOD_MANIFEST.name, json.dumps(manifest, indent=2) + "\n")
+    print(f"Saved {OUT_LOD_MANIFEST}")
+
+
 def build_municipalities() -> gpd.GeoDataFrame:
     gdf = gpd.read_file(MUNI_GEOJSON)
     gdf["muni_code"] = gdf["N03_007"].astype(str).str.zfill(5)
@@ -114,31 +257,15 @@ def build_municipalities() -> gpd.GeoDataFrame:
     return gdf.dissolve(by="muni_code", as_index=False, aggfunc="first")
 
 
-def write_municipalities(gdf: gpd.GeoDataFrame) -> None:
-    simplified = gdf.copy()
-    simplified["geometry"] = simplified.geometry.simplify(
-        tolerance=0.001,
-        preserve_topology=True,
-    )
-    write_compact_geojson(with_geometry_metadata(simplified), OUT_MUNI)
-    size = OUT_MUNI.stat().st_size
-    print(f"Saved {OUT_MUNI} with tolerance=0.001 ({size / 1024 / 1024:.2f} MB)")
-    if size <= MUNI_MAX_BYTES:
-        return
-
-    simplified = gdf.copy()
-    simplified["geometry"] = simplified.geometry.simplify(
-        tolerance=0.002,
-        preserve_topology=True,
-    )
-    write_compact_geojson(with_geometry_metadata(simplified), OUT_MUNI)
-    size = OUT_MUNI.stat().st_size
-    print(
-        f"Output exceeded 5MB, rewrote with tolerance=0.002 "
-        f"({size / 1024 / 1024:.2f} MB)"
-    )
-    if size <= MUNI_MAX_BYTES:
-        return
+def muni_candidates(gdf: gpd.GeoDataFrame) -> Iterator[tuple[str, gpd.GeoDataFrame, float | None]]:
+    """Progressively coarser municipality geometries, tried until one fits MUNI_MAX_BYTES."""
+    for tolerance in (0.001, 0.002):
+        simplified = gdf.copy()
+        simplified["geometry"] = simplified.geometry.simplify(
+            tolerance=tolerance,
+            preserve_topology=True,
+        )
+        yield f"tolerance={tolerance}", simplified, None
 
     grid = 0.0005
     snapped = gdf.copy()
@@ -147,23 +274,54 @@ def write_municipalities(gdf: gpd.GeoDataFrame) -> None:
         tolerance=0.002,
         preserve_topology=True,
     )
-    write_compact_geojson(with_geometry_metadata(snapped), OUT_MUNI)
-    size = OUT_MUNI.stat().st_size
-    print(
-        f"Applied precision grid={grid} + tolerance=0.002 "
-        f"({size / 1024 / 1024:.2f} MB)"
-    )
-
-
-def main() -> None:
-    args = parse_args()
-    outputs = set(args.output)
-
+    yield f"precision grid={grid} + tolerance=0.002", snapped, grid
+
+
+@step("municipalities")
+def write_municipalities(
+    gdf: gpd.GeoDataFrame,
+    writer: ArtifactWriter,
+    coords: str,
+    delta: bool,
+    workers: int,
+    pole_labels: bool = False,
+) -> None:
+    # Each candidate is encoded per prefecture into temp chunks; only the
+    # accepted one is assembled into the published file.
+    gdf = gdf.sort_values("muni_code", kind="stable")
+    for label, candidate, grid in muni_candidates(gdf):
+        out = with_geometry_metadata(candidate, pole_labels)
+        with encoded_chunks(out, _decimals(grid, coords), out["muni_code"].str[:2], workers) as chunks:
+            size = chunks.size
+            print(f"Built {OUT_MUNI.name} with {label} ({size / 1024 / 1024:.2f} MB)")
+            # The grid-snapped candidate is the last resort and is always accepted.
+            if size > MUNI_MAX_BYTES and grid is None:
+                print("  exceeds 5MB, trying a coarser candidate")
+                continue
+            with writer.open(OUT_MUNI.name) as f:
+                chunks.write(f)
+        break
+
+    if delta:
+        write_delta(out, OUT_MUNI, writer, grid)
+    print(f"Saved {OUT_MUNI} ({size / 1024 / 1024:.2f} MB)")
+    record_rows(rows_in=len(gdf), rows_out=len(out))
+
+
+def build_layers(
+    outputs: set[str],
+    writer: ArtifactWriter,
+    coords: str,
+    delta: bool,
+    workers: int,
+    pole_labels: bool,
+    lod: bool,
+) -> None:
     if "municipalities" in outputs:
         if not MUNI_GEOJSON.exists():
             raise FileNotFoundError(f"Missing input: {MUNI_GEOJSON}")
         muni = build_municipalities()
-        write_municipalities(muni)
+        write_municipalities(muni, writer, coords, delta, workers, pole_labels)
 
     if "prefectures" in outputs or "blocks" in outputs:
         if not PREF_SHP.exists():
@@ -192,20 +350,34 @@ def main() -> None:
         pref = pref[["pref_code", "pref_name", "block_id", "block_name", "geometry"]]
         pref["geometry"] = shapely.set_precision(pref.geometry.values, GRID_SIZE)
 
-        block = pref[["block_id", "block_name", "geometry"]].dissolve(
-            by="block_id",
-            as_index=False,
-            aggfunc="first",
-        )
-        block = block[["block_id", "block_name", "geometry"]]
+        block = dissolve_blocks(pref)
         block["geometry"] = shapely.set_precision(block.geometry.values, GRID_SIZE)
 
         if "prefectures" in outputs:
-            write_compact_geojson(with_geometry_metadata(pref), OUT_PREF)
-            print(f"Saved {OUT_PREF} ({OUT_PREF.stat().st_size / 1024:.1f} KB)")
+            with step("prefectures"):
+                pref_out = with_geometry_metadata(pref, pole_labels)
+                write_compact_geojson(pref_out, OUT_PREF, writer, GRID_SIZE, coords, delta)
+                print(f"Saved {OUT_PREF} ({OUT_PREF.stat().st_size / 1024:.1f} KB)")
+                record_rows(rows_in=len(pref_src), rows_out=len(pref_out))
         if "blocks" in outputs:
-            write_compact_geojson(with_geometry_metadata(block), OUT_BLOCK)
-            print(f"Saved {OUT_BLOCK} ({OUT_BLOCK.stat().st_size / 1024:.1f} KB)")
+            with step("blocks"):
+                block_out = with_geometry_metadata(block, pole_labels)
+                write_compact_geojson(block_out, OUT_BLOCK, writer, GRID_SIZE, coords, delta)
+                print(f"Saved {OUT_BLOCK} ({OUT_BLOCK.stat().st_size / 1024:.1f} KB)")
+                record_rows(rows_in=len(pref), rows_out=len(block_out))
+        if lod:
+            write_lod_bundle(pref, outputs & {"prefectures", "blocks"}, writer, coords)
+
+
+@stage("build_geojson_layers")
+def main() -> None:
+    args = parse_args()
+    outputs = set(args.output)
+
+    with ArtifactWriter(OUT_DIR) as writer:
+        build_layers(
+            outputs, writer, args.coords, args.delta, args.workers, args.pole_labels, args.lod
+        )
 
 
 if __name__ == "__main__":
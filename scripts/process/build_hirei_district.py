@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""比例代表得票の小選挙区別集計（市区町村 → 選挙区の重み行列で按分）
+
+市区町村ポリゴンと選挙区ポリゴンの重なり面積から (市区町村 × 選挙区) の疎行列を作り、
+行和 = 市区町村人口、列和 = 選挙区人口 になるよう反復比例調整（RAS）して人口重みに変換する。
+分割されていない市区町村の重みは 1 のまま。全政党の得票を1回の疎行列積で選挙区へ配分する。
+process_census_small_area.py の小地域人口重みがあればそちらを使う（面積按分・RAS は行わない）。
+
+分割市区町村の得票は「政党の得票率が市区町村内で一様」という仮定で配分するため、
+仮定を置かない範囲（Duncan–Davis の bounds）も出力する:
+  下限 max(0, v − (1 − w)·T)、上限 min(v, w·T)（v: 政党得票、T: 有効投票、w: 重み）
+
+入力: data/processed/hirei_shikuchouson.csv
+      data/raw/gis/N03_2025/N03-20250101.shp（市区町村ポリゴン）
+      data/raw/gis/senkyoku2022/senkyoku2022.shp（選挙区ポリゴン）
+      data/processed/census_muni.csv, census_district.csv（pop_total）
+      data/processed/muni_district_weights_small_area.csv（あれば優先）
+出力: data/processed/muni_district_weights.csv（muni_code, kucode, area_share, weight）
+      data/processed/hirei_district.parquet（選挙区 × 政党、pyarrow が無い場合は省略）
+      data/processed/hirei_district.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from scipy import sparse
+
+from dataio import load
+from hirei_to_json import PARTY_CODE_MAP, read_hirei, vote_matrix
+from instrumentation import record_rows, stage, step
+from muni_code_canonical import MuniIndex
+
+BASE = Path(__file__).resolve().parent.parent.parent
+GIS = BASE / "data" / "raw" / "gis"
+PROCESSED = BASE / "data" / "processed"
+OUT_WEIGHTS = PROCESSED / "muni_district_weights.csv"
+SMALL_AREA_WEIGHTS = PROCESSED / "muni_district_weights_small_area.csv"
+OUT = PROCESSED / "hirei_district.parquet"
+
+# Equal-area projection for overlap areas (Albers, centred on Japan)
+AREA_CRS = "+proj=aea +lat_1=30 +lat_2=44 +lat_0=36 +lon_0=137 +ellps=GRS80 +units=m"
+# Overlaps below this share of the municipality's area are boundary noise
+# between the two polygon sources
+SLIVER = 0.01
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Allocate municipal PR votes to single-member districts.")
+    p.add_argument(
+        "--weights",
+        type=Path,
+        help="Reuse a muni_district_weights.csv instead of overlaying polygons "
+        "(default: the small-area weights when present)",
+    )
+    p.add_argument(
+        "--overlay",
+        action="store_true",
+        help="Overlay polygons even when small-area weights are present",
+    )
+    p.add_argument(
+        "--ras-iter",
+        type=int,
+        default=50,
+        help="Maximum RAS balancing iterations (default: 50)",
+    )
+    return p.parse_args()
+
+
+def load_polygons() -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    """Dissolved municipality and district polygons in AREA_CRS."""
+    munis = gpd.read_file(GIS / "N03_2025" / "N03-20250101.shp")
+    munis["muni_code"] = munis["N03_007"].astype(str).str.zfill(5)
+    munis = munis[["muni_code", "geometry"]].dissolve(by="muni_code", as_index=False)
+    districts = gpd.read_file(GIS / "senkyoku2022" / "senkyoku2022.shp")
+    districts["kucode"] = districts["kucode"].astype(int)
+    districts = districts[["kucode", "geometry"]].dissolve(by="kucode", as_index=False)
+    return munis.to_crs(AREA_CRS), districts.to_crs(AREA_CRS)
+
+
+def overlay_areas(
+    munis: gpd.GeoDataFrame, districts: gpd.GeoDataFrame
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(muni row, district row, area share of the muni) for every non-sliver overlap."""
+    geoms = districts.geometry.values
+    tree = shapely.STRtree(geoms)
+    mi, di = tree.query(munis.geometry.values, predicate="intersects")
+    area = shapely.area(shapely.intersection(munis.geometry.values[mi], geoms[di]))
+    share = area / shapely.area(munis.geometry.values)[mi]
+    keep = share >= SLIVER
+    return mi[keep], di[keep], share[keep]
+
+
+def ras_balance(
+    A: sparse.csr_matrix, row_totals: np.ndarray, col_totals: np.ndarray, n_iter: int = 50, tol: float = 1e-6
+) -> sparse.csr_matrix:
+    """Scale rows and columns of A towards the target sums (iterative proportional fitting).
+
+    Rows / columns with a NaN or zero target keep their current scale.
+    """
+    A = A.tocsr(copy=True).astype(np.float64)
+    for _ in range(n_iter):
+        for axis, totals in ((1, row_totals), (0, col_totals)):
+            sums = np.asarray(A.sum(axis=axis)).ravel()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                f = np.where((sums > 0) & (totals > 0), totals / sums, 1.0)
+            A = (sparse.diags(f) @ A if axis == 1 else A @ sparse.diags(f)).tocsr()
+        rows = np.asarray(A.sum(axis=1)).ravel()
+        ok = row_totals > 0
+        if np.allclose(rows[ok], row_totals[ok], rtol=tol):
+            break
+    return A
+
+
+def membership(
+    index: MuniIndex, kucodes: np.ndarray, mi_codes: np.ndarray, ku: np.ndarray, area_share: np.ndarray, n_iter: int
+) -> tuple[sparse.csr_matrix, pd.DataFrame]:
+    """Population weight matrix W (munis × districts, rows summing to 1) and its long table."""
+    rows = index.encode(mi_codes)
+    cols = pd.Index(kucodes).get_indexer(ku)
+    keep = (rows >= 0) & (cols >= 0)
+    rows, cols, area_share = rows[keep], cols[keep], area_share[keep]
+    A = sparse.csr_matrix((area_share, (rows, cols)), shape=(len(index), len(kucodes)))
+
+    muni_pop = load("census_muni", ["muni_code", "pop_total"]).set_index("muni_code")["pop_total"]
+    district_pop = load("census_district", ["kucode", "pop_total"]).set_index("kucode")["pop_total"]
+    row_totals = muni_pop.reindex(index.codes).to_numpy(dtype=float)
+    col_totals = district_pop.reindex(kucodes).to_numpy(dtype=float)
+    # Seed each municipality with its population spread by area, then balance
+    seed = sparse.diags(np.nan_to_num(row_totals, nan=1.0)) @ sparse.diags(
+        1 / np.maximum(np.asarray(A.sum(axis=1)).ravel(), 1e-12)
+    ) @ A
+    P = ras_balance(seed, row_totals, col_totals, n_iter)
+
+    sums = np.asarray(P.sum(axis=1)).ravel()
+    W = (sparse.diags(np.where(sums > 0, 1 / np.maximum(sums, 1e-300), 0.0)) @ P).tocsr()
+    W.eliminate_zeros()
+    coo = W.tocoo()
+    area = np.asarray(A[coo.row, coo.col]).ravel()
+    table = pd.DataFrame({
+        "muni_code": index.codes[coo.row],
+        "kucode": kucodes[coo.col],
+        "area_share": area,
+        "weight": coo.data,
+    }).sort_values(["muni_code", "kucode"], ignore_index=True)
+    return W, table
+
+
+def load_weights(path: Path, index: MuniIndex, kucodes: np.ndarray) -> sparse.csr_matrix:
+    df = load("muni_district_weights", ["muni_code", "kucode", "weight"], path=path)
+    rows = index.encode(df["muni_code"], strict=True)
+    cols = pd.Index(kucodes).get_indexer(df["kucode"])
+    return sparse.csr_matrix((df["weight"].to_numpy(dtype=float), (rows, cols)), shape=(len(index), len(kucodes)))
+
+
+def allocate(
+    W: sparse.csr_matrix, votes: np.ndarray, valid: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """District votes (districts × parties), valid votes and Duncan–Davis vote bounds.
+
+    votes (munis × parties) and valid (munis,) with NaN valid treated as uncounted.
+    """
+    counted = ~np.isnan(valid)
+    V = np.where(counted[:, None], votes, 0.0)
+    T = np.where(counted, valid, 0.0)
+    WT = W.T.tocsr()
+    district_votes = WT @ V
+    district_valid = WT @ T
+
+    # Per (muni, district) entry; unsplit entries (w = 1) give lower = upper = v
+    coo = W.tocoo()
+    w = coo.data[:, None]
+    v = V[coo.row]
+    t = T[coo.row][:, None]
+    S = sparse.csr_matrix((np.ones(coo.nnz), (coo.col, np.arange(coo.nnz))), shape=(W.shape[1], coo.nnz))
+    lower = S @ np.maximum(0.0, v - (1 - w) * t)
+    upper = S @ np.minimum(v, w * t)
+    return district_votes, district_valid, lower, upper
+
+
+@stage("build_hirei_district")
+def main() -> None:
+    args = parse_args()
+    index = MuniIndex.load()
+    districts = load("census_district", ["kucode", "kuname", "pref_code", "pref_name", "block_id", "block_name"])
+    kucodes = districts["kucode"].to_numpy()
+
+    if args.weights is None and not args.overlay and SMALL_AREA_WEIGHTS.exists():
+        args.weights = SMALL_AREA_WEIGHTS
+    if args.weights:
+        W = load_weights(args.weights, index, kucodes)
+        print(f"Loaded weights: {args.weights}")
+    else:
+        with step("overlay"):
+            munis, polys = load_polygons()
+            mi, di, share = overlay_areas(munis, polys)
+            record_rows(rows_in=len(munis), rows_out=len(mi))
+        with step("ras"):
+            W, table = membership(
+                index, kucodes, munis["muni_code"].to_numpy()[mi], polys["kucode"].to_numpy()[di], share, args.ras_iter
+            )
+        table.to_csv(OUT_WEIGHTS, index=False, encoding="utf-8")
+        print(f"Saved: {OUT_WEIGHTS}")
+
+    n_split = int((np.diff(W.indptr) > 1).sum())
+    unmapped = int((np.diff(W.indptr) == 0).sum())
+    print(f"Weights: {W.nnz} muni-district pairs, {n_split} split municipalities, {unmapped} without a district")
+
+    df = read_hirei(columns=["muni_code", "party_name", "votes", "valid_votes_muni"])
+    votes, valid, party_names, muni_pos = vote_matrix(df, index)
+    reported = np.zeros(votes.shape, dtype=bool)
+    reported[muni_pos, pd.Index(party_names).get_indexer(df["party_name"])] = True
+    with step("allocate"):
+        district_votes, district_valid, lower, upper = allocate(W, votes, valid)
+        record_rows(rows_in=len(df))
+
+    # Parties on the ballot anywhere in the district; split municipalities per district
+    members = W.T.astype(bool).astype(np.float64).tocsr()
+    district_reported = (members @ reported) > 0
+    split_rows = np.diff(W.indptr) > 1
+    n_split_munis = np.asarray(members[:, split_rows].sum(axis=1)).ravel().astype(int)
+
+    D, P = district_votes.shape
+    with np.errstate(invalid="ignore", divide="ignore"):
+        inv_valid = np.where(district_valid > 0, 1 / district_valid, np.nan)[:, None]
+    out = districts.iloc[np.repeat(np.arange(D), P)].reset_index(drop=True)
+    out["party_name"] = np.tile(party_names, D)
+    out["party_code"] = out["party_name"].map(lambda name: PARTY_CODE_MAP.get(name, name))
+    out["votes"] = district_votes.ravel()
+    out["votes_lower"] = lower.ravel()
+    out["votes_upper"] = upper.ravel()
+    out["valid_votes"] = np.repeat(district_valid, P)
+    out["share"] = (district_votes * inv_valid).ravel()
+    out["share_lower"] = (lower * inv_valid).ravel()
+    out["share_upper"] = (upper * inv_valid).ravel()
+    out["n_split_munis"] = np.repeat(n_split_munis, P)
+    out = out[district_reported.ravel()].reset_index(drop=True)
+
+    csv_path = OUT.with_suffix(".csv")
+    out.to_csv(csv_path, index=False, encoding="utf-8")
+    print(f"Saved: {csv_path}")
+    try:
+        out.to_parquet(OUT, index=False)
+        print(f"Saved: {OUT}")
+    except ImportError:
+        print("Warning: pyarrow not installed. Skipping Parquet output.")
+    record_rows(rows_out=len(out))
+
+    total = votes[~np.isnan(valid)].sum()
+    print(f"Rows: {len(out)} ({D} districts x parties)")
+    print(f"Votes allocated: {district_votes.sum():,.0f} / {total:,.0f}")
+    width = (out["share_upper"] - out["share_lower"]).to_numpy()
+    print(f"Share bound width: median {np.median(width):.4f}, max {width.max():.4f}")
+
+
+if __name__ == "__main__":
+    main()
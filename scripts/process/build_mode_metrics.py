@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Precompute the web map's analytical-mode metrics (web/modules/modes.js).
+
+For every muni / pref / block and every party this evaluates, with vectorized
+NumPy over (unit × party) share matrices, the same quantities the browser
+otherwise derives per feature on each interaction:
+
+  share                  party share (row-major unit × party)
+  rank                   1-based party rank, 0 = party not on the ballot
+  opposition_rank        rank with the ruling bloc excluded (opposition_rank mode)
+  winner_margin          top-1 minus top-2 share, plus winner / runner-up party index
+  ruling_vs_opposition   ruling bloc / opposition shares, gap and log ratio
+  concentration          Herfindahl index and effective number of parties
+  js_divergence          sqrt Jensen-Shannon (base 2) vs national shares, for the
+                         "all" and "fielded" (block-renormalized) methods
+
+Pref / block shares are built by exact vote summation like buildAggregates in
+web/modules/data.js. Party indices refer to the "parties" list in the output.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from artifact_writer import ArtifactWriter
+from hirei_to_json import OUT_DIR, PARTY_CODE_MAP, read_hirei, vote_matrix
+from instrumentation import record_rows, stage
+from muni_code_canonical import MuniIndex
+
+
+BASE = Path(__file__).resolve().parent.parent.parent
+MASTER = BASE / "data" / "master" / "district_master.csv"
+OUT_METRICS = OUT_DIR / "mode_metrics.json"
+
+# Mirrors RULING_BLOC_CODES in web/modules/constants.js
+RULING_BLOC_CODES = {"jimin", "ishin"}
+DECIMALS = 6
+
+
+def build_units(
+    index: MuniIndex,
+    votes: np.ndarray,
+    valid: np.ndarray,
+    reported: np.ndarray,
+) -> dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Share matrices per granularity.
+
+    Returns {level: (keys, shares, block_id)} where shares is (units × parties)
+    with NaN for parties not on the ballot, and block_id maps each unit to its
+    row in the block level (for fielded-party renormalization).
+    """
+    master = pd.read_csv(MASTER, dtype={"pref_code": str, "block_id": str})
+    master["pref_code"] = master["pref_code"].str.zfill(2)
+    pref_block = master.drop_duplicates("pref_code").set_index("pref_code")["block_id"]
+
+    muni_pref = index.pref_codes
+    pref_keys, pref_id = np.unique(muni_pref, return_inverse=True)
+    pref_blocks = pref_block.reindex(pref_keys).to_numpy(dtype=str)
+    block_keys = np.array(sorted(set(pref_blocks), key=int))
+    pref_to_block = pd.Index(block_keys).get_indexer(pref_blocks)
+    muni_block = pref_to_block[pref_id]
+
+    counted = ~np.isnan(valid)
+    valid0 = np.where(counted, valid, 0.0)
+    votes0 = np.where(counted[:, None], votes, 0.0)
+
+    units = {}
+    muni_shares = np.where(reported, votes / valid[:, None], np.nan)
+    units["muni"] = (index.codes, muni_shares, muni_block)
+    for level, ids, keys, block_id in (
+        ("pref", pref_id, pref_keys, pref_to_block),
+        ("block", muni_block, block_keys, np.arange(len(block_keys))),
+    ):
+        unit_votes = np.zeros((len(keys), votes.shape[1]))
+        np.add.at(unit_votes, ids, votes0)
+        unit_valid = np.bincount(ids, weights=valid0, minlength=len(keys))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            shares = unit_votes / unit_valid[:, None]
+        units[level] = (keys, np.where(unit_votes > 0, shares, np.nan), block_id)
+    return units
+
+
+def _rank(key: np.ndarray) -> np.ndarray:
+    """1-based descending rank of finite entries per row (0 where key is inf)."""
+    order = np.argsort(key, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(1, key.shape[1] + 1)[None, :], axis=1)
+    return np.where(np.isfinite(key), rank, 0)
+
+
+def _js_distance(P: np.ndarray, Q: np.ndarray) -> np.ndarray:
+    """sqrt of base-2 Jensen-Shannon divergence between rows of P and Q."""
+    M = (P + Q) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        js = 0.5 * (
+            np.where(P > 0, P * np.log2(P / M), 0.0).sum(axis=1)
+            + np.where(Q > 0, Q * np.log2(Q / M), 0.0).sum(axis=1)
+        )
+    return np.sqrt(np.clip(js, 0.0, None))
+
+
+def compute_metrics(
+    shares: np.ndarray,
+    national: np.ndarray,
+    fielded: np.ndarray,
+    ruling: np.ndarray,
+) -> dict[str, dict[str, np.ndarray] | np.ndarray]:
+    """Evaluate every analytical mode for a (units × parties) share matrix.
+
+    national: (parties,) national shares; fielded: (units × parties) bool mask of
+    parties fielded in each unit's block; ruling: (parties,) bool ruling-bloc mask.
+    """
+    n = shares.shape[0]
+    present = ~np.isnan(shares)
+    has_any = present.any(axis=1)
+    S0 = np.where(present, shares, 0.0)
+    rows = np.arange(n)
+
+    key = np.where(present, -shares, np.inf)
+    rank = _rank(key)
+    opposition_rank = _rank(np.where(ruling[None, :], np.inf, key))
+
+    order = np.argsort(key, axis=1, kind="stable")
+    n_present = present.sum(axis=1)
+    top1 = S0[rows, order[:, 0]]
+    top2 = S0[rows, order[:, 1]] if shares.shape[1] > 1 else np.zeros(n)
+    has_two = n_present >= 2
+    margin = np.where(has_two, top1 - top2, np.nan)
+    winner = np.where(has_two, order[:, 0], -1)
+    runner_up = np.where(has_two, order[:, 1] if shares.shape[1] > 1 else -1, -1)
+
+    ruling_share = np.where(has_any, S0[:, ruling].sum(axis=1), np.nan)
+    opposition_share = np.where(has_any, S0[:, ~ruling].sum(axis=1), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_ratio = np.log(ruling_share / opposition_share)
+    log_ratio = np.where(np.isfinite(log_ratio), log_ratio, np.nan)
+
+    hhi = np.where(has_any, (S0 * S0).sum(axis=1), np.nan)
+    with np.errstate(divide="ignore"):
+        effective = np.where(hhi > 0, 1.0 / hhi, np.nan)
+
+    js_all = np.where(has_any, _js_distance(S0, np.broadcast_to(national, S0.shape)), np.nan)
+    P = S0 * fielded
+    Q = national[None, :] * fielded
+    p_total = P.sum(axis=1, keepdims=True)
+    q_total = Q.sum(axis=1, keepdims=True)
+    ok = has_any & (p_total[:, 0] > 0) & (q_total[:, 0] > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        js_fielded = np.where(ok, _js_distance(P / p_total, Q / q_total), np.nan)
+
+    return {
+        "share": shares,
+        "rank": rank,
+        "opposition_rank": opposition_rank,
+        "winner_margin": {"margin": margin, "winner": winner, "runner_up": runner_up},
+        "ruling_vs_opposition": {
+            "ruling": ruling_share,
+            "opposition": opposition_share,
+            "gap": ruling_share - opposition_share,
+            "log_ratio": log_ratio,
+        },
+        "concentration": {"hhi": hhi, "effective_parties": effective},
+        "js_divergence": {"all": js_all, "fielded": js_fielded},
+    }
+
+
+def _to_list(array: np.ndarray) -> list:
+    """Flatten row-major; floats rounded, NaN -> null."""
+    flat = np.asarray(array).ravel()
+    if flat.dtype.kind in "iub":
+        return flat.astype(int).tolist()
+    rounded = np.round(flat, DECIMALS).astype(object)
+    rounded[np.isnan(flat)] = None
+    return rounded.tolist()
+
+
+def mode_metrics(index: MuniIndex | None = None) -> tuple[list[str], dict[str, dict]]:
+    """Compute metrics for every granularity; returns (party codes, {level: payload})."""
+    index = index or MuniIndex.load()
+    df = read_hirei()
+    votes, valid, party_names, muni_pos = vote_matrix(df, index)
+    party_codes = [PARTY_CODE_MAP.get(name, name) for name in party_names]
+
+    reported = np.zeros(votes.shape, dtype=bool)
+    reported[muni_pos, pd.Index(party_names).get_indexer(df["party_name"])] = True
+
+    # parties.json total_votes normalized by their sum (getNationalPartyShareMap)
+    total_votes = votes.sum(axis=0)
+    national = total_votes / total_votes.sum()
+    ruling = np.isin(party_codes, sorted(RULING_BLOC_CODES))
+
+    units = build_units(index, votes, valid, reported)
+    block_fielded = ~np.isnan(units["block"][1])
+    levels = {}
+    for level, (keys, shares, block_id) in units.items():
+        metrics = compute_metrics(shares, national, block_fielded[block_id], ruling)
+        levels[level] = {"keys": keys.tolist(), "metrics": metrics}
+    return party_codes, levels
+
+
+@stage("build_mode_metrics")
+def main() -> None:
+    party_codes, levels = mode_metrics()
+
+    payload = {
+        "parties": party_codes,
+        "ruling_bloc": sorted(RULING_BLOC_CODES),
+        "layout": "per-party arrays are row-major (unit × party)",
+        "granularities": {},
+    }
+    for level, data in levels.items():
+        out = {"keys": data["keys"]}
+        for mode, value in data["metrics"].items():
+            out[mode] = (
+                {name: _to_list(v) for name, v in value.items()}
+                if isinstance(value, dict)
+                else _to_list(value)
+            )
+        payload["granularities"][level] = out
+        print(f"  {level:5s} {len(data['keys']):5d} units")
+    record_rows(rows_out=sum(len(data["keys"]) for data in levels.values()))
+
+    with ArtifactWriter(OUT_DIR) as writer:
+        writer.write_text(
+            OUT_METRICS.name,
+            json.dumps(payload, ensure_ascii=False, separators=(",", ":")),
+        )
+    print(f"Saved {OUT_METRICS} ({OUT_METRICS.stat().st_size / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
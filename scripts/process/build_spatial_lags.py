@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""市区町村の空間ラグ特徴量（センサス＋比例得票率）
+
+adj_muni.npz を一度だけ行基準化し、1次ラグ（W）・高次ラグ（W², W³…）・
+kリング平均（k近傍以内の全市区町村の平均）の演算子を縦に積んだ疎行列を作り、
+全数値列に対して1回の疎×密行列積でラグを計算する。
+欠損値は観測済みの近傍だけで重みを再正規化して扱う（全欠損の列は出力しない）。
+
+入力: data/processed/adj_muni.npz + adj_muni_nodes.csv
+      data/processed/census_muni.csv
+      data/processed/hirei_shikuchouson.csv
+出力: data/processed/census_muni_lagged.parquet（adj_muni_nodes の idx 順、1,892行）
+      pyarrow が無い場合は census_muni_lagged.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from hirei_to_json import PARTY_CODE_MAP
+from instrumentation import record_rows, stage, step
+from muni_code_canonical import MuniIndex
+from spatial_stats import load_adjacency, load_vote_shares, transform_weights
+
+BASE = Path(__file__).resolve().parent.parent.parent
+CENSUS_MUNI = BASE / "data" / "processed" / "census_muni.csv"
+OUT = BASE / "data" / "processed" / "census_muni_lagged.parquet"
+
+ID_COLS = ["muni_code", "muni_name", "pref_code"]
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Build spatially lagged municipality features.")
+    p.add_argument(
+        "--orders",
+        type=int,
+        nargs="+",
+        default=[1, 2],
+        help="Powers of the row-standardized W to apply (default: 1 2)",
+    )
+    p.add_argument(
+        "--rings",
+        type=int,
+        nargs="*",
+        default=[2],
+        help="k-ring neighbourhood means to add (default: 2)",
+    )
+    p.add_argument(
+        "--no-votes",
+        action="store_true",
+        help="Skip lagged party vote shares",
+    )
+    return p.parse_args()
+
+
+def k_ring(W: sparse.csr_matrix, k: int) -> sparse.csr_matrix:
+    """Binary matrix of units reachable within k steps (self excluded)."""
+    A = sparse.csr_matrix(W, dtype=bool)
+    reach = A.copy()
+    frontier = A
+    for _ in range(k - 1):
+        frontier = frontier @ A
+        reach = reach + frontier
+    reach = sparse.csr_matrix(reach, dtype=np.float64)
+    reach.setdiag(0)
+    reach.eliminate_zeros()
+    reach.data[:] = 1.0
+    return reach
+
+
+def build_lag_operators(
+    W: sparse.csr_matrix, orders: list[int], rings: list[int]
+) -> tuple[sparse.csr_matrix, list[str]]:
+    """Stack every lag operator vertically so one product yields all lags."""
+    Wr = transform_weights(W, "r")
+    blocks: list[sparse.csr_matrix] = []
+    suffixes: list[str] = []
+
+    power = None
+    for order in range(1, max(orders, default=0) + 1):
+        power = Wr if power is None else power @ Wr
+        if order in orders:
+            blocks.append(power)
+            suffixes.append(f"lag{order}")
+    for k in rings:
+        blocks.append(transform_weights(k_ring(W, k), "r"))
+        suffixes.append(f"ring{k}")
+    return sparse.vstack(blocks, format="csr"), suffixes
+
+
+def spatial_lags(L: sparse.csr_matrix, X: np.ndarray) -> np.ndarray:
+    """Apply stacked operators to X, renormalizing weights over non-missing neighbours.
+
+    Returns (n_operators·n × p); rows with no observed neighbours are NaN.
+    """
+    observed = ~np.isnan(X)
+    num = L @ np.where(observed, X, 0.0)
+    den = L @ observed.astype(np.float64)
+    return np.divide(num, den, out=np.full(num.shape, np.nan), where=den > 0)
+
+
+@stage("build_spatial_lags")
+def main() -> None:
+    args = parse_args()
+
+    W, nodes = load_adjacency("muni")
+    n = len(nodes)
+
+    # Positional alignment to the canonical index (= adj_muni_nodes order, no merge).
+    index = MuniIndex.load()
+    if not np.array_equal(index.encode(nodes["muni_code"]), np.arange(n)):
+        raise ValueError("muni_index.npy is out of sync with adj_muni_nodes.csv")
+    census = pd.read_csv(CENSUS_MUNI, dtype={"muni_code": str, "pref_code": str})
+    census = index.align(census)
+    if census["muni_name"].isna().any():
+        raise ValueError(f"{census['muni_name'].isna().sum()} canonical codes missing from {CENSUS_MUNI.name}")
+
+    feature_cols = [c for c in census.columns if c not in ID_COLS]
+    features = census[feature_cols].apply(pd.to_numeric, errors="coerce")
+    empty = [c for c in feature_cols if features[c].isna().all()]
+    features = features.drop(columns=empty)
+    if empty:
+        print(f"Skipping {len(empty)} all-NaN columns: {', '.join(empty)}")
+
+    if not args.no_votes:
+        shares = load_vote_shares("muni", nodes)
+        shares.columns = [f"share_{PARTY_CODE_MAP.get(c, c)}" for c in shares.columns]
+        features = pd.concat([features, shares.reset_index(drop=True)], axis=1)
+
+    L, suffixes = build_lag_operators(W, args.orders, args.rings)
+    print(f"Operators: {', '.join(suffixes)} ({L.nnz:,} nonzeros)")
+    print(f"Features: {features.shape[1]} columns × {n} municipalities")
+
+    with step("spatial lags"):
+        lagged = spatial_lags(L, features.to_numpy(dtype=np.float64))
+    blocks = {
+        f"{col}_{suffix}": lagged[i * n:(i + 1) * n, j]
+        for i, suffix in enumerate(suffixes)
+        for j, col in enumerate(features.columns)
+    }
+
+    out = pd.concat(
+        [
+            nodes[["idx"]].reset_index(drop=True),
+            census[ID_COLS],
+            features,
+            pd.DataFrame(blocks),
+        ],
+        axis=1,
+    )
+
+    OUT.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        out.to_parquet(OUT, index=False)
+        out_path = OUT
+    except ImportError:
+        out_path = OUT.with_suffix(".csv")
+        print("Warning: pyarrow not installed. Falling back to CSV.")
+        out.to_csv(out_path, index=False, encoding="utf-8")
+
+    print(f"Saved: {out_path}")
+    print(f"Rows: {len(out)}, columns: {len(out.columns)}")
+    record_rows(rows_in=n, rows_out=len(out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""分析用テンソルストアの構築（.npy + JSONスキーマ）
+
+市区町村×政党の得票行列・有効投票数・市区町村×特徴量のセンサス行列（欠損マスク付き）と
+小選挙区のセンサス行列・選挙区×政党の按分得票行列・有効投票数を、CSV を毎回読み直さずに済むよう .npy に書き出す。
+利用側は np.load(mmap_mode="r") でコピー無しに開けるため、多数のモデルチェーンや
+ワーカーが同時に読んでも起動コストとメモリはほぼ増えない（open_store を参照）。
+
+入力: data/processed/hirei_shikuchouson.csv
+      data/processed/census_muni.csv
+      data/processed/census_district.csv + adj_district_nodes.csv
+      data/processed/hirei_district.parquet|csv（build_hirei_district の出力。無ければ省略）
+      data/processed/muni_index.npy（行順の基準）
+出力: data/processed/tensors/*.npy
+      data/processed/tensors/schema.json（各配列の shape・dtype・軸ラベル）
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dataio import load
+from hirei_to_json import PARTY_CODE_MAP, read_hirei, vote_matrix
+from instrumentation import record_rows, stage
+from muni_code_canonical import MuniIndex
+
+BASE = Path(__file__).resolve().parent.parent.parent
+PROCESSED = BASE / "data" / "processed"
+CENSUS_MUNI = PROCESSED / "census_muni.csv"
+CENSUS_DISTRICT = PROCESSED / "census_district.csv"
+DISTRICT_NODES = PROCESSED / "adj_district_nodes.csv"
+STORE_DIR = PROCESSED / "tensors"
+SCHEMA_VERSION = 1
+
+MUNI_ID_COLS = ["muni_code", "muni_name", "pref_code"]
+DISTRICT_ID_COLS = ["kucode", "kuname", "pref_code", "pref_name", "block_id", "block_name"]
+
+
+def open_store(
+    root: Path = STORE_DIR, mmap_mode: str | None = "r"
+) -> tuple[dict[str, np.ndarray], dict]:
+    """Open every array listed in schema.json (memory-mapped, read-only by default)."""
+    schema = json.loads((root / "schema.json").read_text(encoding="utf-8"))
+    arrays = {
+        name: np.load(root / spec["file"], mmap_mode=mmap_mode)
+        for name, spec in schema["arrays"].items()
+    }
+    return arrays, schema
+
+
+def _feature_matrix(df: pd.DataFrame, id_cols: list[str]) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    cols = [c for c in df.columns if c not in id_cols]
+    values = df[cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    return np.ascontiguousarray(values), ~np.isnan(values), cols
+
+
+def _save(root: Path, schema: dict, name: str, array: np.ndarray, axes: list[str], **extra) -> None:
+    array = np.ascontiguousarray(array)
+    path = root / f"{name}.npy"
+    np.save(path, array)
+    schema["arrays"][name] = {
+        "file": path.name,
+        "shape": list(array.shape),
+        "dtype": array.dtype.str,
+        "axes": axes,
+        **extra,
+    }
+    print(f"  {name:24s} {str(array.shape):14s} {array.dtype}  ({path.stat().st_size / 1024:.1f} KB)")
+
+
+def _district_vote_matrix(kucodes: np.ndarray, party_names: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """District × party votes and district valid votes from hirei_district, in kucodes order.
+
+    hirei_district only has rows for parties on the ballot in the district, so
+    missing cells are 0 votes; districts without rows get NaN valid votes.
+    """
+    df = load("hirei_district", ["kucode", "party_name", "votes", "valid_votes"])
+    rows = pd.Index(kucodes).get_indexer(df["kucode"])
+    cols = pd.Index(party_names).get_indexer(df["party_name"])
+    if (rows < 0).any() or (cols < 0).any():
+        raise ValueError(
+            f"hirei_district has {(rows < 0).sum()} rows for unknown districts and "
+            f"{(cols < 0).sum()} for unknown parties; rebuild it from the current inputs"
+        )
+    votes = np.zeros((len(kucodes), len(party_names)), dtype=np.float64)
+    votes[rows, cols] = df["votes"].to_numpy(dtype=np.float64)
+    valid = np.full(len(kucodes), np.nan)
+    valid[rows] = df["valid_votes"].to_numpy(dtype=np.float64)
+    return votes, valid
+
+
+@stage("build_tensor_store")
+def main() -> None:
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    schema: dict = {"version": SCHEMA_VERSION, "axes": {}, "arrays": {}}
+
+    # --- Municipality axis -------------------------------------------------
+    index = MuniIndex.load()
+    votes, valid_votes, party_names, _ = vote_matrix(read_hirei(), index)
+    census = index.align(pd.read_csv(CENSUS_MUNI, dtype={"muni_code": str, "pref_code": str}))
+    census_values, census_mask, census_cols = _feature_matrix(census, MUNI_ID_COLS)
+
+    schema["axes"]["muni"] = index.codes.tolist()
+    schema["axes"]["party"] = party_names
+    schema["axes"]["party_code"] = [PARTY_CODE_MAP.get(name, name) for name in party_names]
+    schema["axes"]["muni_feature"] = census_cols
+
+    print(f"Writing tensors to {STORE_DIR}")
+    _save(STORE_DIR, schema, "muni_votes", votes.astype(np.int64), ["muni", "party"])
+    _save(
+        STORE_DIR, schema, "muni_valid_votes", valid_votes, ["muni"],
+        note="NaN where no valid votes were reported",
+    )
+    _save(STORE_DIR, schema, "muni_census", census_values, ["muni", "muni_feature"])
+    _save(STORE_DIR, schema, "muni_census_mask", census_mask, ["muni", "muni_feature"], note="True = observed")
+
+    # --- District axis (adj_district_nodes order) --------------------------
+    nodes = pd.read_csv(DISTRICT_NODES)
+    district = pd.read_csv(CENSUS_DISTRICT)
+    pos = pd.Index(district["kucode"]).get_indexer(nodes["kucode"])
+    if (pos < 0).any():
+        raise ValueError(f"{(pos < 0).sum()} districts in {DISTRICT_NODES.name} missing from {CENSUS_DISTRICT.name}")
+    district = district.iloc[pos].reset_index(drop=True)
+    district_values, district_mask, district_cols = _feature_matrix(district, DISTRICT_ID_COLS)
+
+    schema["axes"]["district"] = nodes["kucode"].astype(int).tolist()
+    schema["axes"]["district_feature"] = district_cols
+    _save(STORE_DIR, schema, "district_census", district_values, ["district", "district_feature"])
+    _save(
+        STORE_DIR, schema, "district_census_mask", district_mask,
+        ["district", "district_feature"], note="True = observed",
+    )
+
+    try:
+        district_votes, district_valid = _district_vote_matrix(nodes["kucode"].to_numpy(), party_names)
+    except FileNotFoundError:
+        print("Warning: hirei_district not found (run build_hirei_district). Skipping district votes.")
+    else:
+        _save(
+            STORE_DIR, schema, "district_votes", district_votes, ["district", "party"],
+            note="PR votes allocated from municipalities; 0 where the party was not on the ballot",
+        )
+        _save(
+            STORE_DIR, schema, "district_valid_votes", district_valid, ["district"],
+            note="NaN where no valid votes were allocated",
+        )
+
+    out = STORE_DIR / "schema.json"
+    out.write_text(json.dumps(schema, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"Saved: {out}")
+    record_rows(rows_out=len(index) + len(nodes))
+
+
+if __name__ == "__main__":
+    main()
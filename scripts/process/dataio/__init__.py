@@ -0,0 +1,32 @@
+"""Typed, column-projected loaders for the processed tables.
+
+Every artifact under data/processed (and the district master) is declared once
+in schema.TABLES with its path, column dtypes and the column prefecture / block
+filters apply to. load() reads only the requested columns and rows:
+
+    from dataio import load
+
+    df = load("census_muni", ["muni_code", "pop_total"])
+    df = load("hirei_shikuchouson", ["muni_code", "party_name", "votes"], prefs=["13", "14"])
+    df = load("census_district", blocks=["5"])
+
+A table is read from its Parquet copy when that is at least as new as the CSV
+(filters are then pushed into the Parquet reader), else from the CSV. Stages keep
+writing CSV; write_parquet() (or `python -m dataio`) refreshes the copies.
+Results are memoized per process, so repeated loads in one run parse once.
+"""
+
+from .loaders import block_prefs, clear_cache, column_names, load, source, table, write_parquet
+from .schema import TABLES, Table
+
+__all__ = [
+    "TABLES",
+    "Table",
+    "block_prefs",
+    "clear_cache",
+    "column_names",
+    "load",
+    "source",
+    "table",
+    "write_parquet",
+]
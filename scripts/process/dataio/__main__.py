@@ -0,0 +1,29 @@
+"""Write Parquet copies of the processed tables: python -m dataio [table ...]"""
+
+from __future__ import annotations
+
+import argparse
+
+from .loaders import source, table, write_parquet
+from .schema import TABLES
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(prog="python -m dataio", description="Write Parquet copies of processed CSV tables.")
+    p.add_argument("tables", nargs="*", help=f"Tables to convert (default: all with a CSV). Known: {', '.join(TABLES)}")
+    args = p.parse_args()
+
+    names = args.tables or [name for name, t in TABLES.items() if t.csv.exists()]
+    for name in names:
+        t = table(name)
+        if not t.csv.exists():
+            print(f"Skipping {name} (not found: {t.csv})")
+            continue
+        if source(t) == t.parquet:
+            print(f"Up to date: {t.parquet}")
+            continue
+        print(f"Saved: {write_parquet(name)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Memoized, projected and filtered reads of the tables declared in schema.TABLES."""
+
+from __future__ import annotations
+
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .schema import PREF_FROM, TABLES, Table
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+_CACHE: dict[tuple, pd.DataFrame] = {}
+
+
+def table(name: str) -> Table:
+    try:
+        return TABLES[name]
+    except KeyError:
+        raise KeyError(f"Unknown table '{name}'. Available: {', '.join(TABLES)}") from None
+
+
+def source(t: Table, path: Path | None = None) -> Path:
+    """File load() reads: the Parquet copy unless the CSV is newer (or pyarrow missing)."""
+    if path is not None:
+        if not path.exists():
+            raise FileNotFoundError(f"Input not found: {path}")
+        return path
+    csv, parquet = t.csv, t.parquet
+    if HAS_PYARROW and parquet.exists():
+        if not csv.exists() or parquet.stat().st_mtime_ns >= csv.stat().st_mtime_ns:
+            return parquet
+    if csv.exists():
+        return csv
+    raise FileNotFoundError(f"Input not found: {t.path}")
+
+
+def column_names(name: str, path: Path | None = None) -> list[str]:
+    """Column names of a table, read from the CSV header or Parquet schema only."""
+    src = source(table(name), path)
+    if src.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(src).names
+    return pd.read_csv(src, nrows=0).columns.tolist()
+
+
+def block_prefs(blocks) -> list[str]:
+    """Prefecture codes of the given block ids (from district_master)."""
+    master = load("district_master", ["pref_code", "block_id"])
+    wanted = {str(b) for b in blocks}
+    return sorted(master.loc[master["block_id"].isin(wanted), "pref_code"].unique())
+
+
+def load(
+    name: str,
+    columns: list[str] | None = None,
+    prefs=None,
+    blocks=None,
+    path: Path | None = None,
+) -> pd.DataFrame:
+    """Typed rows of a processed table.
+
+    columns     read only these (all when None); unknown names raise ValueError
+    prefs       keep rows of these prefecture codes ("01" .. "47")
+    blocks      keep rows of these block ids ("1" .. "11"); combined with prefs
+                as an intersection
+    path        read this file instead of the declared one (same schema)
+
+    Parquet filters are pushed into the reader; CSV rows are filtered after
+    parsing the projected columns. Results are memoized per process, keyed by
+    the file's mtime, and returned as copies.
+    """
+    t = table(name)
+    src = source(t, path)
+    prefs = None if prefs is None else sorted({str(p).zfill(2) for p in prefs})
+    blocks = None if blocks is None else sorted({str(b) for b in blocks})
+    key = (
+        name, str(src), src.stat().st_mtime_ns,
+        None if columns is None else tuple(columns),
+        None if prefs is None else tuple(prefs),
+        None if blocks is None else tuple(blocks),
+    )
+    if key not in _CACHE:
+        _CACHE[key] = _read(t, src, columns, prefs, blocks)
+    return _CACHE[key].copy()
+
+
+def clear_cache() -> None:
+    _CACHE.clear()
+
+
+def _filters(t: Table, prefs, blocks) -> tuple[list[str] | None, list[str] | None]:
+    """(prefs, blocks) to filter on, with blocks mapped to prefs when there is no block column."""
+    if blocks is not None and t.block_col is None:
+        if t.pref_col is None:
+            raise ValueError(f"Table '{t.name}' cannot be filtered by block")
+        by_block = block_prefs(blocks)
+        prefs = by_block if prefs is None else sorted(set(prefs) & set(by_block))
+        blocks = None
+    if prefs is not None and t.pref_col is None:
+        raise ValueError(f"Table '{t.name}' cannot be filtered by prefecture")
+    return prefs, blocks
+
+
+def _read(t: Table, src: Path, columns, prefs, blocks) -> pd.DataFrame:
+    prefs, blocks = _filters(t, prefs, blocks)
+    available = column_names(t.name, src)
+    wanted = available if columns is None else list(columns)
+    missing = [c for c in wanted if c not in available]
+    if missing:
+        raise ValueError(
+            f"Column '{missing[0]}' not found in {src}. Available: {', '.join(available)}"
+        )
+    keys = [c for c in (t.pref_col if prefs is not None else None,
+                        t.block_col if blocks is not None else None) if c]
+    read = wanted + [c for c in keys if c not in wanted]
+
+    if src.suffix == ".parquet":
+        df = pd.read_parquet(src, columns=read, filters=_arrow_filter(t, prefs, blocks))
+        _pad_codes(t, df)
+    else:
+        dtype = {c: t.dtype(c) for c in read if t.dtype(c) is not None}
+        df = pd.read_csv(src, usecols=read, dtype=dtype)[read]
+        _pad_codes(t, df)
+        mask = np.ones(len(df), dtype=bool)
+        if prefs is not None:
+            mask &= PREF_FROM[t.pref_col](df[t.pref_col]).isin(prefs).to_numpy()
+        if blocks is not None:
+            mask &= df[t.block_col].isin(blocks).to_numpy()
+        if not mask.all():
+            df = df[mask].reset_index(drop=True)
+    return df[wanted]
+
+
+def _pad_codes(t: Table, df: pd.DataFrame) -> None:
+    """Zero-fill string code columns in place ("1" -> "01", "1101.0" -> "01101")."""
+    for col, width in t.codes.items():
+        if col in df.columns and pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].str.replace(r"\.0$", "", regex=True).str.zfill(width)
+
+
+def _arrow_filter(t: Table, prefs, blocks):
+    import pyarrow.compute as pc
+
+    expr = None
+    if prefs is not None:
+        field = pc.field(t.pref_col)
+        if t.pref_col == "kucode":
+            key = pc.divide(field, 100).isin([int(p) for p in prefs])
+        elif t.pref_col == "pref_code":
+            # Parquet written by stages may hold unpadded or integer codes
+            key = field.cast("string").isin(prefs + [p.lstrip("0") for p in prefs])
+        else:
+            key = pc.utf8_slice_codeunits(field, 0, 2).isin(prefs)
+        expr = key
+    if blocks is not None:
+        key = pc.field(t.block_col).cast("string").isin(blocks)
+        expr = key if expr is None else expr & key
+    return expr
+
+
+def write_parquet(name: str) -> Path:
+    """Write the typed CSV as the table's Parquet copy, which load() then prefers."""
+    t = table(name)
+    df = load(name, path=t.csv)
+    df.to_parquet(t.parquet, index=False)
+    return t.parquet
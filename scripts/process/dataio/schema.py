@@ -0,0 +1,155 @@
+"""Declared schemas of the processed tables (paths, column dtypes, prefecture keys)."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parent.parent.parent.parent
+PROCESSED = BASE / "data" / "processed"
+MASTER = BASE / "data" / "master"
+
+# Prefecture of a row, derived from one of its columns
+PREF_FROM = {
+    "pref_code": lambda s: s,
+    "muni_code": lambda s: s.str[:2],
+    "new_code": lambda s: s.str[:2],
+    "kucode": lambda s: (s // 100).astype(str).str.zfill(2),
+}
+
+
+class Table:
+    """One processed artifact: where it lives and how its columns are typed.
+
+    dtypes lists the key and label columns; every other column is read as
+    default (float64 for the count / rate tables). codes gives zero-fill widths
+    for code columns stored without padding in older CSVs. pref_col names the
+    column a prefecture filter applies to (see PREF_FROM), block_col the
+    column a block filter applies to directly; a table with neither cannot be
+    filtered. aligned marks tables written in muni_index.npy row order.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: Path,
+        dtypes: dict[str, str],
+        default: str | None = "float64",
+        codes: dict[str, int] | None = None,
+        pref_col: str | None = None,
+        block_col: str | None = None,
+        aligned: bool = False,
+    ) -> None:
+        self.name = name
+        self.path = path
+        self.dtypes = dict(dtypes)
+        self.default = default
+        self.codes = dict(codes or {})
+        self.pref_col = pref_col
+        self.block_col = block_col
+        self.aligned = aligned
+
+    def __repr__(self) -> str:
+        return f"Table({self.name!r}, {self.path.name})"
+
+    @property
+    def csv(self) -> Path:
+        return self.path.with_suffix(".csv")
+
+    @property
+    def parquet(self) -> Path:
+        return self.path.with_suffix(".parquet")
+
+    def dtype(self, column: str) -> str | None:
+        return self.dtypes.get(column, self.default)
+
+
+_CODES = {"muni_code": 5, "pref_code": 2}
+_MUNI = {"muni_code": "str", "muni_name": "str", "pref_code": "str", "pref_name": "str"}
+_DISTRICT = {
+    "kucode": "int64", "kuname": "str", "pref_code": "str", "pref_name": "str",
+    "block_id": "str", "block_name": "str",
+}
+_TURNOUT = {
+    "muni_code": "str", "muni_name": "str", "pref_code": "str", "pref_name": "str",
+    "block_id": "str", "block_name": "str",
+}
+
+
+def _tables(*tables: Table) -> dict[str, Table]:
+    return {t.name: t for t in tables}
+
+
+TABLES = _tables(
+    Table(
+        "hirei_shikuchouson", PROCESSED / "hirei_shikuchouson.csv",
+        {**_MUNI, "party_name": "str", "votes": "float64", "valid_votes_muni": "float64"},
+        default=None, codes=_CODES, pref_col="pref_code",
+    ),
+    Table("census_muni", PROCESSED / "census_muni.csv", _MUNI, codes=_CODES, pref_col="muni_code"),
+    Table(
+        "census_muni_lagged", PROCESSED / "census_muni_lagged.parquet", {**_MUNI, "idx": "int64"},
+        codes=_CODES, pref_col="muni_code", aligned=True,
+    ),
+    Table(
+        "census_district", PROCESSED / "census_district.csv", _DISTRICT,
+        codes={"pref_code": 2}, pref_col="pref_code", block_col="block_id",
+    ),
+    Table(
+        "census_small_area_muni", PROCESSED / "census_small_area_muni.csv", {"muni_code": "str"},
+        codes=_CODES, pref_col="muni_code", aligned=True,
+    ),
+    Table(
+        "census_small_area_district", PROCESSED / "census_small_area_district.csv", {"kucode": "int64"},
+        pref_col="kucode",
+    ),
+    Table(
+        "turnout_muni", PROCESSED / "turnout_muni.csv", _TURNOUT, codes=_CODES, pref_col="muni_code",
+        aligned=True,
+    ),
+    Table(
+        "turnout_pref", PROCESSED / "turnout_pref.csv", _TURNOUT, codes=_CODES,
+        pref_col="pref_code", block_col="block_id",
+    ),
+    Table("turnout_block", PROCESSED / "turnout_block.csv", _TURNOUT, block_col="block_id"),
+    Table(
+        "muni_district_weights", PROCESSED / "muni_district_weights.csv",
+        {"muni_code": "str", "kucode": "int64"}, codes=_CODES, pref_col="muni_code",
+    ),
+    Table(
+        "muni_district_weights_small_area", PROCESSED / "muni_district_weights_small_area.csv",
+        {"muni_code": "str", "kucode": "int64"}, codes=_CODES, pref_col="muni_code",
+    ),
+    Table(
+        "muni_crosswalk_small_area", PROCESSED / "muni_crosswalk_small_area.csv",
+        {"old_code": "str", "new_code": "str"}, codes={"old_code": 5, "new_code": 5}, pref_col="new_code",
+    ),
+    Table(
+        "hirei_district", PROCESSED / "hirei_district.parquet",
+        {**_DISTRICT, "party_name": "str", "party_code": "str", "n_split_munis": "int64"},
+        codes={"pref_code": 2}, pref_col="pref_code", block_col="block_id",
+    ),
+    Table(
+        "adj_muni_nodes", PROCESSED / "adj_muni_nodes.csv", {**_MUNI, "idx": "int64"},
+        default=None, codes=_CODES, pref_col="muni_code", aligned=True,
+    ),
+    Table(
+        "adj_pref_nodes", PROCESSED / "adj_pref_nodes.csv", {"idx": "int64", "pref_code": "str", "pref_name": "str"},
+        default=None, codes=_CODES, pref_col="pref_code",
+    ),
+    Table(
+        "adj_district_nodes", PROCESSED / "adj_district_nodes.csv",
+        {"idx": "int64", "kucode": "int64", "kuname": "str"}, default=None, pref_col="kucode",
+    ),
+    Table(
+        "adj_block_nodes", PROCESSED / "adj_block_nodes.csv",
+        {"idx": "int64", "block_id": "str", "block_name": "str"}, default=None, block_col="block_id",
+    ),
+    Table(
+        "district_master", MASTER / "district_master.csv",
+        {
+            "pref_code": "str", "district_num": "int64", "district_code": "int64", "district_name": "str",
+            "pref_name": "str", "block_id": "str", "block_name": "str",
+        },
+        default=None, codes=_CODES, pref_col="pref_code", block_col="block_id",
+    ),
+)
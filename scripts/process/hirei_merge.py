@@ -16,6 +16,8 @@ from collections import defaultdict
 
 import pandas as pd
 
+from instrumentation import record_rows, stage
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 HIREI_DIR = BASE_DIR / "data" / "raw" / "election" / "hirei"
 RAW_DIR = HIREI_DIR / "csv"
@@ -185,9 +187,11 @@ def merge():
             writer.writerow({k: row.get(k, "") for k in fieldnames})
 
     print(f"\nWrote {len(rows_to_write)} rows to {out_path}")
+    record_rows(rows_in=len(all_rows), rows_out=len(rows_to_write))
     return len(missing)
 
 
 if __name__ == "__main__":
-    missing = merge()
+    with stage("hirei_merge"):
+        missing = merge()
     sys.exit(0 if missing == 0 else 1)
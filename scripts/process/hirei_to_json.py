@@ -6,11 +6,16 @@ from __future__ import annotations
 import json
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from artifact_writer import ArtifactWriter
+from dataio import load
+from instrumentation import record_rows, stage
+from muni_code_canonical import MuniIndex
+
 
 BASE = Path(__file__).resolve().parent.parent.parent
-IN_CSV = BASE / "data" / "processed" / "hirei_shikuchouson.csv"
 OUT_DIR = BASE / "web" / "data"
 OUT_ELECTION = OUT_DIR / "election_data.json"
 OUT_PARTIES = OUT_DIR / "parties.json"
@@ -31,132 +36,107 @@ PARTY_CODE_MAP = {
 }
 
 
+def read_hirei(path: Path | None = None, columns: list[str] | None = None, prefs=None) -> pd.DataFrame:
+    """Read hirei_shikuchouson.csv typed by the dataio schema (codes zero-padded).
+
+    columns / prefs project and filter the read (see dataio.load); path
+    overrides the processed table. Missing votes count as 0.
+    """
+    df = load("hirei_shikuchouson", columns, prefs=prefs, path=path)
+    if "votes" in df.columns:
+        df["votes"] = df["votes"].fillna(0.0)
+    if columns is None and "valid_votes_muni" not in df.columns:
+        df["valid_votes_muni"] = np.nan
+    return df
+
+
+def vote_matrix(
+    df: pd.DataFrame,
+    index: MuniIndex,
+) -> tuple[np.ndarray, np.ndarray, list[str], np.ndarray]:
+    """Aggregate hirei rows into positional (muni × party) arrays.
+
+    Returns party votes (n × p), valid votes per muni (valid_votes_muni, falling
+    back to the sum of party votes; NaN when zero), party names in sorted order,
+    and the municipality position of every input row.
+    """
+    muni_pos = index.encode(df["muni_code"], strict=True)
+    party_names = sorted(df["party_name"].dropna().unique())
+    party_pos = pd.Index(party_names).get_indexer(df["party_name"])
+    n, p = len(index), len(party_names)
+
+    votes = np.zeros((n, p))
+    np.add.at(votes, (muni_pos, party_pos), df["votes"].to_numpy(dtype=float))
+
+    valid = np.full(n, np.nan)
+    np.fmax.at(valid, muni_pos, df["valid_votes_muni"].to_numpy(dtype=float))
+    valid = np.where(np.isnan(valid), votes.sum(axis=1), valid)
+    valid[valid == 0] = np.nan
+    return votes, valid, party_names, muni_pos
+
+
+@stage("hirei_to_json")
 def main() -> None:
-    if not IN_CSV.exists():
-        raise FileNotFoundError(f"Input not found: {IN_CSV}")
-
-    df = pd.read_csv(
-        IN_CSV,
-        dtype={
-            "pref_code": str,
-            "pref_name": str,
-            "muni_code": str,
-            "muni_name": str,
-            "party_name": str,
-        },
-    )
-    df["muni_code"] = df["muni_code"].astype(str).str.zfill(5)
-    df["votes"] = pd.to_numeric(df["votes"], errors="coerce").fillna(0.0)
-    df["valid_votes_muni"] = pd.to_numeric(
-        df.get("valid_votes_muni"),
-        errors="coerce",
-    )
-
-    muni_valid = (
-        df.groupby("muni_code", as_index=False)["valid_votes_muni"]
-        .max()
-        .rename(columns={"valid_votes_muni": "valid_votes"})
-    )
-    vote_sum = (
-        df.groupby("muni_code", as_index=False)["votes"]
-        .sum()
-        .rename(columns={"votes": "vote_sum"})
-    )
-    denom = muni_valid.merge(vote_sum, on="muni_code", how="outer")
-    denom["valid_votes"] = denom["valid_votes"].fillna(denom["vote_sum"])
-    denom["valid_votes"] = denom["valid_votes"].replace(0, pd.NA)
-
-    df = df.merge(denom[["muni_code", "valid_votes"]], on="muni_code", how="left")
-    df["vote_share"] = df["votes"] / df["valid_votes"]
-
-    party_by_muni = (
-        df.groupby(["muni_code", "party_name"], as_index=False)["votes"]
-        .sum()
-        .rename(columns={"votes": "party_votes"})
-    )
-    party_by_muni["party_code"] = party_by_muni["party_name"].map(PARTY_CODE_MAP)
-    missing_codes = party_by_muni[party_by_muni["party_code"].isna()][
-        "party_name"
-    ].drop_duplicates()
-    if not missing_codes.empty:
-        missing = ", ".join(sorted(missing_codes.astype(str).tolist()))
+    index = MuniIndex.load()
+    df = read_hirei()
+    votes, valid_votes, party_names, muni_pos = vote_matrix(df, index)
+
+    missing_codes = [name for name in party_names if name not in PARTY_CODE_MAP]
+    if missing_codes:
+        missing = ", ".join(missing_codes)
         raise ValueError(f"Missing PARTY_CODE_MAP entries for: {missing}")
-    party_by_muni = party_by_muni.merge(
-        denom[["muni_code", "valid_votes"]],
-        on="muni_code",
-        how="left",
-    )
-    party_by_muni["vote_share"] = (
-        party_by_muni["party_votes"] / party_by_muni["valid_votes"]
-    )
-
-    muni_meta = (
-        df.groupby("muni_code", as_index=False)
-        .agg(
-            muni_name=("muni_name", "first"),
-            pref_name=("pref_name", "first"),
-        )
-        .merge(denom[["muni_code", "valid_votes"]], on="muni_code", how="left")
-    )
-
-    party_dict = (
-        party_by_muni.dropna(subset=["vote_share"])
-        .groupby("muni_code")
-        .apply(
-            lambda g: {
-                str(row["party_code"]): float(row["vote_share"])
-                for _, row in g.iterrows()
-            },
-            include_groups=False,
-        )
-        .to_dict()
-    )
+    party_codes = [PARTY_CODE_MAP[name] for name in party_names]
+
+    # (muni, party) pairs that appear in the source rows
+    party_pos = pd.Index(party_names).get_indexer(df["party_name"])
+    reported = np.zeros(votes.shape, dtype=bool)
+    reported[muni_pos, party_pos] = True
+    shares = votes / valid_votes[:, None]
+
+    # First row per municipality supplies the display names
+    present, first_row = np.unique(muni_pos, return_index=True)
+    muni_names = df["muni_name"].to_numpy(dtype=object)[first_row]
+    pref_names = df["pref_name"].to_numpy(dtype=object)[first_row]
 
     election_data = {}
-    for _, row in muni_meta.iterrows():
-        muni_code = str(row["muni_code"]).zfill(5)
-        valid_votes = row["valid_votes"]
-        election_data[muni_code] = {
-            "name": row["muni_name"] if pd.notna(row["muni_name"]) else "",
-            "pref": row["pref_name"] if pd.notna(row["pref_name"]) else "",
-            "valid_votes": (
-                int(valid_votes)
-                if pd.notna(valid_votes)
-                else None
-            ),
-            "parties": party_dict.get(muni_code, {}),
+    for pos, muni_name, pref_name in zip(present, muni_names, pref_names):
+        valid = valid_votes[pos]
+        has_share = reported[pos] & ~np.isnan(shares[pos])
+        election_data[str(index.codes[pos])] = {
+            "name": muni_name if pd.notna(muni_name) else "",
+            "pref": pref_name if pd.notna(pref_name) else "",
+            "valid_votes": int(valid) if pd.notna(valid) else None,
+            "parties": {
+                party_codes[j]: float(shares[pos, j])
+                for j in np.flatnonzero(has_share)
+            },
         }
 
-    party_summary = (
-        df.groupby("party_name", as_index=False)
-        .agg(
-            total_votes=("votes", "sum"),
-            municipalities=("muni_code", lambda s: int(s[s.notna()].nunique())),
-        )
-        .sort_values("total_votes", ascending=False)
-    )
+    total_votes = votes.sum(axis=0)
+    municipalities = reported.sum(axis=0)
     parties = [
         {
-            "code": PARTY_CODE_MAP[str(row["party_name"])],
-            "name": str(row["party_name"]),
-            "total_votes": int(row["total_votes"]),
-            "municipalities": int(row["municipalities"]),
+            "code": party_codes[j],
+            "name": party_names[j],
+            "total_votes": int(total_votes[j]),
+            "municipalities": int(municipalities[j]),
         }
-        for _, row in party_summary.iterrows()
+        for j in np.argsort(-total_votes, kind="stable")
     ]
 
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-    OUT_ELECTION.write_text(
-        json.dumps(election_data, ensure_ascii=False, separators=(",", ":")),
-        encoding="utf-8",
-    )
-    OUT_PARTIES.write_text(
-        json.dumps(parties, ensure_ascii=False, separators=(",", ":")),
-        encoding="utf-8",
-    )
+    with ArtifactWriter(OUT_DIR) as writer:
+        writer.write_text(
+            OUT_ELECTION.name,
+            json.dumps(election_data, ensure_ascii=False, separators=(",", ":")),
+        )
+        writer.write_text(
+            OUT_PARTIES.name,
+            json.dumps(parties, ensure_ascii=False, separators=(",", ":")),
+        )
 
     print(f"Saved {OUT_ELECTION} ({OUT_ELECTION.stat().st_size / 1024:.1f} KB)")
     print(f"Saved {OUT_PARTIES} ({OUT_PARTIES.stat().st_size / 1024:.1f} KB)")
+    record_rows(rows_in=len(df), rows_out=len(election_data))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""Timing and resource instrumentation shared by the pipeline stages.
+
+    @stage("build_adjacency")
+    def main():
+        with step("muni adjacency"):
+            ...
+            record_rows(rows_in=len(gdf), rows_out=n)
+
+stage() wraps one run of an entry point and step() any sub-step; both work as
+context managers and as decorators, and steps nest. Each records
+
+  wall_s          wall-clock time
+  cpu_s           user + system CPU of the process and of child processes
+                  reaped during the step (e.g. ProcessPoolExecutor workers)
+  peak_rss_mb     process peak RSS (high-water mark) at the end of the step
+  bytes_read      bytes read / written through syscalls (Linux /proc/self/io
+  bytes_written   rchar / wchar; child processes not included, None elsewhere)
+  rows_in/out     set by the caller via record_rows()
+
+When a stage finishes (or fails) it writes a run report
+
+  data/processed/run_reports/<stage>-<run_id>.json   run metadata + every step
+                                                    (run_id: UTC start to the µs + pid)
+  data/processed/run_reports/runs.csv                one row per step, appended
+
+so runs can be compared across code changes, N03 vintages and elections.
+
+Environment
+  PIPELINE_REPORT_DIR  report directory (default above; empty string disables reports)
+  PIPELINE_PROFILE     cprofile     -> <stage>-<run_id>.prof (load with pstats / snakeviz)
+                       pyinstrument -> <stage>-<run_id>.html (falls back to cProfile)
+"""
+
+from __future__ import annotations
+
+import cProfile
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+BASE = Path(__file__).resolve().parent.parent.parent
+REPORT_DIR = BASE / "data" / "processed" / "run_reports"
+RUNS_CSV = "runs.csv"
+PROFILERS = ("cprofile", "pyinstrument")
+
+CSV_FIELDS = [
+    "run_id", "stage", "git_commit", "step", "depth", "status",
+    "wall_s", "cpu_s", "peak_rss_mb", "bytes_read", "bytes_written", "rows_in", "rows_out",
+]
+
+# Steps of the active run in start order; the open ones form a stack.
+_steps: list[Step] = []
+_open: list[Step] = []
+
+
+def _cpu_time() -> float:
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _peak_rss_mb(who: int | None = None) -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes on Linux
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _io_counters() -> tuple[int, int] | None:
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            fields = dict(line.split(":") for line in f)
+    except OSError:
+        return None
+    return int(fields["rchar"]), int(fields["wchar"])
+
+
+class Step:
+    """Measurements of one stage or sub-step."""
+
+    def __init__(self, name: str, depth: int) -> None:
+        self.name = name
+        self.depth = depth
+        self.status = "running"
+        self.rows_in: int | None = None
+        self.rows_out: int | None = None
+        self.wall_s = self.cpu_s = 0.0
+        self.peak_rss_mb: float | None = None
+        self.bytes_read: int | None = None
+        self.bytes_written: int | None = None
+        self._t0 = time.perf_counter()
+        self._cpu0 = _cpu_time()
+        self._io0 = _io_counters()
+
+    def stop(self, status: str) -> None:
+        self.status = status
+        self.wall_s = time.perf_counter() - self._t0
+        self.cpu_s = _cpu_time() - self._cpu0
+        self.peak_rss_mb = _peak_rss_mb()
+        io = _io_counters()
+        if io is not None and self._io0 is not None:
+            self.bytes_read = io[0] - self._io0[0]
+            self.bytes_written = io[1] - self._io0[1]
+
+    def summary(self) -> str:
+        parts = [f"{self.wall_s:.1f}s wall", f"{self.cpu_s:.1f}s CPU"]
+        if self.peak_rss_mb is not None:
+            parts.append(f"peak RSS {self.peak_rss_mb:,.0f} MB")
+        if self.bytes_read is not None:
+            parts.append(f"read {self.bytes_read / 1e6:,.1f} MB, wrote {self.bytes_written / 1e6:,.1f} MB")
+        if self.rows_in is not None or self.rows_out is not None:
+            parts.append(f"rows {self.rows_in if self.rows_in is not None else '-'}"
+                         f" -> {self.rows_out if self.rows_out is not None else '-'}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> dict:
+        return {
+            "step": self.name,
+            "depth": self.depth,
+            "status": self.status,
+            "wall_s": round(self.wall_s, 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "peak_rss_mb": None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+        }
+
+
+def record_rows(rows_in: int | None = None, rows_out: int | None = None) -> None:
+    """Set row counts on the innermost open step (no-op outside a stage)."""
+    if not _open:
+        return
+    if rows_in is not None:
+        _open[-1].rows_in = int(rows_in)
+    if rows_out is not None:
+        _open[-1].rows_out = int(rows_out)
+
+
+@contextmanager
+def step(name: str) -> Iterator[Step]:
+    """Measure a sub-step; prints a one-line summary when it ends."""
+    s = Step(name, len(_open))
+    _steps.append(s)
+    _open.append(s)
+    status = "failed"
+    try:
+        yield s
+        status = "ok"
+    finally:
+        _open.pop()
+        s.stop(status)
+        print(f"  [{name}] {s.summary()}")
+
+
+def _report_dir() -> Path | None:
+    value = os.environ.get("PIPELINE_REPORT_DIR")
+    if value is None:
+        return REPORT_DIR
+    return Path(value) if value else None
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _start_profiler(mode: str) -> tuple[str, object] | None:
+    if not mode:
+        return None
+    if mode not in PROFILERS:
+        raise ValueError(f"PIPELINE_PROFILE must be one of {', '.join(PROFILERS)}, got {mode!r}")
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("Warning: pyinstrument not installed. Falling back to cProfile.")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return mode, profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return "cprofile", profiler
+
+
+def _stop_profiler(active: tuple[str, object], path_stem: Path) -> Path:
+    mode, profiler = active
+    path_stem.parent.mkdir(parents=True, exist_ok=True)
+    if mode == "pyinstrument":
+        profiler.stop()
+        path = path_stem.with_suffix(".html")
+        path.write_text(profiler.output_html(), encoding="utf-8")
+    else:
+        profiler.disable()
+        path = path_stem.with_suffix(".prof")
+        profiler.dump_stats(path)
+    print(f"Saved: {path}")
+    return path
+
+
+def _write_report(report_dir: Path, report: dict) -> None:
+    report_dir.mkdir(parents=True, exist_ok=True)
+    out_json = report_dir / f"{report['stage']}-{report['run_id']}.json"
+    out_json.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+    out_csv = report_dir / RUNS_CSV
+    new = not out_csv.exists()
+    with open(out_csv, "a", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        if new:
+            writer.writeheader()
+        for row in report["steps"]:
+            writer.writerow({
+                "run_id": report["run_id"],
+                "stage": report["stage"],
+                "git_commit": report["git_commit"],
+                **row,
+            })
+    print(f"Run report: {out_json}")
+
+
+@contextmanager
+def stage(name: str) -> Iterator[Step]:
+    """Measure one run of a pipeline entry point and write its run report.
+
+    Inside another stage (one entry point calling another) this is a plain step.
+    """
+    if _open:
+        with step(name) as s:
+            yield s
+        return
+
+    started = datetime.now(timezone.utc)
+    # Microseconds and pid keep quick or parallel runs of one stage apart; no "."
+    # so that with_suffix() on <stage>-<run_id> cannot cut it
+    run_id = f"{started:%Y%m%dT%H%M%S%fZ}-{os.getpid()}"
+    report_dir = _report_dir()
+    profiler = _start_profiler(os.environ.get("PIPELINE_PROFILE", "").strip().lower())
+    error = None
+    try:
+        with step(name) as root:
+            yield root
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        # Read before _git_commit(): forked children start at the parent's RSS
+        children_rss = _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource is not None else None
+        profile = None
+        if profiler is not None:
+            profile = _stop_profiler(profiler, (report_dir or REPORT_DIR) / f"{name}-{run_id}")
+        report = {
+            "stage": name,
+            "run_id": run_id,
+            "started_at": started.isoformat(timespec="seconds"),
+            "status": root.status if error is None else "failed",
+            "error": error,
+            "argv": sys.argv[1:],
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "children_peak_rss_mb": None if children_rss is None else round(children_rss, 1),
+            "profile": str(profile) if profile else None,
+            "steps": [s.as_dict() for s in _steps],
+        }
+        _steps.clear()
+        if report_dir is not None:
+            _write_report(report_dir, report)
@@ -3,15 +3,33 @@
 
 census_muni.csv・hirei_shikuchouson.csv・adj_muni_nodes.csv の三方一致に必要な
 除外コード、政令市親コード、浜松旧区→新区マッピングを一元管理する。
+
+MuniIndex は adj_muni_nodes.csv の行順を基準に muni_code ⇔ int32 位置を対応付け、
+センサス・得票・隣接行列を文字列の結合なしに位置で揃えるための共通インデックス。
+
+MuniCrosswalk は過去の市区町村コード（合併・分割・市制施行によるコード変更）を
+現行コードへ重み付きで対応付ける。浜松市の区再編もその一例として扱い、
+data/master/muni_crosswalk.csv の行と合わせて過去選挙・旧年次センサスの再集計に使う。
 """
 
 from __future__ import annotations
 
 from pathlib import Path
+from typing import TYPE_CHECKING
 
+import numpy as np
 import pandas as pd
 
+# scipy is imported where a matrix is built: every script imports this module
+if TYPE_CHECKING:
+    from scipy import sparse
+
 BASE = Path(__file__).resolve().parent.parent.parent
+NODES_CSV = BASE / "data" / "processed" / "adj_muni_nodes.csv"
+INDEX_NPY = BASE / "data" / "processed" / "muni_index.npy"
+CROSSWALK_CSV = BASE / "data" / "master" / "muni_crosswalk.csv"
+# process_census_small_area.py が小地域人口の合計から作る按分比（あれば手入力の比より優先）
+SMALL_AREA_CROSSWALK = BASE / "data" / "processed" / "muni_crosswalk_small_area.csv"
 
 # adj_muni_nodes から除外するコード（所属未定地＋北方領土）
 EXCLUDE_CODES = {
@@ -32,7 +50,8 @@ SEIREI_PARENT_CODES = {
 
 # 浜松旧区→新区（2024年1月再編）
 # 旧北区(22135)は三方原地区→中央区、残り→浜名区に分割
-# 按分比は 2023年10月住基人口からの推計値（約39:61）
+# 按分比は 2023年10月住基人口からの推計値（約39:61）。muni_crosswalk_small_area.csv が
+# ある場合は小地域人口の合計から求めた比で置き換える
 #   中央区全体608,145 - 旧中区〜南区合計572,525 ≈ 35,620 → 北区の38.4%
 #   浜名区全体155,996 - 旧浜北区98,779 ≈ 57,217 → 北区の61.6%
 HAMAMATSU_OLD_CODES = {"22131", "22132", "22133", "22134", "22135", "22136", "22137"}
@@ -56,12 +75,258 @@ HAMAMATSU_NEW_WARDS = {
 }
 
 
+def normalize_muni_codes(values) -> np.ndarray:
+    """Return 5-digit zero-padded code strings (accepts str, int or float-like input)."""
+    s = pd.Series(values, copy=False).astype(str).str.strip()
+    return s.str.replace(r"\.0$", "", regex=True).str.zfill(5).to_numpy(dtype="U5")
+
+
+class MuniIndex:
+    """Dense int32 positions for canonical municipality codes (adj_muni_nodes order)."""
+
+    def __init__(self, codes) -> None:
+        self.codes = normalize_muni_codes(codes)
+        self._order = np.argsort(self.codes, kind="stable").astype(np.int32)
+        self._sorted = self.codes[self._order]
+        dup = self._sorted[1:][self._sorted[1:] == self._sorted[:-1]]
+        if len(dup):
+            raise ValueError(f"Duplicate muni_code in index: {sorted(set(dup))[:10]}")
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __repr__(self) -> str:
+        return f"MuniIndex({len(self)} codes)"
+
+    @classmethod
+    def from_nodes(cls, path: Path = NODES_CSV) -> MuniIndex:
+        """Build from adj_muni_nodes.csv (row order = adjacency matrix order)."""
+        df = pd.read_csv(path, dtype={"muni_code": str})
+        codes = df["muni_code"]
+        return cls(codes[~codes.isin(EXCLUDE_CODES)])
+
+    @classmethod
+    def load(cls, path: Path = INDEX_NPY, nodes_path: Path = NODES_CSV) -> MuniIndex:
+        """Load the persisted binary index, falling back to adj_muni_nodes.csv if stale."""
+        if path.exists() and (not nodes_path.exists() or path.stat().st_mtime >= nodes_path.stat().st_mtime):
+            return cls(np.load(path).astype("U5"))
+        return cls.from_nodes(nodes_path)
+
+    def save(self, path: Path = INDEX_NPY) -> None:
+        """Persist codes as a fixed-width byte array (about 10 KB for 1,892 codes)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, self.codes.astype("S5"))
+
+    @property
+    def pref_codes(self) -> np.ndarray:
+        """Two-digit prefecture code for every position."""
+        return self.codes.astype("U2")
+
+    def encode(self, codes, strict: bool = False) -> np.ndarray:
+        """Map codes to int32 positions; unknown codes become -1 (or raise if strict)."""
+        codes = normalize_muni_codes(codes)
+        i = np.searchsorted(self._sorted, codes)
+        i = np.minimum(i, len(self) - 1)
+        found = self._sorted[i] == codes
+        pos = np.where(found, self._order[i], -1).astype(np.int32)
+        if strict and not found.all():
+            unknown = sorted(set(codes[~found]))
+            raise KeyError(f"{len(unknown)} codes not in canonical index: {unknown[:10]}")
+        return pos
+
+    def decode(self, positions) -> np.ndarray:
+        """Map int positions back to code strings."""
+        return self.codes[np.asarray(positions)]
+
+    def take(self, values: np.ndarray, positions: np.ndarray, fill=np.nan) -> np.ndarray:
+        """Gather index-aligned values at positions; -1 positions get `fill`."""
+        values = np.asarray(values)
+        out = values[np.maximum(positions, 0)]
+        if (positions < 0).any():
+            out = out.astype(np.result_type(out.dtype, np.min_scalar_type(fill)))
+            out[positions < 0] = fill
+        return out
+
+    def align(self, df: pd.DataFrame, code_col: str = "muni_code") -> pd.DataFrame:
+        """Reorder rows of df into index order by position (missing codes -> NaN rows).
+
+        Rows whose code is not in the index are dropped; duplicate codes keep the first row.
+        """
+        pos = self.encode(df[code_col])
+        rows = np.full(len(self), -1, dtype=np.int64)
+        keep = np.flatnonzero(pos >= 0)[::-1]
+        rows[pos[keep]] = keep
+        out = df.reset_index(drop=True).reindex(rows).reset_index(drop=True)
+        out[code_col] = self.codes
+        return out
+
+
 def load_canonical_codes() -> set[str]:
     """adj_muni_nodes から除外コードを引いた基準コード集合（1892件）を返す。
 
     adj_muni_nodes.csv が未生成の場合は FileNotFoundError を送出する。
     """
-    path = BASE / "data" / "processed" / "adj_muni_nodes.csv"
-    df = pd.read_csv(path, dtype={"muni_code": str})
-    codes = set(df["muni_code"])
-    return codes - EXCLUDE_CODES
+    return set(MuniIndex.from_nodes().codes)
+
+
+class MuniCrosswalk:
+    """Weighted historical -> current muni_code mapping (mergers, splits, renumbering).
+
+    Every old code distributes its counts over one or more current codes with
+    weights summing to 1: a merger or code change is a single edge of weight 1,
+    a split carries apportioning ratios (e.g. Hamamatsu's old 北区). Chains such
+    as A -> B -> C are resolved to the final code.
+    """
+
+    def __init__(self, old_codes, new_codes, weights, names: dict[str, str] | None = None) -> None:
+        edges = pd.DataFrame({
+            "old": normalize_muni_codes(old_codes),
+            "new": normalize_muni_codes(new_codes),
+            "weight": np.asarray(weights, dtype=np.float64),
+        })
+        # Resolve chains one step per pass; a cycle never terminates
+        for _ in range(len(edges) + 1):
+            chained = edges["new"].isin(edges["old"])
+            if not chained.any():
+                break
+            nxt = edges[chained].merge(edges, left_on="new", right_on="old", suffixes=("", "_next"))
+            edges = pd.concat([
+                edges[~chained],
+                pd.DataFrame({
+                    "old": nxt["old"],
+                    "new": nxt["new_next"],
+                    "weight": nxt["weight"] * nxt["weight_next"],
+                }),
+            ], ignore_index=True)
+        else:
+            raise ValueError("Cycle in muni crosswalk")
+        self.edges = edges.groupby(["old", "new"], as_index=False, sort=True)["weight"].sum()
+
+        totals = self.edges.groupby("old")["weight"].sum()
+        bad = totals[~np.isclose(totals, 1.0)]
+        if len(bad):
+            raise ValueError(f"Crosswalk weights do not sum to 1 for: {bad.to_dict()}")
+        self.names = dict(names or {})
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    def __repr__(self) -> str:
+        return f"MuniCrosswalk({self.edges['old'].nunique()} old codes -> {self.edges['new'].nunique()} current)"
+
+    @property
+    def old_codes(self) -> np.ndarray:
+        return self.edges["old"].unique()
+
+    @classmethod
+    def hamamatsu(cls, small_area: Path | None = SMALL_AREA_CROSSWALK) -> MuniCrosswalk:
+        """浜松旧7区 -> 新3区 (2024-01 再編) from HAMAMATSU_NEW_WARDS, reweighted from small_area."""
+        rows = [
+            (old, new_code, ratio)
+            for new_code, spec in HAMAMATSU_NEW_WARDS.items()
+            for old, ratio in [(c, 1.0) for c in spec["full"]] + list(spec["partial"].items())
+        ]
+        old, new, weight = zip(*rows)
+        names = {code: spec["name"] for code, spec in HAMAMATSU_NEW_WARDS.items()}
+        return cls(old, new, weight, names).reweighted(small_area)
+
+    @classmethod
+    def load(cls, path: Path = CROSSWALK_CSV, small_area: Path | None = SMALL_AREA_CROSSWALK) -> MuniCrosswalk:
+        """Hamamatsu edges plus muni_crosswalk.csv (old_code, new_code, weight, new_name, ...).
+
+        Weights are replaced by small-area population shares when small_area exists.
+        """
+        base = cls.hamamatsu(small_area=None)
+        if not path.exists():
+            return base.reweighted(small_area)
+        df = pd.read_csv(path, dtype={"old_code": str, "new_code": str}, comment="#")
+        names = dict(base.names)
+        if "new_name" in df.columns:
+            named = df.dropna(subset=["new_name"])
+            names.update(zip(normalize_muni_codes(named["new_code"]), named["new_name"]))
+        return cls(
+            np.concatenate([base.edges["old"], df["old_code"]]),
+            np.concatenate([base.edges["new"], df["new_code"]]),
+            np.concatenate([base.edges["weight"], df["weight"].fillna(1.0)]),
+            names,
+        ).reweighted(small_area)
+
+    def reweighted(self, path: Path | None) -> MuniCrosswalk:
+        """Copy with the weights of every old code listed in path (old_code, new_code, weight).
+
+        Only existing edges are reweighted: an old code whose listed edges do not
+        cover all of its current codes keeps the listed ones, renormalised.
+        Returns self when path is None or missing.
+        """
+        if path is None or not path.exists():
+            return self
+        df = pd.read_csv(path, dtype={"old_code": str, "new_code": str})
+        listed = pd.DataFrame({
+            "old": normalize_muni_codes(df["old_code"]),
+            "new": normalize_muni_codes(df["new_code"]),
+            "listed": df["weight"].to_numpy(dtype=np.float64),
+        })
+        edges = self.edges.merge(listed, on=["old", "new"], how="left")
+        has = edges.groupby("old")["listed"].transform("count") > 0
+        edges = edges[~has | edges["listed"].notna()]
+        weight = edges["weight"].where(~has[edges.index], edges["listed"])
+        weight = weight / weight.groupby(edges["old"]).transform("sum")
+        return type(self)(edges["old"], edges["new"], weight, self.names)
+
+    def matrix(self, codes, index: MuniIndex) -> tuple[sparse.csr_matrix, np.ndarray]:
+        """(len(index) x len(codes)) weights taking values keyed by codes to index positions.
+
+        Codes in the crosswalk are apportioned over their current codes, other
+        codes map to themselves. Returns the matrix and the codes that reach no
+        index position (their columns are empty).
+        """
+        from scipy import sparse
+
+        codes = normalize_muni_codes(codes)
+        col = np.arange(len(codes))
+        mapped = np.isin(codes, self.old_codes)
+
+        edges = self.edges.merge(
+            pd.DataFrame({"old": codes[mapped], "col": col[mapped]}), on="old"
+        )
+        rows = np.concatenate([index.encode(codes[~mapped]), index.encode(edges["new"])])
+        cols = np.concatenate([col[~mapped], edges["col"].to_numpy()])
+        vals = np.concatenate([np.ones((~mapped).sum()), edges["weight"].to_numpy()])
+        ok = rows >= 0
+        M = sparse.csr_matrix((vals[ok], (rows[ok], cols[ok])), shape=(len(index), len(codes)))
+
+        reached = np.zeros(len(codes), dtype=bool)
+        reached[cols[ok]] = True
+        return M, np.unique(codes[~reached])
+
+    def aggregate(self, df: pd.DataFrame, count_cols: list[str], code_col: str = "muni_code") -> pd.DataFrame:
+        """Replace rows with old codes by their apportioned counts under current codes.
+
+        Counts go to an existing row when the current code is already present,
+        otherwise to a new row appended at the end (named from the crosswalk
+        when df has a muni_name column). NaN counts are treated as 0.
+        """
+        codes = normalize_muni_codes(df[code_col])
+        old = np.isin(codes, self.old_codes)
+        if not old.any():
+            return df
+
+        from scipy import sparse
+
+        edges = self.edges.merge(pd.DataFrame({"old": codes[old], "row": np.flatnonzero(old)}), on="old")
+        targets, t = np.unique(edges["new"], return_inverse=True)
+        M = sparse.csr_matrix((edges["weight"], (t, edges["row"])), shape=(len(targets), len(df)))
+        sums = M @ df[count_cols].apply(pd.to_numeric, errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+
+        out = df[~old].copy()
+        present = pd.Index(codes[~old]).get_indexer(targets)
+        for i in np.flatnonzero(present >= 0):
+            out.iloc[present[i], [out.columns.get_loc(c) for c in count_cols]] += sums[i]
+        new = present < 0
+        if new.any():
+            added = pd.DataFrame(sums[new], columns=count_cols)
+            added.insert(0, code_col, targets[new])
+            if "muni_name" in df.columns:
+                added.insert(1, "muni_name", [self.names.get(c) for c in targets[new]])
+            out = pd.concat([out, added], ignore_index=True)
+        return out
@@ -9,22 +9,22 @@
   data/raw/census/r2_kokusei_2020/education_11_2_gakureki.xlsx
   data/raw/census/r2_kokusei_2020/shikuchoson_main_results.xlsx
   data/raw/gis/N03_2025/N03-20250101.shp（浜松新区の面積計算用）
-出力: data/processed/census_muni.csv（1,892行 × 24列）
+出力: data/processed/census_muni.csv（1,892行 × 24列、muni_index.npy の行順）
 """
 
 from __future__ import annotations
 
 from pathlib import Path
 
-import geopandas as gpd
 import numpy as np
 import pandas as pd
 
+from instrumentation import record_rows, stage
 from muni_code_canonical import (
-    HAMAMATSU_NEW_WARDS,
     HAMAMATSU_OLD_CODES,
     SEIREI_PARENT_CODES,
-    load_canonical_codes,
+    MuniCrosswalk,
+    MuniIndex,
 )
 
 BASE = Path(__file__).resolve().parent.parent.parent
@@ -181,97 +181,29 @@ def read_main_results_xlsx(path: Path) -> pd.DataFrame:
 def _aggregate_hamamatsu(df: pd.DataFrame, metric_prefixes: tuple[str, ...]) -> pd.DataFrame:
     """旧浜松7区を新3区に集約（raw metric columns ベース）。
 
-    count系カラム（metric_prefixes に合致）を合算。
-    partial 割当（旧北区）は按分比で加算する。
+    count系カラム（metric_prefixes に合致）を MuniCrosswalk.hamamatsu() で合算・按分し、
+    親コード（22130）を除く。
     """
-    old_rows = df[df["muni_code"].isin(HAMAMATSU_OLD_CODES)]
-    if old_rows.empty:
-        return df
-
     metric_cols = [c for c in df.columns if c.startswith(metric_prefixes)]
-    new_rows = []
-
-    for new_code, spec in HAMAMATSU_NEW_WARDS.items():
-        row = {"muni_code": new_code, "muni_name": spec["name"]}
-
-        # Sum full-assignment wards
-        full_mask = old_rows["muni_code"].isin(spec["full"])
-        sums = old_rows.loc[full_mask, metric_cols].sum()
-
-        # Add partial (按分) wards
-        for partial_code, ratio in spec["partial"].items():
-            partial_mask = old_rows["muni_code"] == partial_code
-            partial_vals = old_rows.loc[partial_mask, metric_cols]
-            if not partial_vals.empty:
-                sums = sums + partial_vals.iloc[0] * ratio
-
-        for col in metric_cols:
-            row[col] = sums[col]
-
-        new_rows.append(row)
-
-    # Remove old wards + parent code (22130)
-    drop_codes = HAMAMATSU_OLD_CODES | {"22130"}
-    df = df[~df["muni_code"].isin(drop_codes)].copy()
-    df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
-    return df
+    return _aggregate_hamamatsu_cols(df, metric_cols)
 
 
 def _aggregate_hamamatsu_edu(df: pd.DataFrame) -> pd.DataFrame:
     """浜松旧区→新区の集約（education data: raw counts）."""
-    old_rows = df[df["muni_code"].isin(HAMAMATSU_OLD_CODES)]
-    if old_rows.empty:
-        return df
-
     count_cols = ["pop15plus", "graduates", "univ", "grad_school", "unknown", "pop_30_44"]
-    count_cols = [c for c in count_cols if c in df.columns]
-    new_rows = []
-
-    for new_code, spec in HAMAMATSU_NEW_WARDS.items():
-        row = {"muni_code": new_code}
-        full_mask = old_rows["muni_code"].isin(spec["full"])
-        sums = old_rows.loc[full_mask, count_cols].sum()
-        for partial_code, ratio in spec["partial"].items():
-            partial_mask = old_rows["muni_code"] == partial_code
-            partial_vals = old_rows.loc[partial_mask, count_cols]
-            if not partial_vals.empty:
-                sums = sums + partial_vals.iloc[0] * ratio
-        for col in count_cols:
-            row[col] = sums[col]
-        new_rows.append(row)
-
-    drop_codes = HAMAMATSU_OLD_CODES | {"22130"}
-    df = df[~df["muni_code"].isin(drop_codes)].copy()
-    df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
-    return df
+    return _aggregate_hamamatsu_cols(df, [c for c in count_cols if c in df.columns])
 
 
 def _aggregate_hamamatsu_main(df: pd.DataFrame) -> pd.DataFrame:
     """浜松旧区→新区の集約（main results: raw HH counts）."""
-    old_rows = df[df["muni_code"].isin(HAMAMATSU_OLD_CODES)]
-    if old_rows.empty:
-        return df
-
-    count_cols = ["ippan_hh", "male_parent_hh", "female_parent_hh"]
-    new_rows = []
+    return _aggregate_hamamatsu_cols(df, ["ippan_hh", "male_parent_hh", "female_parent_hh"])
 
-    for new_code, spec in HAMAMATSU_NEW_WARDS.items():
-        row = {"muni_code": new_code}
-        full_mask = old_rows["muni_code"].isin(spec["full"])
-        sums = old_rows.loc[full_mask, count_cols].sum()
-        for partial_code, ratio in spec["partial"].items():
-            partial_mask = old_rows["muni_code"] == partial_code
-            partial_vals = old_rows.loc[partial_mask, count_cols]
-            if not partial_vals.empty:
-                sums = sums + partial_vals.iloc[0] * ratio
-        for col in count_cols:
-            row[col] = sums[col]
-        new_rows.append(row)
 
-    drop_codes = HAMAMATSU_OLD_CODES | {"22130"}
-    df = df[~df["muni_code"].isin(drop_codes)].copy()
-    df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
-    return df
+def _aggregate_hamamatsu_cols(df: pd.DataFrame, count_cols: list[str]) -> pd.DataFrame:
+    if not df["muni_code"].isin(HAMAMATSU_OLD_CODES).any():
+        return df
+    df = df[df["muni_code"] != "22130"]
+    return MuniCrosswalk.hamamatsu().aggregate(df, count_cols)
 
 
 def _compute_hamamatsu_pop_density(pop_series: pd.Series, muni_codes: pd.Series) -> pd.Series:
@@ -284,6 +216,8 @@ def _compute_hamamatsu_pop_density(pop_series: pd.Series, muni_codes: pd.Series)
     if not mask.any():
         return pd.Series(np.nan, index=muni_codes.index)
 
+    import geopandas as gpd
+
     gdf = gpd.read_file(GIS_SHP)
     gdf["muni_code"] = gdf["N03_007"]
     gdf_h = gdf[gdf["muni_code"].isin(hamamatsu_new)].copy()
@@ -301,11 +235,25 @@ def _compute_hamamatsu_pop_density(pop_series: pd.Series, muni_codes: pd.Series)
     return density
 
 
+def join_sugata(index: MuniIndex, tables: list[pd.DataFrame]) -> pd.DataFrame:
+    """Align sugata tables to the canonical index by position and join them column-wise.
+
+    The first table keeps muni_code / muni_name; the others contribute their
+    metric columns only.
+    """
+    return pd.concat(
+        [index.align(tables[0])]
+        + [index.align(t).drop(columns=["muni_code", "muni_name"]) for t in tables[1:]],
+        axis=1,
+    )
+
+
 def safe_div(num: pd.Series, den: pd.Series) -> pd.Series:
     den = den.replace(0, np.nan)
     return num / den
 
 
+@stage("process_census_muni")
 def main() -> None:
     # --- Read sugata xls files ---
     df_a = read_sugata_xls(FILES["a"])
@@ -321,11 +269,6 @@ def main() -> None:
     df_h = _aggregate_hamamatsu(df_h, ("H",))
     df_j = _aggregate_hamamatsu(df_j, ("J",))
 
-    df = df_a.merge(df_c.drop(columns=["muni_name"]), on="muni_code", how="left")
-    df = df.merge(df_f.drop(columns=["muni_name"]), on="muni_code", how="left")
-    df = df.merge(df_h.drop(columns=["muni_name"]), on="muni_code", how="left")
-    df = df.merge(df_j.drop(columns=["muni_name"]), on="muni_code", how="left")
-
     # --- Read kokusei 2020 xlsx files ---
     df_edu = read_education_xlsx(RAW_KOKUSEI / "education_11_2_gakureki.xlsx")
     df_edu = _aggregate_hamamatsu_edu(df_edu)
@@ -333,11 +276,33 @@ def main() -> None:
     df_main = read_main_results_xlsx(RAW_KOKUSEI / "shikuchoson_main_results.xlsx")
     df_main = _aggregate_hamamatsu_main(df_main)
 
+    # --- Canonical index: every table is aligned to it by position ---
+    try:
+        index = MuniIndex.load()
+        census_codes = set(df_a["muni_code"])
+        canonical = set(index.codes)
+        missing = canonical - census_codes
+        extra = census_codes - canonical
+        if missing:
+            print(f"WARNING: {len(missing)} codes in canonical but not in census: "
+                  f"{sorted(missing)[:10]}{'...' if len(missing) > 10 else ''}")
+        if extra:
+            print(f"WARNING: {len(extra)} codes in census but not in canonical: "
+                  f"{sorted(extra)[:10]}{'...' if len(extra) > 10 else ''}")
+        if not missing and not extra:
+            print(f"OK: census codes match canonical set ({len(canonical)} codes)")
+    except FileNotFoundError:
+        print("NOTE: adj_muni_nodes.csv not found, skipping canonical validation")
+        index = MuniIndex(sorted(c for c in df_a["muni_code"] if not c.startswith("00")))
+
+    df = join_sugata(index, [df_a, df_c, df_f, df_h, df_j])
+    edu = index.align(df_edu)
+    main_hh = index.align(df_main)
+
     out = pd.DataFrame()
     out["muni_code"] = df["muni_code"]
-    out["muni_name"] = df["muni_name"].astype(str).str.strip()
+    out["muni_name"] = df["muni_name"].fillna("").astype(str).str.strip()
     out["pref_code"] = out["muni_code"].str[:2]
-    out = out[out["pref_code"] != "00"].copy()
 
     # Core size columns
     out["pop_total"] = df["A1101"]
@@ -350,14 +315,10 @@ def main() -> None:
     out["pct_foreign"] = safe_div(df["A1700"], df["A1101"])
 
     # pct_college from education file (compute from raw counts after aggregation)
-    edu_merged = df_edu[["muni_code", "graduates", "univ", "grad_school", "unknown", "pop_30_44"]].copy()
-    edu_denom = edu_merged["graduates"] - edu_merged["unknown"].fillna(0)
+    edu_denom = edu["graduates"] - edu["unknown"].fillna(0)
     edu_denom = edu_denom.replace(0, np.nan)
-    edu_merged["pct_college"] = (edu_merged["univ"].fillna(0) + edu_merged["grad_school"].fillna(0)) / edu_denom
-
-    out = out.merge(edu_merged[["muni_code", "pct_college", "pop_30_44"]], on="muni_code", how="left")
-    out["pct_working_age_3044"] = safe_div(out["pop_30_44"], out["pop_total"])
-    out.drop(columns=["pop_30_44"], inplace=True)
+    out["pct_college"] = (edu["univ"].fillna(0) + edu["grad_school"].fillna(0)) / edu_denom
+    out["pct_working_age_3044"] = safe_div(edu["pop_30_44"], out["pop_total"])
 
     out["pct_primary_ind"] = safe_div(df["F2201"], df["F1102"])
     out["pct_tertiary_ind"] = safe_div(df["F2221"], df["F1102"])
@@ -383,17 +344,14 @@ def main() -> None:
     out["pct_nuclear_with_child"] = safe_div(df["A810102"], df["A710101"])
 
     # pct_single_parent from main results (compute from raw counts after aggregation)
-    main_merged = df_main[["muni_code", "ippan_hh", "male_parent_hh", "female_parent_hh"]].copy()
-    main_denom = main_merged["ippan_hh"].replace(0, np.nan)
-    main_merged["pct_single_parent"] = (
-        (main_merged["male_parent_hh"].fillna(0) + main_merged["female_parent_hh"].fillna(0)) / main_denom
+    main_denom = main_hh["ippan_hh"].replace(0, np.nan)
+    out["pct_single_parent"] = (
+        (main_hh["male_parent_hh"].fillna(0) + main_hh["female_parent_hh"].fillna(0)) / main_denom
     )
-    out = out.merge(main_merged[["muni_code", "pct_single_parent"]], on="muni_code", how="left")
 
     # pop_density: use main_results for most munis, GIS area for Hamamatsu new wards
     # (main_results has old wards which are now removed, so Hamamatsu needs GIS calc)
-    df_main_density = read_main_results_density()
-    out = out.merge(df_main_density[["muni_code", "pop_density"]], on="muni_code", how="left")
+    out["pop_density"] = index.align(read_main_results_density())["pop_density"]
 
     # Compute and override Hamamatsu new wards with GIS-computed density
     hamamatsu_density = _compute_hamamatsu_pop_density(out["pop_total"], out["muni_code"])
@@ -407,23 +365,6 @@ def main() -> None:
     # taxable_income_per_capita from C_keizai_kiban.xls
     out["taxable_income_per_capita"] = safe_div(df["C120110"], df["C120120"])
 
-    # --- Canonical codes validation ---
-    try:
-        canonical = load_canonical_codes()
-        census_codes = set(out["muni_code"])
-        missing = canonical - census_codes
-        extra = census_codes - canonical
-        if missing:
-            print(f"WARNING: {len(missing)} codes in canonical but not in census: "
-                  f"{sorted(missing)[:10]}{'...' if len(missing) > 10 else ''}")
-        if extra:
-            print(f"WARNING: {len(extra)} codes in census but not in canonical: "
-                  f"{sorted(extra)[:10]}{'...' if len(extra) > 10 else ''}")
-        if not missing and not extra:
-            print(f"OK: census codes match canonical set ({len(canonical)} codes)")
-    except FileNotFoundError:
-        print("NOTE: adj_muni_nodes.csv not found, skipping canonical validation")
-
     # Diagnostics: how many are populated per feature
     feature_cols = [c for c in out.columns if c.startswith("pct_") or c in (
         "female_labor_participation", "nursery_ratio", "avg_hh_size",
@@ -436,6 +377,7 @@ def main() -> None:
 
     print(f"Saved: {OUT}")
     print(f"Rows: {len(out)} municipalities")
+    record_rows(rows_in=len(df_a), rows_out=len(out))
     print(f"Columns: {len(out.columns)}")
     print("\nFeature non-null coverage:")
     for col, ratio in coverage.items():
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""国勢調査 小地域集計の市区町村・選挙区・任意地域への再集計
+
+令和2年国勢調査の小地域（町丁・字等）別 男女別人口・世帯数を、小地域ポリゴンの代表点が
+落ちる市区町村（現行コード）・小選挙区・任意の地域ポリゴンごとに合計する。
+集計は (地域 × 小地域) の疎行列積なので、按分比を置かない正確な合計になる。
+
+あわせて次の2つの重みを人口の正確な合計から作る:
+  - 旧コード → 現行コードの按分比（浜松旧北区の分割など）。MuniCrosswalk が
+    muni_crosswalk_small_area.csv を見つけると手入力の按分比より優先する
+  - 市区町村 × 選挙区の人口重み。build_hirei_district が面積按分＋RAS の代わりに使う
+
+入力: data/raw/census/r2_shoutiiki/boundary/*.shp（小地域境界、都道府県別）
+      data/raw/census/r2_shoutiiki/tblT001082*.txt（男女別人口総数及び世帯総数、都道府県別）
+      data/raw/gis/N03_2025/N03-20250101.shp（市区町村ポリゴン）
+      data/raw/gis/senkyoku2022/senkyoku2022.shp（選挙区ポリゴン）
+出力: data/processed/census_small_area_muni.csv（muni_index.npy の行順）
+      data/processed/census_small_area_district.csv
+      data/processed/muni_crosswalk_small_area.csv（old_code, new_code, weight, pop）
+      data/processed/muni_district_weights_small_area.csv（muni_code, kucode, weight, pop）
+      data/processed/census_small_area_<region>.csv（--region 指定時）
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from build_hirei_district import AREA_CRS, SLIVER, SMALL_AREA_WEIGHTS, load_polygons
+from instrumentation import record_rows, stage, step
+from muni_code_canonical import SMALL_AREA_CROSSWALK, MuniCrosswalk, MuniIndex
+from small_area import SmallAreaMembership, read_boundaries
+
+BASE = Path(__file__).resolve().parent.parent.parent
+RAW = BASE / "data" / "raw" / "census" / "r2_shoutiiki"
+PROCESSED = BASE / "data" / "processed"
+OUT_MUNI = PROCESSED / "census_small_area_muni.csv"
+OUT_DISTRICT = PROCESSED / "census_small_area_district.csv"
+OUT_WEIGHTS = SMALL_AREA_WEIGHTS
+
+# tblT001082 の項目コード → 出力カラム
+COLUMNS = {
+    "T001082001": "pop_total",
+    "T001082002": "pop_male",
+    "T001082003": "pop_female",
+    "T001082004": "n_households",
+}
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Aggregate small-area census counts to municipalities and districts.")
+    p.add_argument(
+        "--region",
+        type=Path,
+        help="Extra target polygons (any format geopandas reads) to aggregate to",
+    )
+    p.add_argument(
+        "--region-col",
+        default="region",
+        help="Region id column in --region (default: region)",
+    )
+    p.add_argument(
+        "--overlay",
+        action="store_true",
+        help="Split small areas by overlap area instead of assigning by representative point",
+    )
+    p.add_argument(
+        "--chunksize",
+        type=int,
+        default=100_000,
+        help="Rows per chunk when reading small-area tables (default: 100000)",
+    )
+    return p.parse_args()
+
+
+def assign(areas: gpd.GeoDataFrame, targets: gpd.GeoDataFrame, col: str, overlay: bool) -> SmallAreaMembership:
+    if overlay:
+        return SmallAreaMembership.from_overlay(areas, targets, col, min_share=SLIVER)
+    return SmallAreaMembership.from_points(areas, targets, col)
+
+
+def read_population(membership: SmallAreaMembership, chunksize: int) -> np.ndarray:
+    """(areas × len(COLUMNS)) counts in membership key order, summed over prefecture files."""
+    paths = sorted(RAW.glob("tblT001082*.txt")) + sorted(RAW.glob("tblT001082*.csv"))
+    if not paths:
+        raise FileNotFoundError(f"No tblT001082 tables in {RAW}")
+    values = np.zeros((len(membership.keys), len(COLUMNS)))
+    for path in paths:
+        values += membership.read_values(path, list(COLUMNS), chunksize=chunksize)
+    return values
+
+
+def count_frame(membership: SmallAreaMembership, values: np.ndarray, id_col: str) -> pd.DataFrame:
+    out = pd.DataFrame(membership.aggregate(values), columns=list(COLUMNS.values()))
+    out.insert(0, id_col, membership.targets)
+    return out
+
+
+def crosswalk_shares(
+    old: SmallAreaMembership, new: SmallAreaMembership, pop: np.ndarray, crosswalk: MuniCrosswalk
+) -> pd.DataFrame:
+    """Population shares for the crosswalk's edges (old_code, new_code, weight, pop).
+
+    The edges themselves come from the crosswalk; small areas only supply the
+    weights, so boundary mismatches cannot add edges to unrelated codes.
+    """
+    shares = old.shares(new, pop).rename(columns={"source": "old_code", "target": "new_code", "total": "pop"})
+    edges = crosswalk.edges.rename(columns={"old": "old_code", "new": "new_code"})[["old_code", "new_code"]]
+    out = shares.merge(edges, on=["old_code", "new_code"])
+    out["weight"] = out["pop"] / out.groupby("old_code")["pop"].transform("sum")
+    return out[["old_code", "new_code", "weight", "pop"]]
+
+
+@stage("process_census_small_area")
+def main() -> None:
+    args = parse_args()
+    index = MuniIndex.load()
+
+    with step("boundaries"):
+        areas = read_boundaries(sorted((RAW / "boundary").glob("*.shp"))).to_crs(AREA_CRS)
+        munis, districts = load_polygons()
+        record_rows(rows_in=len(areas))
+
+    with step("membership"):
+        by_muni = assign(areas, munis, "muni_code", args.overlay)
+        by_district = assign(areas, districts, "kucode", args.overlay)
+        keys = by_muni.keys
+        by_code = SmallAreaMembership.from_codes(keys, keys.str[:5])
+        print(by_muni)
+        print(by_district)
+
+    with step("read"):
+        values = read_population(by_muni, args.chunksize)
+        pop = values[:, 0]
+        record_rows(rows_out=len(keys))
+    print(f"Small areas: {len(keys):,}, population {pop.sum():,.0f}")
+
+    muni = count_frame(by_muni, values, "muni_code")
+    muni = muni.set_index("muni_code").reindex(index.codes).reset_index(names="muni_code")
+    muni.to_csv(OUT_MUNI, index=False, encoding="utf-8")
+    print(f"Saved: {OUT_MUNI}")
+    missing = int(muni["pop_total"].isna().sum())
+    if missing:
+        print(f"Warning: {missing} municipalities contain no small area")
+
+    district = count_frame(by_district, values, "kucode")
+    district.to_csv(OUT_DISTRICT, index=False, encoding="utf-8")
+    print(f"Saved: {OUT_DISTRICT}")
+
+    # 旧コード（小地域 KEY_CODE の先頭5桁）→ 現行コード
+    crosswalk = MuniCrosswalk.load(small_area=None)
+    cw = crosswalk_shares(by_code, by_muni, pop, crosswalk)
+    cw.to_csv(SMALL_AREA_CROSSWALK, index=False, encoding="utf-8")
+    print(f"Saved: {SMALL_AREA_CROSSWALK}")
+    for old_code, g in cw[cw["weight"] < 1].groupby("old_code"):
+        print(f"  {old_code}: " + ", ".join(f"{n} {w:.3f}" for n, w in zip(g["new_code"], g["weight"])))
+
+    # 市区町村 × 選挙区（市区町村は現行コードへ点内判定済み）
+    weights = by_muni.shares(by_district, pop).rename(
+        columns={"source": "muni_code", "target": "kucode", "total": "pop"}
+    )
+    weights = weights[np.isin(weights["muni_code"], index.codes)]
+    weights.to_csv(OUT_WEIGHTS, index=False, encoding="utf-8")
+    print(f"Saved: {OUT_WEIGHTS}")
+    n_split = int((weights.groupby("muni_code").size() > 1).sum())
+    print(f"Weights: {len(weights)} muni-district pairs, {n_split} split municipalities")
+
+    if args.region:
+        regions = gpd.read_file(args.region)
+        by_region = assign(areas, regions, args.region_col, args.overlay)
+        out = count_frame(by_region, values, args.region_col)
+        path = PROCESSED / f"census_small_area_{args.region.stem}.csv"
+        out.to_csv(path, index=False, encoding="utf-8")
+        print(f"Saved: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,231 @@
-#!/usr/bin/env python3
-"""都道府県別有権者数・投票率の整形
-
-入力: data/raw/election/yukensha/todofuken_yukensha_touhyoritsu.xlsx
-出力: data/raw/election/yukensha/r8_todofuken_yukensha.csv
-"""
-
-import pandas as pd
-import openpyxl
-from pathlib import Path
-
-BASE = Path(__file__).resolve().parent.parent.parent
-RAW_ELECTION = BASE / "data" / "raw" / "election" / "yukensha"
-INPUT_FILE = RAW_ELECTION / "todofuken_yukensha_touhyoritsu.xlsx"
-OUTPUT_FILE = RAW_ELECTION / "r8_todofuken_yukensha.csv"
-
-def process_todofuken_yukensha():
-    """Process prefecture-level voter turnout data"""
-
-    if not INPUT_FILE.exists():
-        print(f"❌ Input file not found: {INPUT_FILE}")
-        print("   Run: bash scripts/download_all.sh")
-        return
-
-    print(f"Processing: {INPUT_FILE.name}")
-
-    wb = openpyxl.load_workbook(INPUT_FILE)
-    ws = wb['投票結果']
-
-    # Extract data
-    data = []
-    current_block = None
-
-    for r in range(6, 63):  # Rows 6-62
-        block = ws.cell(r, 1).value
-        pref = ws.cell(r, 2).value
-
-        if block:
-            current_block = block
-
-        # Skip subtotal rows
-        if not pref or pref in ['計', '合計']:
-            continue
-
-        yukensha_total = ws.cell(r, 5).value
-        touhyousha_total = ws.cell(r, 8).value
-
-        if yukensha_total and touhyousha_total:
-            data.append({
-                'block_name': current_block,
-                'pref_name': pref,
-                'yukensha_male': int(ws.cell(r, 3).value or 0),
-                'yukensha_female': int(ws.cell(r, 4).value or 0),
-                'yukensha_total': int(yukensha_total),
-                'touhyousha_male': int(ws.cell(r, 6).value or 0),
-                'touhyousha_female': int(ws.cell(r, 7).value or 0),
-                'touhyousha_total': int(touhyousha_total),
-                'kikensha_male': int(ws.cell(r, 9).value or 0),
-                'kikensha_female': int(ws.cell(r, 10).value or 0),
-                'kikensha_total': int(ws.cell(r, 11).value or 0),
-            })
-
-    df = pd.DataFrame(data)
-    df['touhyou_rate'] = df['touhyousha_total'] / df['yukensha_total'] * 100
-
-    # Add pref_code
-    pref_codes = {
-        '北海道': '01', '青森県': '02', '岩手県': '03', '宮城県': '04', '秋田県': '05',
-        '山形県': '06', '福島県': '07', '茨城県': '08', '栃木県': '09', '群馬県': '10',
-        '埼玉県': '11', '千葉県': '12', '東京都': '13', '神奈川県': '14', '新潟県': '15',
-        '富山県': '16', '石川県': '17', '福井県': '18', '山梨県': '19', '長野県': '20',
-        '岐阜県': '21', '静岡県': '22', '愛知県': '23', '三重県': '24', '滋賀県': '25',
-        '京都府': '26', '大阪府': '27', '兵庫県': '28', '奈良県': '29', '和歌山県': '30',
-        '鳥取県': '31', '島根県': '32', '岡山県': '33', '広島県': '34', '山口県': '35',
-        '徳島県': '36', '香川県': '37', '愛媛県': '38', '高知県': '39', '福岡県': '40',
-        '佐賀県': '41', '長崎県': '42', '熊本県': '43', '大分県': '44', '宮崎県': '45',
-        '鹿児島県': '46', '沖縄県': '47'
-    }
-    df.insert(0, 'pref_code', df['pref_name'].map(pref_codes))
-
-    # Reorder columns
-    df = df[['pref_code', 'pref_name', 'block_name',
-             'yukensha_male', 'yukensha_female', 'yukensha_total',
-             'touhyousha_male', 'touhyousha_female', 'touhyousha_total',
-             'kikensha_male', 'kikensha_female', 'kikensha_total',
-             'touhyou_rate']]
-
-    # Save
-    df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8')
-
-    print(f"✓ Saved: {OUTPUT_FILE}")
-    print(f"  {len(df)} prefectures")
-    print(f"  有権者数合計: {df['yukensha_total'].sum():,} 人")
-    print(f"  投票者数合計: {df['touhyousha_total'].sum():,} 人")
-    print(f"  全国投票率: {df['touhyou_rate'].mean():.2f}%")
-
-if __name__ == '__main__':
-    process_todofuken_yukensha()
+#!/usr/bin/env python3
+"""有権者数・投票率の整形（都道府県別・市区町村別）
+
+都道府県別シートに加え、市区町村別の有権者数・投票者数表（総務省「市区町村別有権者数、
+投票者数、投票率（比例代表）」、都道府県ごとのシートまたは1シート）があれば読み込み、
+市区町村名を hirei_shikuchouson.csv 経由で基準コードに対応付ける。都道府県・ブロックの
+集計は市区町村の人数を足し上げて求め、投票率は合計人数から計算し直す（率の平均はとらない）。
+Excel はいずれも read_only / values_only の一括読み込みで処理する。
+
+入力: data/raw/election/yukensha/todofuken_yukensha_touhyoritsu.xlsx
+      data/raw/election/yukensha/shikuchouson_yukensha_touhyoritsu.xlsx（任意）
+      data/processed/hirei_shikuchouson.csv（市区町村名 → コード）
+      data/master/district_master.csv（都道府県 → ブロック）
+出力: data/raw/election/yukensha/r8_todofuken_yukensha.csv
+      data/processed/turnout_muni.csv（基準インデックス順）
+      data/processed/turnout_pref.csv, turnout_block.csv（市区町村の合計）
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from hirei_to_json import read_hirei
+from instrumentation import record_rows, stage, step
+from muni_code_canonical import MuniIndex
+
+BASE = Path(__file__).resolve().parent.parent.parent
+RAW_ELECTION = BASE / "data" / "raw" / "election" / "yukensha"
+INPUT_FILE = RAW_ELECTION / "todofuken_yukensha_touhyoritsu.xlsx"
+OUTPUT_FILE = RAW_ELECTION / "r8_todofuken_yukensha.csv"
+INPUT_MUNI = RAW_ELECTION / "shikuchouson_yukensha_touhyoritsu.xlsx"
+PROCESSED = BASE / "data" / "processed"
+MASTER = BASE / "data" / "master" / "district_master.csv"
+
+PREF_CODES = {
+    '北海道': '01', '青森県': '02', '岩手県': '03', '宮城県': '04', '秋田県': '05',
+    '山形県': '06', '福島県': '07', '茨城県': '08', '栃木県': '09', '群馬県': '10',
+    '埼玉県': '11', '千葉県': '12', '東京都': '13', '神奈川県': '14', '新潟県': '15',
+    '富山県': '16', '石川県': '17', '福井県': '18', '山梨県': '19', '長野県': '20',
+    '岐阜県': '21', '静岡県': '22', '愛知県': '23', '三重県': '24', '滋賀県': '25',
+    '京都府': '26', '大阪府': '27', '兵庫県': '28', '奈良県': '29', '和歌山県': '30',
+    '鳥取県': '31', '島根県': '32', '岡山県': '33', '広島県': '34', '山口県': '35',
+    '徳島県': '36', '香川県': '37', '愛媛県': '38', '高知県': '39', '福岡県': '40',
+    '佐賀県': '41', '長崎県': '42', '熊本県': '43', '大分県': '44', '宮崎県': '45',
+    '鹿児島県': '46', '沖縄県': '47'
+}
+
+# 投票結果シートの列（1始まり）。列1・2が見出し（ブロック/都道府県名、都道府県/市区町村名）
+COUNT_COLS = {
+    'yukensha_male': 3, 'yukensha_female': 4, 'yukensha_total': 5,
+    'touhyousha_male': 6, 'touhyousha_female': 7, 'touhyousha_total': 8,
+    'kikensha_male': 9, 'kikensha_female': 10, 'kikensha_total': 11,
+}
+FIRST_ROW = 6
+SUBTOTAL_LABELS = {'計', '合計', '総計', '市計', '町村計', '区計'}
+
+
+def read_sheet_rows(path: Path, sheet: str | None = None, min_row: int = FIRST_ROW,
+                    max_row: int | None = None) -> dict[str, list[tuple]]:
+    """{sheet name: row value tuples} in one read-only pass (all sheets if sheet is None)."""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = [wb[sheet]] if sheet else wb.worksheets
+        return {
+            ws.title: list(ws.iter_rows(min_row=min_row, max_row=max_row,
+                                        max_col=max(COUNT_COLS.values()), values_only=True))
+            for ws in sheets
+        }
+    finally:
+        wb.close()
+
+
+def count_frame(rows: list[tuple], label_cols: list[str]) -> pd.DataFrame:
+    """Label columns (forward-filled first column, stripped names) plus integer counts."""
+    width = max(COUNT_COLS.values())
+    df = pd.DataFrame([tuple(r) + (None,) * (width - len(r)) for r in rows],
+                      columns=range(1, width + 1), dtype=object)
+    out = pd.DataFrame({
+        label_cols[0]: df[1].ffill(),
+        label_cols[1]: df[2],
+    })
+    for label in label_cols:
+        out[label] = out[label].map(lambda v: re.sub(r'\s', '', str(v)) if pd.notna(v) else None)
+    for col, i in COUNT_COLS.items():
+        values = df[i].map(lambda v: str(v).replace(',', '') if v is not None else None)
+        out[col] = pd.to_numeric(values, errors='coerce')
+    return out
+
+
+def with_rate(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast counts to int and (re)compute touhyou_rate (%) from the totals."""
+    df[list(COUNT_COLS)] = df[list(COUNT_COLS)].fillna(0).astype('int64')
+    df['touhyou_rate'] = df['touhyousha_total'] / df['yukensha_total'] * 100
+    return df
+
+
+def process_todofuken_yukensha():
+    """Process prefecture-level voter turnout data"""
+
+    if not INPUT_FILE.exists():
+        print(f"❌ Input file not found: {INPUT_FILE}")
+        print("   Run: bash scripts/download/download_all.sh")
+        return
+
+    print(f"Processing: {INPUT_FILE.name}")
+
+    rows = read_sheet_rows(INPUT_FILE, '投票結果', max_row=62)['投票結果']
+    df = count_frame(rows, ['block_name', 'pref_name'])
+
+    # Skip subtotal rows and rows without totals
+    df = df[df['pref_name'].notna() & ~df['pref_name'].isin(SUBTOTAL_LABELS)]
+    df = df[(df['yukensha_total'].fillna(0) > 0) & (df['touhyousha_total'].fillna(0) > 0)]
+    df = with_rate(df.reset_index(drop=True))
+    df.insert(0, 'pref_code', df['pref_name'].map(PREF_CODES))
+
+    # Reorder columns
+    df = df[['pref_code', 'pref_name', 'block_name', *COUNT_COLS, 'touhyou_rate']]
+
+    # Save
+    df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8')
+
+    print(f"✓ Saved: {OUTPUT_FILE}")
+    record_rows(rows_out=len(df))
+    print(f"  {len(df)} prefectures")
+    print(f"  有権者数合計: {df['yukensha_total'].sum():,} 人")
+    print(f"  投票者数合計: {df['touhyousha_total'].sum():,} 人")
+    print(f"  全国投票率: {df['touhyousha_total'].sum() / df['yukensha_total'].sum() * 100:.2f}%")
+    return df
+
+
+def muni_name_codes() -> pd.DataFrame:
+    """(pref_code, muni_name) -> muni_code lookup from the hirei results."""
+    df = read_hirei(columns=['pref_code', 'muni_code', 'muni_name']).drop_duplicates()
+    df['muni_name'] = df['muni_name'].str.replace(r'\s', '', regex=True)
+    return df.drop_duplicates(['pref_code', 'muni_name'])
+
+
+def read_shikuchouson_yukensha(path: Path = INPUT_MUNI) -> pd.DataFrame:
+    """Municipal rows from every sheet, with pref_code from the sheet or its first column."""
+    frames = []
+    for title, rows in read_sheet_rows(path).items():
+        df = count_frame(rows, ['pref_name', 'muni_name'])
+        sheet_pref = re.sub(r'\s', '', title)
+        if sheet_pref in PREF_CODES:
+            df['pref_name'] = sheet_pref
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    df = df[df['muni_name'].notna() & ~df['muni_name'].isin(SUBTOTAL_LABELS | set(PREF_CODES))]
+    df = df[~df['muni_name'].str.endswith('計')]
+    df = df[df['yukensha_total'].fillna(0) > 0]
+    df['pref_code'] = df['pref_name'].map(PREF_CODES)
+    return df.reset_index(drop=True)
+
+
+def join_muni_codes(df: pd.DataFrame, lookup: pd.DataFrame) -> pd.DataFrame:
+    """Attach muni_code by (pref_code, muni_name); designated-city totals are dropped."""
+    df = df.merge(lookup, on=['pref_code', 'muni_name'], how='left')
+    missing = df[df['muni_code'].isna()]
+    if len(missing):
+        # 政令市の市計行（札幌市 など）は区の行と重複するので落とす
+        wards = lookup['pref_code'] + lookup['muni_name']
+        is_city_total = [wards.str.startswith(p + n).any() for p, n in zip(missing['pref_code'].fillna(''), missing['muni_name'])]
+        unmatched = missing[~np.array(is_city_total, dtype=bool)]
+        if len(unmatched):
+            names = (unmatched['pref_name'].fillna('') + unmatched['muni_name']).tolist()
+            print(f"  ⚠ {len(unmatched)} municipal rows not matched to a code: {names[:10]}")
+    return df[df['muni_code'].notna()].reset_index(drop=True)
+
+
+def sum_turnout(df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    """Exact count totals per group with the rate recomputed from the sums."""
+    out = df.groupby(keys, as_index=False, sort=True)[list(COUNT_COLS)].sum()
+    return with_rate(out)
+
+
+def process_shikuchouson_yukensha(pref_sheet: pd.DataFrame | None = None):
+    """Process municipality-level turnout and derive prefecture / block totals"""
+
+    if not INPUT_MUNI.exists():
+        print(f"Skipping municipal turnout (not found: {INPUT_MUNI})")
+        return
+
+    print(f"Processing: {INPUT_MUNI.name}")
+    with step("read municipal sheets"):
+        raw = read_shikuchouson_yukensha(INPUT_MUNI)
+        record_rows(rows_in=len(raw))
+    lookup = muni_name_codes()
+    df = sum_turnout(join_muni_codes(raw, lookup), ['muni_code'])
+
+    index = MuniIndex.load()
+    df = index.align(df)
+    lookup = lookup.drop_duplicates('muni_code').set_index('muni_code')
+    df.insert(1, 'pref_code', index.pref_codes)
+    df.insert(2, 'muni_name', lookup['muni_name'].reindex(df['muni_code']).to_numpy())
+    matched = df['yukensha_total'].notna()
+    print(f"  Matched {matched.sum()} / {len(index)} canonical municipalities")
+    out = PROCESSED / 'turnout_muni.csv'
+    df.to_csv(out, index=False, encoding='utf-8')
+    print(f"✓ Saved: {out}")
+    record_rows(rows_out=int(matched.sum()))
+
+    master = pd.read_csv(MASTER, dtype={'pref_code': str, 'block_id': str})
+    pref_block = master[['pref_code', 'pref_name', 'block_id', 'block_name']].drop_duplicates('pref_code')
+    rows = df[matched].merge(pref_block, on='pref_code', how='left')
+    pref = sum_turnout(rows, ['pref_code', 'pref_name', 'block_id', 'block_name'])
+    block = sum_turnout(rows, ['block_id', 'block_name'])
+    block = block.sort_values('block_id', key=lambda s: s.astype(int)).reset_index(drop=True)
+    for name, table in (('turnout_pref.csv', pref), ('turnout_block.csv', block)):
+        table.to_csv(PROCESSED / name, index=False, encoding='utf-8')
+        print(f"✓ Saved: {PROCESSED / name}")
+
+    # Cross-check the summed totals against the prefecture sheet
+    if pref_sheet is not None:
+        check = pref.merge(pref_sheet, on='pref_code', suffixes=('', '_sheet'))
+        diff = check[check['yukensha_total'] != check['yukensha_total_sheet']]
+        if len(diff):
+            print(f"  ⚠ 有権者数 differs from the prefecture sheet in {len(diff)} prefectures: "
+                  f"{diff['pref_code'].tolist()}")
+        else:
+            print("  有権者数 totals match the prefecture sheet")
+    print(f"  全国投票率: {pref['touhyousha_total'].sum() / pref['yukensha_total'].sum() * 100:.2f}%")
+
+
+if __name__ == '__main__':
+    with stage("process_election_data"):
+        pref_sheet = process_todofuken_yukensha()
+        process_shikuchouson_yukensha(pref_sheet)
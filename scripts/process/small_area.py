@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""国勢調査 小地域（町丁・字等）集計の読み込みと任意の地域への再集計
+
+小地域の表（KEY_CODE × 集計項目、全国で約22万行）をチャンク単位で読み、
+(対象地域 × 小地域) の疎行列との積で市区町村・新区・選挙区・任意のポリゴン地域へ集計する。
+対象地域への所属は小地域ポリゴンの代表点の点内判定、または STRtree による面積按分で決める。
+
+小地域は市区町村の境界をまたがないため、旧区コードで集計された表でも
+代表点を新区ポリゴンに落とせば再編後の区別に正確な合計が得られる
+（MuniCrosswalk の按分比の置き換えに使う）。
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from scipy import sparse
+
+# e-Stat 小地域集計 CSV: 1行目が項目コード、2行目が項目名、秘匿・該当なしは "X" / "-"
+ESTAT_ENCODING = "cp932"
+ESTAT_SKIPROWS = [1]
+KEY_COL = "KEY_CODE"
+
+
+def read_boundaries(paths, key_col: str = KEY_COL) -> gpd.GeoDataFrame:
+    """Small-area polygons (key_col, geometry) from one or more e-Stat boundary shapefiles.
+
+    Prefecture files are concatenated and reprojected to the first file's CRS.
+    Keys stay strings; an area split into several features keeps all of them.
+    """
+    frames = []
+    for path in paths:
+        gdf = gpd.read_file(path, columns=[key_col])
+        if frames:
+            gdf = gdf.to_crs(frames[0].crs)
+        gdf[key_col] = gdf[key_col].astype(str)
+        frames.append(gdf[[key_col, "geometry"]])
+    if not frames:
+        raise FileNotFoundError("No small-area boundary files")
+    return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=frames[0].crs)
+
+
+class SmallAreaMembership:
+    """Sparse (targets × small areas) membership for aggregating small-area counts.
+
+    Column j holds the shares of small area keys[j] falling into each target
+    (a single 1 for point assignment, area shares for overlay); areas outside
+    every target have an empty column and drop out of the sums. Targets are the
+    sorted distinct ids, so features sharing an id form one target.
+    """
+
+    def __init__(self, keys, targets, matrix: sparse.spmatrix) -> None:
+        self.keys = pd.Index(np.asarray(keys, dtype=str))
+        self.targets = np.asarray(targets)
+        if not self.keys.is_unique:
+            raise ValueError("Small-area keys must be unique")
+        if matrix.shape != (len(self.targets), len(self.keys)):
+            raise ValueError(f"Membership shape {matrix.shape} != ({len(self.targets)}, {len(self.keys)})")
+        self.matrix = sparse.csc_matrix(matrix, dtype=np.float64)
+
+    def __repr__(self) -> str:
+        assigned = int((np.diff(self.matrix.indptr) > 0).sum())
+        return f"SmallAreaMembership({assigned}/{len(self.keys)} areas -> {len(self.targets)} targets)"
+
+    @classmethod
+    def _from_pairs(cls, keys, area_pos, targets, target_pos, weights) -> SmallAreaMembership:
+        M = sparse.csc_matrix(
+            (weights, (target_pos, area_pos)), shape=(len(targets), len(keys))
+        )
+        M.sum_duplicates()
+        return cls(keys, targets, M)
+
+    @classmethod
+    def from_points(
+        cls, areas: gpd.GeoDataFrame, targets: gpd.GeoDataFrame, target_col: str, key_col: str = KEY_COL
+    ) -> SmallAreaMembership:
+        """Assign every small area to the target containing its representative point.
+
+        A multi-feature area is represented by its largest feature. Points on a
+        shared edge go to the lowest target row. Keys are sorted, as in
+        from_overlay, so memberships over the same areas line up.
+        """
+        targets = targets.to_crs(areas.crs)
+        area = shapely.area(areas.geometry.values)
+        largest = (
+            areas.assign(_area=area)
+            .sort_values("_area", ascending=False)
+            .drop_duplicates(key_col)
+            .sort_values(key_col)
+        )
+        keys = largest[key_col].to_numpy()
+        points = shapely.point_on_surface(largest.geometry.values)
+        tree = shapely.STRtree(targets.geometry.values)
+        # "within" would drop points on a shared edge; keep the lowest target row
+        pi, ti = tree.query(points, predicate="intersects")
+        order = np.lexsort((ti, pi))
+        pi, ti = pi[order], ti[order]
+        first = np.unique(pi, return_index=True)[1]
+        pi, ti = pi[first], ti[first]
+        labels, inverse = np.unique(targets[target_col].to_numpy(), return_inverse=True)
+        return cls._from_pairs(keys, pi, labels, inverse[ti], np.ones(len(pi)))
+
+    @classmethod
+    def from_overlay(
+        cls,
+        areas: gpd.GeoDataFrame,
+        targets: gpd.GeoDataFrame,
+        target_col: str,
+        key_col: str = KEY_COL,
+        min_share: float = 0.0,
+    ) -> SmallAreaMembership:
+        """Split every small area over the targets it overlaps, by share of its area.
+
+        Use an equal-area CRS. Overlaps below min_share of the area are dropped
+        as boundary noise between the two polygon sources; shares are then
+        normalised over the covered part so no counts are lost.
+        """
+        targets = targets.to_crs(areas.crs)
+        keys, area_pos = np.unique(areas[key_col].to_numpy(), return_inverse=True)
+        geoms = areas.geometry.values
+        tree = shapely.STRtree(targets.geometry.values)
+        ai, ti = tree.query(geoms, predicate="intersects")
+        overlap = shapely.area(shapely.intersection(geoms[ai], targets.geometry.values[ti]))
+        labels, inverse = np.unique(targets[target_col].to_numpy(), return_inverse=True)
+        M = sparse.csc_matrix(
+            (overlap, (inverse[ti], area_pos[ai])), shape=(len(labels), len(keys))
+        )
+        M.sum_duplicates()
+        M = M @ sparse.diags(1 / np.maximum(np.bincount(area_pos, weights=shapely.area(geoms)), 1e-300))
+        M.data[M.data < min_share] = 0.0
+        covered = np.asarray(M.sum(axis=0)).ravel()
+        M = M @ sparse.diags(np.where(covered > 0, 1 / np.maximum(covered, 1e-300), 0.0))
+        M.eliminate_zeros()
+        return cls(keys, labels, M)
+
+    @classmethod
+    def from_codes(cls, keys, target_of_key) -> SmallAreaMembership:
+        """Assign areas by a code derived from the key (e.g. key[:5] -> muni_code); NaN drops."""
+        keys = np.asarray(keys, dtype=str)
+        codes = pd.Series(target_of_key, dtype=object)
+        ok = codes.notna().to_numpy()
+        targets, ti = np.unique(codes[ok].astype(str), return_inverse=True)
+        return cls._from_pairs(keys, np.flatnonzero(ok), targets, ti, np.ones(ok.sum()))
+
+    def positions(self, keys) -> np.ndarray:
+        """Column positions of keys (-1 when not a small area of this membership)."""
+        return self.keys.get_indexer(np.asarray(keys, dtype=str))
+
+    def aggregate(self, values: np.ndarray) -> np.ndarray:
+        """(targets × k) sums of (areas × k) values in key order; NaN counts as 0."""
+        return self.matrix @ np.nan_to_num(np.asarray(values, dtype=np.float64))
+
+    def aggregate_table(
+        self,
+        path: Path,
+        columns: list[str],
+        chunksize: int = 100_000,
+        encoding: str = ESTAT_ENCODING,
+        skiprows=ESTAT_SKIPROWS,
+    ) -> pd.DataFrame:
+        """Stream a small-area CSV and sum columns into targets (one row per target).
+
+        Only KEY_CODE and the requested columns are parsed, one chunk at a time.
+        Rows whose key is not a small area here (prefecture / municipality /
+        大字 subtotals, areas without a polygon) are skipped, so subtotals are
+        never double counted. Suppressed cells ("X", "-") count as 0.
+        """
+        sums = np.zeros((len(self.targets), len(columns)))
+        for chunk in pd.read_csv(
+            path, usecols=[KEY_COL, *columns], dtype=str, chunksize=chunksize,
+            encoding=encoding, skiprows=skiprows,
+        ):
+            pos = self.positions(chunk[KEY_COL])
+            hit = pos >= 0
+            if not hit.any():
+                continue
+            values = chunk.loc[hit, columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+            sums += self.matrix[:, pos[hit]] @ np.nan_to_num(values)
+        return pd.DataFrame(sums, columns=columns, index=pd.Index(self.targets, name="target"))
+
+    def read_values(
+        self,
+        path: Path,
+        columns: list[str],
+        chunksize: int = 100_000,
+        encoding: str = ESTAT_ENCODING,
+        skiprows=ESTAT_SKIPROWS,
+    ) -> np.ndarray:
+        """(areas × k) values in key order, streamed like aggregate_table; missing areas are 0."""
+        values = np.zeros((len(self.keys), len(columns)))
+        for chunk in pd.read_csv(
+            path, usecols=[KEY_COL, *columns], dtype=str, chunksize=chunksize,
+            encoding=encoding, skiprows=skiprows,
+        ):
+            pos = self.positions(chunk[KEY_COL])
+            hit = pos >= 0
+            values[pos[hit]] = np.nan_to_num(
+                chunk.loc[hit, columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+            )
+        return values
+
+    def crosstab(self, other: SmallAreaMembership, weights: np.ndarray) -> sparse.csr_matrix:
+        """(self targets × other targets) sums of per-area weights (e.g. population).
+
+        Both memberships must share the same keys; an area counted in both
+        contributes weight × share_self × share_other.
+        """
+        if not self.keys.equals(other.keys):
+            raise ValueError("Memberships are over different small areas")
+        w = sparse.diags(np.nan_to_num(np.asarray(weights, dtype=np.float64)))
+        return (self.matrix @ w @ other.matrix.T).tocsr()
+
+    def shares(self, other: SmallAreaMembership, weights: np.ndarray) -> pd.DataFrame:
+        """Long table (source, target, weight, total) of self -> other weight shares.
+
+        weight is the fraction of each self target's total falling in the
+        other target; rows per source sum to 1. Sources with no weight drop.
+        """
+        X = self.crosstab(other, weights).tocoo()
+        totals = np.bincount(X.row, weights=X.data, minlength=len(self.targets))
+        keep = X.data > 0
+        rows, cols, data = X.row[keep], X.col[keep], X.data[keep]
+        return pd.DataFrame({
+            "source": self.targets[rows],
+            "target": other.targets[cols],
+            "weight": data / totals[rows],
+            "total": data,
+        }).sort_values(["source", "target"], ignore_index=True)
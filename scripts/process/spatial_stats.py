@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""政党得票率の空間自己相関（Moran's I / Geary's C / LISA）
+
+隣接行列と「単位×政党」の得票率行列から、全政党分の大域 Moran's I・Geary's C と
+局所 Moran's I（LISA）を疎行列積でまとめて計算する。
+順列検定は順列を列方向に積んだ密行列を疎行列に1回掛けるバッチ方式で、
+チャンク分割でメモリを抑え、--workers 指定時はプロセスプールに分散する。
+
+入力: data/processed/adj_{muni,pref,block}.npz + adj_*_nodes.csv
+      data/processed/hirei_shikuchouson.csv（muni_index.npy の位置で集計）
+      data/master/district_master.csv（ブロック集計用）
+出力: data/processed/spatial_autocorr_{level}.csv（政党別の大域統計量）
+      data/processed/lisa_{level}.csv（単位×政党の局所統計量）
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from hirei_to_json import read_hirei, vote_matrix
+from instrumentation import record_rows, stage, step
+from muni_code_canonical import MuniIndex
+
+BASE = Path(__file__).resolve().parent.parent.parent
+PROCESSED = BASE / "data" / "processed"
+DISTRICT_MASTER = BASE / "data" / "master" / "district_master.csv"
+
+LEVEL_KEYS = {"muni": "muni_code", "pref": "pref_code", "block": "block_id"}
+
+# Upper bound on the permuted block held in memory per chunk.
+MAX_CHUNK_BYTES = 256 * 1024 * 1024
+
+# LISA quadrant codes (same convention as esda): 1=HH, 2=LH, 3=LL, 4=HL, 0=island
+QUADRANT_LABELS = {0: "", 1: "HH", 2: "LH", 3: "LL", 4: "HL"}
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Global/local spatial autocorrelation of party vote shares."
+    )
+    p.add_argument(
+        "--level",
+        choices=sorted(LEVEL_KEYS),
+        default="muni",
+        help="Spatial unit / adjacency matrix to use (default: muni)",
+    )
+    p.add_argument(
+        "--transform",
+        choices=["r", "b"],
+        default="r",
+        help="Weights transform: r=row-standardized, b=binary (default: r)",
+    )
+    p.add_argument(
+        "--permutations",
+        type=int,
+        default=999,
+        help="Number of random permutations for pseudo p-values (default: 999)",
+    )
+    p.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Permutations per chunk (default: derived from a 256 MB budget)",
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Process pool size for permutation chunks (0 = run in-process)",
+    )
+    p.add_argument("--seed", type=int, default=12345, help="Random seed")
+    return p.parse_args()
+
+
+# --- Inputs ------------------------------------------------------------------
+def load_adjacency(level: str) -> tuple[sparse.csr_matrix, pd.DataFrame]:
+    """Load adj_{level}.npz and its node table (row order = matrix order)."""
+    key = LEVEL_KEYS[level]
+    W = sparse.load_npz(PROCESSED / f"adj_{level}.npz").tocsr()
+    nodes = pd.read_csv(PROCESSED / f"adj_{level}_nodes.csv", dtype={key: str})
+    if W.shape != (len(nodes), len(nodes)):
+        raise ValueError(f"adj_{level}.npz shape {W.shape} does not match {len(nodes)} nodes")
+    return W, nodes
+
+
+def load_vote_shares(level: str, nodes: pd.DataFrame) -> pd.DataFrame:
+    """Return a (unit × party) vote-share matrix aligned to the adjacency node order.
+
+    Parties not on the ballot in a unit's block get share 0.
+    """
+    index = MuniIndex.load()
+    votes, valid, party_names, _ = vote_matrix(read_hirei(), index)
+    key = LEVEL_KEYS[level]
+
+    if level == "muni":
+        target = index.encode(nodes[key], strict=True)
+        unit_pos = np.full(len(index), -1)
+        unit_pos[target] = np.arange(len(nodes))
+    else:
+        unit = index.pref_codes
+        if level == "block":
+            master = pd.read_csv(DISTRICT_MASTER, dtype={"pref_code": str, "block_id": str})
+            pref_block = dict(zip(master["pref_code"].str.zfill(2), master["block_id"]))
+            unit = np.array([pref_block.get(code, "") for code in unit])
+        unit_pos = pd.Index(nodes[key].astype(str)).get_indexer(unit)
+
+    keep = unit_pos >= 0
+    unit_votes = np.zeros((len(nodes), len(party_names)))
+    np.add.at(unit_votes, unit_pos[keep], votes[keep])
+    unit_valid = np.bincount(unit_pos[keep], weights=np.nan_to_num(valid[keep]), minlength=len(nodes))
+
+    missing = nodes[key][unit_valid == 0]
+    if len(missing):
+        raise ValueError(
+            f"{len(missing)} {key} values in adj_{level}_nodes.csv have no votes: "
+            f"{list(missing[:10])}"
+        )
+    shares = unit_votes / unit_valid[:, None]
+    return pd.DataFrame(shares, index=nodes[key].astype(str).to_numpy(), columns=party_names)
+
+
+# --- Weights -----------------------------------------------------------------
+def transform_weights(W: sparse.spmatrix, transform: str = "r") -> sparse.csr_matrix:
+    """Row-standardize ('r') or binarize ('b') an adjacency matrix. Islands stay all-zero."""
+    W = sparse.csr_matrix(W, dtype=np.float64)
+    if transform == "b":
+        W.data[:] = 1.0
+        return W
+    if transform != "r":
+        raise ValueError(f"Unknown transform: {transform}")
+    row_sum = np.asarray(W.sum(axis=1)).ravel()
+    inv = np.divide(1.0, row_sum, out=np.zeros_like(row_sum), where=row_sum > 0)
+    return sparse.diags(inv) @ W
+
+
+def _chunk_size(bytes_per_perm: int, requested: int | None) -> int:
+    if requested is not None:
+        return max(1, requested)
+    return max(1, MAX_CHUNK_BYTES // max(1, bytes_per_perm))
+
+
+def _chunk_seeds(seed: int, permutations: int, chunk: int) -> list[tuple[int, np.random.SeedSequence]]:
+    sizes = [min(chunk, permutations - start) for start in range(0, permutations, chunk)]
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+def _run_chunks(fn, jobs: list[tuple], workers: int) -> list:
+    if workers and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(fn, *zip(*jobs)))
+    return [fn(*job) for job in jobs]
+
+
+def _pseudo_p(n_greater: np.ndarray, permutations: int) -> np.ndarray:
+    """Folded pseudo p-value (esda convention) from counts of sims >= observed."""
+    larger = np.minimum(n_greater, permutations - n_greater)
+    return (larger + 1.0) / (permutations + 1.0)
+
+
+# --- Global statistics -------------------------------------------------------
+def _global_from_centered(
+    W: sparse.csr_matrix, Z: np.ndarray, rc: np.ndarray, den: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Moran's I and Geary's C for every column of centered Z in one sparse product."""
+    n = W.shape[0]
+    s0 = W.sum()
+    WZ = W @ Z
+    cross = np.einsum("ij,ij->j", Z, WZ)
+    moran = (n / s0) * cross / den
+    # sum_ij w_ij (z_i - z_j)^2 = sum_i (r_i + c_i) z_i^2 - 2 z'Wz
+    sq_diff = rc @ (Z * Z) - 2.0 * cross
+    geary = ((n - 1) / (2.0 * s0)) * sq_diff / den
+    return moran, geary
+
+
+def _global_chunk(
+    W: sparse.csr_matrix,
+    Z: np.ndarray,
+    rc: np.ndarray,
+    den: np.ndarray,
+    size: int,
+    seed: np.random.SeedSequence,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Simulate `size` global permutations as one (n × size·p) sparse-dense product."""
+    n, p = Z.shape
+    rng = np.random.default_rng(seed)
+    order = rng.random((size, n)).argsort(axis=1)
+    P = Z[order].transpose(1, 0, 2).reshape(n, size * p)
+    moran, geary = _global_from_centered(W, P, rc, np.tile(den, size))
+    return moran.reshape(size, p), geary.reshape(size, p)
+
+
+def global_autocorrelation(
+    W: sparse.csr_matrix,
+    X: np.ndarray,
+    permutations: int = 999,
+    chunk_size: int | None = None,
+    workers: int = 0,
+    seed: int = 12345,
+) -> dict[str, np.ndarray]:
+    """Global Moran's I / Geary's C with permutation inference for each column of X."""
+    X = np.asarray(X, dtype=np.float64)
+    n, p = X.shape
+    Z = X - X.mean(axis=0)
+    den = np.einsum("ij,ij->j", Z, Z)
+    rc = np.asarray(W.sum(axis=0)).ravel() + np.asarray(W.sum(axis=1)).ravel()
+    moran, geary = _global_from_centered(W, Z, rc, den)
+
+    out = {
+        "moran_i": moran,
+        "moran_expected": np.full(p, -1.0 / (n - 1)),
+        "geary_c": geary,
+    }
+    if permutations <= 0:
+        return out
+
+    # Permuted block (n × chunk·p) plus its W product, float64.
+    chunk = _chunk_size(2 * n * p * 8, chunk_size)
+    jobs = [(W, Z, rc, den, size, ss) for size, ss in _chunk_seeds(seed, permutations, chunk)]
+    results = _run_chunks(_global_chunk, jobs, workers)
+    sim_i = np.vstack([r[0] for r in results])
+    sim_c = np.vstack([r[1] for r in results])
+
+    out["moran_z_sim"] = (moran - sim_i.mean(axis=0)) / sim_i.std(axis=0, ddof=1)
+    out["moran_p_sim"] = _pseudo_p((sim_i >= moran).sum(axis=0), permutations)
+    out["geary_z_sim"] = (geary - sim_c.mean(axis=0)) / sim_c.std(axis=0, ddof=1)
+    out["geary_p_sim"] = _pseudo_p((sim_c >= geary).sum(axis=0), permutations)
+    return out
+
+
+# --- Local statistics (LISA) -------------------------------------------------
+def _padded_neighbors(W: sparse.csr_matrix) -> tuple[np.ndarray, np.ndarray]:
+    """Per-row weights padded to (n × max_k), plus cardinalities."""
+    card = np.diff(W.indptr)
+    max_k = int(card.max()) if len(card) else 0
+    weights = np.zeros((W.shape[0], max_k))
+    rows = np.repeat(np.arange(W.shape[0]), card)
+    cols = np.arange(W.nnz) - np.repeat(W.indptr[:-1], card)
+    weights[rows, cols] = W.data
+    return weights, card
+
+
+def _local_chunk(
+    Z: np.ndarray,
+    weights: np.ndarray,
+    observed_lag: np.ndarray,
+    size: int,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    """Count conditional-permutation lags >= observed for `size` permutations.
+
+    Each unit i keeps z_i and draws its max_k neighbours from the other n-1 units;
+    one draw matrix is shared across units (as in esda's crand), shifted past i.
+    """
+    n, p = Z.shape
+    max_k = weights.shape[1]
+    rng = np.random.default_rng(seed)
+    draws = rng.random((size, n - 1)).argsort(axis=1)[:, :max_k]
+    idx = draws[None, :, :] + (draws[None, :, :] >= np.arange(n)[:, None, None])
+    # (n, size, max_k, p) · (n, max_k) -> (n, size, p)
+    sim_lag = np.einsum("iskp,ik->isp", Z[idx], weights)
+    return (sim_lag >= observed_lag[:, None, :]).sum(axis=1)
+
+
+def local_moran(
+    W: sparse.csr_matrix,
+    X: np.ndarray,
+    permutations: int = 999,
+    chunk_size: int | None = None,
+    workers: int = 0,
+    seed: int = 12345,
+) -> dict[str, np.ndarray]:
+    """Local Moran's I for every unit × column, with conditional-permutation p-values.
+
+    W should normally be row-standardized. Units with no neighbours get I=0,
+    quadrant 0 and NaN p-values.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n, p = X.shape
+    Z = X - X.mean(axis=0)
+    m2 = np.einsum("ij,ij->j", Z, Z) / n
+    lag = W @ Z
+    local_i = Z * lag / m2
+
+    high = Z > 0
+    high_lag = lag > 0
+    quadrant = np.select(
+        [high & high_lag, ~high & high_lag, ~high & ~high_lag, high & ~high_lag],
+        [1, 2, 3, 4],
+    )
+    island = np.diff(W.indptr) == 0
+    quadrant[island] = 0
+
+    out = {"z": Z, "lag": lag, "local_i": local_i, "quadrant": quadrant}
+    if permutations <= 0:
+        return out
+
+    weights, _ = _padded_neighbors(W)
+    # Gathered neighbour values (n × chunk × max_k × p) dominate memory.
+    chunk = _chunk_size(n * max(1, weights.shape[1]) * p * 8, chunk_size)
+    jobs = [(Z, weights, lag, size, ss) for size, ss in _chunk_seeds(seed, permutations, chunk)]
+    n_greater = sum(_run_chunks(_local_chunk, jobs, workers))
+
+    # I_i is monotone in the lag with the sign of z_i, so compare lags directly.
+    n_greater = np.where(Z >= 0, n_greater, permutations - n_greater)
+    p_sim = _pseudo_p(n_greater, permutations)
+    p_sim[island] = np.nan
+    out["p_sim"] = p_sim
+    return out
+
+
+# --- Main --------------------------------------------------------------------
+@stage("spatial_stats")
+def main() -> None:
+    args = parse_args()
+    key = LEVEL_KEYS[args.level]
+
+    W_raw, nodes = load_adjacency(args.level)
+    shares = load_vote_shares(args.level, nodes)
+    W = transform_weights(W_raw, args.transform)
+    parties = shares.columns.tolist()
+    X = shares.to_numpy(dtype=np.float64)
+    n_islands = int((np.diff(W.indptr) == 0).sum())
+    print(f"Level: {args.level} ({len(nodes)} units, {W.nnz} links, {n_islands} islands)")
+    print(f"Parties: {len(parties)}, permutations: {args.permutations}")
+
+    with step("global autocorrelation"):
+        glob = global_autocorrelation(
+            W, X, args.permutations, args.chunk_size, args.workers, args.seed
+        )
+    global_df = pd.DataFrame({"party_name": parties, **glob})
+    global_df = global_df.sort_values("moran_i", ascending=False)
+    out_global = PROCESSED / f"spatial_autocorr_{args.level}.csv"
+    global_df.to_csv(out_global, index=False, encoding="utf-8")
+    print(f"Saved: {out_global}")
+
+    with step("local moran"):
+        local = local_moran(W, X, args.permutations, args.chunk_size, args.workers, args.seed)
+    local_df = pd.DataFrame({
+        key: np.repeat(nodes[key].to_numpy(), len(parties)),
+        "party_name": np.tile(parties, len(nodes)),
+        "share": X.ravel(),
+        "lag": (W @ X).ravel(),
+        "local_i": local["local_i"].ravel(),
+        "quadrant": pd.Series(local["quadrant"].ravel()).map(QUADRANT_LABELS).to_numpy(),
+    })
+    if "p_sim" in local:
+        local_df["p_sim"] = local["p_sim"].ravel()
+    out_local = PROCESSED / f"lisa_{args.level}.csv"
+    local_df.to_csv(out_local, index=False, encoding="utf-8")
+    print(f"Saved: {out_local}")
+    record_rows(rows_in=len(nodes), rows_out=len(local_df))
+
+    print("\nGlobal Moran's I:")
+    for _, row in global_df.iterrows():
+        p_txt = f"  p={row['moran_p_sim']:.3f}" if "moran_p_sim" in row else ""
+        print(f"  {row['party_name']:24s} I={row['moran_i']:+.3f}  C={row['geary_c']:.3f}{p_txt}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""処理済みテーブルの検証（dataio スキーマと市区町村コードの整合）
+
+dataio.TABLES に宣言された各テーブルについて次を確認する:
+  - 宣言どおりの型で読めるか（コード列の欠損を含む）
+  - muni_code が基準インデックス（muni_index.npy）のコードか。aligned なテーブルは
+    インデックスと同じ行順か
+  - kucode が選挙区マスタの district_code か
+
+ジオメトリや scipy を読み込まないので、パイプラインの途中でもすぐに実行できる。
+
+入力: data/processed/*.csv|parquet（dataio.TABLES）
+      data/processed/muni_index.npy
+      data/master/district_master.csv
+出力: なし（問題があれば終了コード 1）
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+import numpy as np
+
+from dataio import TABLES, column_names, load, source, table
+from muni_code_canonical import MuniIndex
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Check processed tables against their declared schemas.")
+    p.add_argument(
+        "tables",
+        nargs="*",
+        help=f"Tables to check (default: all present). Known: {', '.join(TABLES)}",
+    )
+    p.add_argument(
+        "--strict",
+        action="store_true",
+        help="Treat missing tables as errors",
+    )
+    return p.parse_args()
+
+
+def check_table(name: str, index: MuniIndex, districts: set[int]) -> list[str]:
+    """Problems found in one table (empty when it is consistent)."""
+    t = table(name)
+    keys = [c for c in ("muni_code", "pref_code", "kucode") if c in column_names(name)]
+    try:
+        df = load(name, keys or None)
+    except (ValueError, TypeError) as e:
+        return [f"unreadable with declared dtypes: {e}"]
+
+    problems = []
+    for col in keys:
+        n_na = int(df[col].isna().sum())
+        if n_na:
+            problems.append(f"{n_na} rows without {col}")
+    if "muni_code" in df.columns:
+        codes = df["muni_code"].dropna().to_numpy(dtype=str)
+        unknown = np.setdiff1d(codes, index.codes)
+        if len(unknown):
+            problems.append(f"{len(unknown)} muni_code not in index: {', '.join(unknown[:5])}")
+        if t.aligned and not np.array_equal(codes, index.codes):
+            problems.append(f"rows not in muni_index.npy order ({len(codes)} rows, index has {len(index)})")
+    if "pref_code" in df.columns:
+        bad = sorted(set(df["pref_code"].dropna()) - {f"{i:02d}" for i in range(1, 48)})
+        if bad:
+            problems.append(f"invalid pref_code: {', '.join(bad[:5])}")
+    if "kucode" in df.columns and districts:
+        unknown = sorted(set(df["kucode"].dropna().astype(int)) - districts)
+        if unknown:
+            problems.append(f"{len(unknown)} kucode not in district_master: {', '.join(map(str, unknown[:5]))}")
+    return problems
+
+
+def main() -> None:
+    args = parse_args()
+    index = MuniIndex.load()
+    try:
+        districts = set(load("district_master", ["district_code"])["district_code"])
+    except FileNotFoundError:
+        districts = set()
+
+    n_errors = 0
+    for name in args.tables or list(TABLES):
+        try:
+            src = source(table(name))
+        except FileNotFoundError:
+            if args.strict or args.tables:
+                print(f"ERROR {name}: not found")
+                n_errors += 1
+            continue
+        problems = check_table(name, index, districts)
+        status = "ERROR" if problems else "ok"
+        print(f"{status:5s} {name} ({src.name})")
+        for problem in problems:
+            print(f"      {problem}")
+        n_errors += bool(problems)
+
+    print(f"{n_errors} table(s) with errors")
+    if n_errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""Local read-only query API over processed election/census data.
+
+All tables are loaded once into typed NumPy arrays aligned to the canonical
+municipality index, and every query is answered from precomputed aggregates
+and sort orders. Runs on the asyncio stdlib server (HTTP/1.1, keep-alive).
+
+Endpoints (GET, JSON):
+  /parties                                  party codes, names, national shares
+  /shares?party=jimin&by=pref|block|muni    party share per unit (null where it did not run)
+  /top?k=10&by=margin|share[&party=jimin]   top-k municipalities
+  /muni?code=01101                          one municipality: shares of parties on its ballot + census
+  /neighbors?muni=01101                     Queen-contiguity neighbours
+  /stats                                    request count and latency percentiles
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+BASE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE / "scripts" / "process"))
+
+from hirei_to_json import PARTY_CODE_MAP, read_hirei, vote_matrix  # noqa: E402
+from muni_code_canonical import MuniIndex  # noqa: E402
+
+PROCESSED = BASE / "data" / "processed"
+CENSUS_MUNI = PROCESSED / "census_muni.csv"
+ADJ_MUNI = PROCESSED / "adj_muni.npz"
+ADJ_MUNI_NODES = PROCESSED / "adj_muni_nodes.csv"
+MASTER = BASE / "data" / "master" / "district_master.csv"
+LATENCY_WINDOW = 10_000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve processed election data over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port (default: 8765)")
+    return parser.parse_args()
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class DataIndex:
+    """Arrays and precomputed orderings for every supported query."""
+
+    def __init__(self) -> None:
+        self.index = MuniIndex.load()
+        df = read_hirei()
+        votes, valid, party_names, muni_pos = vote_matrix(df, self.index)
+        self.party_names = party_names
+        self.party_codes = [PARTY_CODE_MAP.get(name, name) for name in party_names]
+        self.party_pos = {code: j for j, code in enumerate(self.party_codes)}
+        self.party_pos.update({name: j for j, name in enumerate(party_names)})
+
+        first = np.unique(muni_pos, return_index=True)[1]
+        self.muni_names = np.full(len(self.index), "", dtype=object)
+        self.muni_names[muni_pos[first]] = df["muni_name"].to_numpy(dtype=object)[first]
+
+        # (muni, party) pairs that appear in the source rows; others are absent, not 0
+        reported = np.zeros(votes.shape, dtype=bool)
+        reported[muni_pos, pd.Index(party_names).get_indexer(df["party_name"])] = True
+        self.reported = reported
+
+        self.valid = valid
+        self.shares = np.where(reported, votes / valid[:, None], np.nan)
+
+        # Pref / block aggregates by exact vote summation
+        pref_codes = self.index.pref_codes
+        self.pref_keys, pref_id = np.unique(pref_codes, return_inverse=True)
+        master = pd.read_csv(MASTER, dtype={"pref_code": str, "block_id": str})
+        pref_block = dict(zip(master["pref_code"].str.zfill(2), master["block_name"]))
+        blocks = np.array([pref_block.get(code, "") for code in pref_codes])
+        self.block_keys, block_id = np.unique(blocks, return_inverse=True)
+        valid0 = np.nan_to_num(valid)
+        self.agg_shares = {}
+        for by, ids, n in (("pref", pref_id, len(self.pref_keys)), ("block", block_id, len(self.block_keys))):
+            unit_votes = np.zeros((n, votes.shape[1]))
+            np.add.at(unit_votes, ids, votes)
+            unit_valid = np.bincount(ids, weights=valid0, minlength=n)
+            unit_reported = np.zeros((n, votes.shape[1]), dtype=bool)
+            np.logical_or.at(unit_reported, ids, reported)
+            self.agg_shares[by] = np.where(unit_reported, unit_votes / unit_valid[:, None], np.nan)
+        self.national_shares = votes.sum(axis=0) / valid0.sum()
+
+        # Sort orders over reported cells only: share per party (descending)
+        # and winner margin (municipalities with at least two reported parties)
+        self.share_order = []
+        for col in self.shares.T:
+            rows = np.flatnonzero(~np.isnan(col))
+            self.share_order.append(rows[np.argsort(-col[rows], kind="stable")])
+        filled = np.nan_to_num(self.shares, nan=-np.inf)
+        top2 = -np.sort(-filled, axis=1)[:, :2]
+        self.winner = np.argmax(filled, axis=1)
+        self.margin = np.where(np.isfinite(top2).all(axis=1), top2[:, 0] - top2[:, 1], np.nan)
+        ranked = np.flatnonzero(~np.isnan(self.margin))
+        self.margin_order = ranked[np.argsort(-self.margin[ranked], kind="stable")]
+
+        census = self.index.align(pd.read_csv(CENSUS_MUNI, dtype={"muni_code": str, "pref_code": str}))
+        self.census_cols = [c for c in census.columns if c not in ("muni_code", "muni_name", "pref_code")]
+        self.census = census[self.census_cols].to_numpy(dtype=np.float64)
+
+        # adj_muni rows are read by index position: both must share one row order
+        nodes = pd.read_csv(ADJ_MUNI_NODES, dtype={"muni_code": str})
+        if not np.array_equal(self.index.encode(nodes["muni_code"]), np.arange(len(self.index))):
+            raise ValueError("muni_index.npy is out of sync with adj_muni_nodes.csv")
+        W = sparse.load_npz(ADJ_MUNI).tocsr()
+        self.adj_indptr = W.indptr
+        self.adj_indices = W.indices
+
+    # --- Query helpers -----------------------------------------------------
+    def _party(self, params: dict[str, str]) -> int:
+        party = params.get("party")
+        if party is None:
+            raise HttpError(400, "missing 'party'")
+        if party not in self.party_pos:
+            raise HttpError(404, f"unknown party: {party}")
+        return self.party_pos[party]
+
+    def _muni(self, code: str | None) -> int:
+        if code is None:
+            raise HttpError(400, "missing muni code")
+        pos = int(self.index.encode([code])[0])
+        if pos < 0:
+            raise HttpError(404, f"unknown muni code: {code}")
+        return pos
+
+    @staticmethod
+    def _k(params: dict[str, str]) -> int:
+        k = params.get("k", "10")
+        try:
+            k = int(k)
+        except ValueError:
+            raise HttpError(400, f"k must be an integer: {k}") from None
+        if k < 1:
+            raise HttpError(400, f"k must be at least 1: {k}")
+        return k
+
+    def _muni_record(self, i: int) -> dict:
+        return {"code": str(self.index.codes[i]), "name": self.muni_names[i]}
+
+    @staticmethod
+    def _value(x: float) -> float | None:
+        return None if np.isnan(x) else float(x)
+
+    # --- Endpoints ---------------------------------------------------------
+    def parties(self, params: dict[str, str]) -> list[dict]:
+        return [
+            {"code": code, "name": name, "national_share": float(share)}
+            for code, name, share in zip(self.party_codes, self.party_names, self.national_shares)
+        ]
+
+    def shares_by(self, params: dict[str, str]) -> dict:
+        j = self._party(params)
+        by = params.get("by", "pref")
+        if by == "muni":
+            keys, col = self.index.codes, self.shares[:, j]
+        elif by in self.agg_shares:
+            keys = self.pref_keys if by == "pref" else self.block_keys
+            col = self.agg_shares[by][:, j]
+        else:
+            raise HttpError(400, f"unsupported by={by}")
+        return {"party": self.party_codes[j], "by": by, "shares": dict(zip(keys.tolist(), map(self._value, col)))}
+
+    def top(self, params: dict[str, str]) -> dict:
+        k = self._k(params)
+        by = params.get("by", "margin")
+        if by == "margin":
+            rows = self.margin_order[:k]
+            items = [
+                {**self._muni_record(i), "winner": self.party_codes[self.winner[i]], "margin": float(self.margin[i])}
+                for i in rows
+            ]
+        elif by == "share":
+            j = self._party(params)
+            rows = self.share_order[j][:k]
+            items = [{**self._muni_record(i), "share": self._value(self.shares[i, j])} for i in rows]
+        else:
+            raise HttpError(400, f"unsupported by={by}")
+        return {"by": by, "k": k, "items": items}
+
+    def muni(self, params: dict[str, str]) -> dict:
+        i = self._muni(params.get("code"))
+        return {
+            **self._muni_record(i),
+            "valid_votes": self._value(self.valid[i]),
+            "shares": {
+                c: self._value(v) for c, v, ok in zip(self.party_codes, self.shares[i], self.reported[i]) if ok
+            },
+            "census": {c: self._value(v) for c, v in zip(self.census_cols, self.census[i])},
+        }
+
+    def neighbors(self, params: dict[str, str]) -> dict:
+        i = self._muni(params.get("muni"))
+        nbrs = self.adj_indices[self.adj_indptr[i]:self.adj_indptr[i + 1]]
+        return {**self._muni_record(i), "neighbors": [self._muni_record(j) for j in nbrs]}
+
+
+class ApiServer:
+    def __init__(self, data: DataIndex) -> None:
+        self.data = data
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.routes = {
+            "/parties": data.parties,
+            "/shares": data.shares_by,
+            "/top": data.top,
+            "/muni": data.muni,
+            "/neighbors": data.neighbors,
+            "/stats": self.stats,
+        }
+
+    def stats(self, params: dict[str, str]) -> dict:
+        lat = np.array(self.latencies) * 1000
+        pct = np.percentile(lat, [50, 90, 99]) if len(lat) else [None] * 3
+        return {
+            "requests": self.requests,
+            "window": len(lat),
+            "latency_ms": {"p50": pct[0], "p90": pct[1], "p99": pct[2]},
+        }
+
+    def dispatch(self, target: str) -> tuple[int, object]:
+        url = urlsplit(target)
+        handler = self.routes.get(url.path)
+        if handler is None:
+            return 404, {"error": f"no route: {url.path}"}
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            return 200, handler(params)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception:
+            traceback.print_exc()
+            return 500, {"error": "internal error"}
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter, status: int, payload: object, keep_alive: bool) -> None:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+            + body
+        )
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    keep_alive = request_line.rstrip().endswith(b"HTTP/1.1")
+                    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        if line.lower().startswith(b"connection:"):
+                            keep_alive = b"close" not in line.lower()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # A request or header line over the stream limit; the rest cannot be framed
+                    await self.respond(writer, 431, {"error": "request line or header too long"}, False)
+                    break
+
+                t0 = time.perf_counter()
+                parts = request_line.decode("utf-8", errors="replace").split()
+                if len(parts) < 2 or parts[0] != "GET":
+                    status, payload = 405, {"error": "only GET is supported"}
+                else:
+                    status, payload = self.dispatch(parts[1])
+                self.requests += 1
+                self.latencies.append(time.perf_counter() - t0)
+
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        except Exception:
+            traceback.print_exc()
+            try:
+                await self.respond(writer, 500, {"error": "internal error"}, False)
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int) -> None:
+    t0 = time.perf_counter()
+    api = ApiServer(DataIndex())
+    print(f"Loaded data in {time.perf_counter() - t0:.2f}s")
+    server = await asyncio.start_server(api.handle, host, port)
+    print(f"Serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    args = parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()